@@ -0,0 +1,120 @@
+"""Store image embeddings as vectors
+
+Revision ID: 5f2b8c1d9e7a
+Revises: ead9d59e30f4
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from db.types import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f2b8c1d9e7a'
+down_revision: Union[str, Sequence[str], None] = 'ead9d59e30f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+EMBEDDING_DIM = 1152
+BATCH_SIZE = 500
+
+
+def _batches(bind, id_column, value_column):
+    """Yield (id, value) rows with a non-null value, BATCH_SIZE at a time in id order"""
+    last_id = None
+    while True:
+        query = sa.select(id_column, value_column).where(value_column.isnot(None))
+        if last_id is not None:
+            query = query.where(id_column > last_id)
+        rows = bind.execute(query.order_by(id_column).limit(BATCH_SIZE)).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _parse_embedding(embedding):
+    """JSON text embedding as a list, or None when it is unreadable or of another size"""
+    try:
+        vector = json.loads(embedding)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(vector, list) or len(vector) != EMBEDDING_DIM:
+        return None
+    if not all(isinstance(value, (int, float)) for value in vector):
+        return None
+    return vector
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+
+    op.add_column('image_analyses', sa.Column('embedding_vector', Vector(EMBEDDING_DIM), nullable=True))
+
+    # Convert JSON text embeddings; unreadable values or values of another size cannot be compared and are dropped
+    analyses = sa.table(
+        'image_analyses',
+        sa.column('id', sa.Integer),
+        sa.column('embedding', sa.Text),
+        sa.column('embedding_vector', Vector(EMBEDDING_DIM))
+    )
+    update = (
+        analyses.update()
+        .where(analyses.c.id == sa.bindparam('row_id'))
+        .values(embedding_vector=sa.bindparam('vector'))
+    )
+    for rows in _batches(bind, analyses.c.id, analyses.c.embedding):
+        values = []
+        for row_id, embedding in rows:
+            vector = _parse_embedding(embedding)
+            if vector is not None:
+                values.append({'row_id': row_id, 'vector': vector})
+        if values:
+            bind.execute(update, values)
+
+    with op.batch_alter_table('image_analyses') as batch_op:
+        batch_op.drop_column('embedding')
+        batch_op.alter_column('embedding_vector', new_column_name='embedding')
+
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_image_analyses_embedding_hnsw "
+            "ON image_analyses USING hnsw (embedding vector_cosine_ops)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_image_analyses_embedding_hnsw")
+
+    op.add_column('image_analyses', sa.Column('embedding_text', sa.Text(), nullable=True))
+    analyses = sa.table(
+        'image_analyses',
+        sa.column('id', sa.Integer),
+        sa.column('embedding', Vector(EMBEDDING_DIM)),
+        sa.column('embedding_text', sa.Text)
+    )
+    update = (
+        analyses.update()
+        .where(analyses.c.id == sa.bindparam('row_id'))
+        .values(embedding_text=sa.bindparam('text'))
+    )
+    for rows in _batches(bind, analyses.c.id, analyses.c.embedding):
+        bind.execute(
+            update,
+            [{'row_id': row_id, 'text': json.dumps(embedding.tolist())} for row_id, embedding in rows]
+        )
+
+    with op.batch_alter_table('image_analyses') as batch_op:
+        batch_op.drop_column('embedding')
+        batch_op.alter_column('embedding_text', new_column_name='embedding')
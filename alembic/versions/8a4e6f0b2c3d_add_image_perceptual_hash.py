@@ -0,0 +1,31 @@
+"""Add image perceptual hash
+
+Revision ID: 8a4e6f0b2c3d
+Revises: 5f2b8c1d9e7a
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4e6f0b2c3d'
+down_revision: Union[str, Sequence[str], None] = '5f2b8c1d9e7a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('image_analyses', sa.Column('phash', sa.BigInteger(), nullable=True))
+    op.create_index(op.f('ix_image_analyses_phash'), 'image_analyses', ['phash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_image_analyses_phash'), table_name='image_analyses')
+    with op.batch_alter_table('image_analyses') as batch_op:
+        batch_op.drop_column('phash')
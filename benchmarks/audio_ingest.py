@@ -0,0 +1,100 @@
+"""Compare the audio ingest stage against decoding with librosa
+
+Usage:
+    python -m benchmarks.audio_ingest --minutes 60 --rate 44100 --channels 2 --format flac
+    python -m benchmarks.audio_ingest --input consultation.wav
+
+Both paths produce 16 kHz mono float32 and the recording's duration. Each
+is measured in a fresh interpreter, so the import cost is included; the
+report shows import and decode time, peak resident memory and how many
+seconds of audio are ingested per second.
+"""
+import argparse
+import json
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import run_isolated
+
+def synthesize(path: Path, minutes: float, rate: int, channels: int):
+    """Write a recording of amplitude-modulated tones and pauses, in one-minute blocks"""
+    import soundfile as sf
+
+    rng = np.random.default_rng(0)
+    with sf.SoundFile(path, "w", samplerate=rate, channels=channels) as f:
+        for _ in range(int(np.ceil(minutes))):
+            t = np.arange(60 * rate) / rate
+            voice = 0.3 * np.sin(2 * np.pi * rng.uniform(120, 260) * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t))
+            voice[(t % 10) > 8] = 0  # a pause every ten seconds
+            noise = rng.normal(0, 0.003, (len(t), channels))
+            f.write((voice[:, None] + noise).astype(np.float32))
+
+def measure(path: str, method: str) -> dict:
+    start_time = time.perf_counter()
+    if method == "librosa":
+        import librosa
+    else:
+        from services.audio_io import audio_duration, load_audio
+    import_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    if method == "librosa":
+        audio, sr = librosa.load(path, sr=16000)
+        duration = librosa.get_duration(y=audio, sr=sr)
+    else:
+        duration = audio_duration(path)
+        audio = load_audio(path)
+    decode_seconds = time.perf_counter() - start_time
+
+    return {
+        "method": method,
+        "import_seconds": round(import_seconds, 2),
+        "decode_seconds": round(decode_seconds, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "audio_seconds": round(duration, 1),
+        "samples": len(audio),
+        "realtime_factor": round(duration / decode_seconds, 1) if decode_seconds else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", help="Recording to decode; a synthetic one is generated otherwise")
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--rate", type=int, default=44100)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--format", choices=["wav", "flac", "ogg"], default="flac")
+    parser.add_argument("--methods", nargs="+", default=["librosa", "ingest"])
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    parser.add_argument("--single", nargs=2, metavar=("PATH", "METHOD"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(measure(*args.single)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.input
+        if path is None:
+            path = str(Path(tmp) / f"recording.{args.format}")
+            synthesize(Path(path), args.minutes, args.rate, args.channels)
+        report = [run_isolated("benchmarks.audio_ingest", ["--single", path, method]) for method in args.methods]
+
+    baseline = report[0]
+    print(f"{'method':<10}{'import s':>10}{'decode s':>10}{'peak MB':>10}{'x realtime':>12}{'speed x':>9}")
+    for result in report:
+        speedup = baseline["decode_seconds"] / result["decode_seconds"] if result["decode_seconds"] else 0
+        print(
+            f"{result['method']:<10}{result['import_seconds']:>10}{result['decode_seconds']:>10}"
+            f"{result['peak_rss_mb']:>10}{result['realtime_factor']:>12}{speedup:>9.2f}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Compare the eager, torch.compile and ONNX Runtime backends of the text model
+
+Usage:
+    python -m scripts.export_models --model text      # once, for the onnx backend
+    python -m benchmarks.backends --backends eager compile onnx --runs 3
+
+Every backend is measured in a fresh interpreter; the report shows load time,
+resident memory added by the model and mean generation latency against eager.
+"""
+import argparse
+import json
+import os
+
+from benchmarks.common import measure_text_model, print_comparison, run_isolated
+
+def measure(backend: str, runs: int, max_new_tokens: int) -> dict:
+    os.environ["TEXT_BACKEND"] = backend
+    result = {"backend": backend}
+    result.update(measure_text_model(runs, max_new_tokens))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["eager", "compile", "onnx"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(measure(args.single, args.runs, args.max_new_tokens)))
+        return
+
+    report = [
+        run_isolated(
+            "benchmarks.backends",
+            ["--single", backend, "--runs", str(args.runs), "--max-new-tokens", str(args.max_new_tokens)]
+        )
+        for backend in args.backends
+    ]
+    print_comparison(report, "backend")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Measure how long a fresh process takes to load and warm up a model
+
+Usage:
+    python -m benchmarks.cold_start --model text
+    python -m benchmarks.cold_start --model audio --precision bf16 --output cold_start.json
+
+Two boots are measured, each in a fresh interpreter: loading from the
+original checkpoint, and loading the converted copy written beforehand by
+``scripts.export_models --convert``. The report shows import, load and
+warmup time and peak resident memory of each; the offline conversion is
+timed on its own and never counted in a boot.
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+
+from benchmarks.common import run_isolated
+
+def measure(variant: str, model_type: str, converted_dir: str) -> dict:
+    os.environ["CONVERTED_MODELS_DIR"] = converted_dir
+    start_time = time.perf_counter()
+    from services.inference import InferenceService
+    from utils.model_loader import ModelLoader
+    import_seconds = time.perf_counter() - start_time
+
+    if variant == "conversion":
+        start_time = time.perf_counter()
+        ModelLoader.convert(model_type)
+        return {"variant": variant, "convert_seconds": round(time.perf_counter() - start_time, 2)}
+
+    start_time = time.perf_counter()
+    getattr(ModelLoader, f"get_{model_type}_model")()
+    load_seconds = time.perf_counter() - start_time
+    warmup_seconds = InferenceService.warmup(model_type)
+
+    return {
+        "variant": variant,
+        "import_seconds": round(import_seconds, 2),
+        "load_seconds": round(load_seconds, 2),
+        "warmup_seconds": round(warmup_seconds, 2),
+        "total_seconds": round(import_seconds + load_seconds + warmup_seconds, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", choices=["text", "draft", "image", "audio"], default="text")
+    parser.add_argument("--precision", choices=["fp32", "bf16", "int8"], help="CPU precision profile to load with")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    parser.add_argument("--single", nargs=3, metavar=("VARIANT", "MODEL", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(measure(*args.single)))
+        return
+
+    if args.precision:
+        os.environ["CPU_PRECISION"] = args.precision
+    with tempfile.TemporaryDirectory() as tmp:
+        report = [
+            run_isolated("benchmarks.cold_start", ["--single", variant, args.model, converted_dir])
+            for variant, converted_dir in [("original", ""), ("conversion", tmp), ("converted", tmp)]
+        ]
+    boots = [result for result in report if result["variant"] != "conversion"]
+
+    print(f"{'boot':<12}{'import s':>10}{'load s':>9}{'warmup s':>10}{'total s':>9}{'peak MB':>10}")
+    for result in boots:
+        print(
+            f"{result['variant']:<12}{result['import_seconds']:>10}{result['load_seconds']:>9}"
+            f"{result['warmup_seconds']:>10}{result['total_seconds']:>9}{result['peak_rss_mb']:>10}"
+        )
+    print(f"Offline conversion: {report[1]['convert_seconds']}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Helpers shared by the model benchmarks"""
+import json
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+PROMPT = "I have had a headache and mild fever for three days. What should I do?"
+
+def measure_text_model(runs: int, max_new_tokens: int) -> Dict[str, Any]:
+    """Load the text model as currently configured and time a short greedy generation"""
+    import psutil
+    import torch
+    from utils.model_loader import ModelLoader
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+
+    start_time = time.perf_counter()
+    model, tokenizer = ModelLoader.get_text_model()
+    load_seconds = time.perf_counter() - start_time
+    rss_after = process.memory_info().rss
+
+    inputs = tokenizer(PROMPT, return_tensors="pt").to(model.device)
+    kwargs = dict(max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=tokenizer.pad_token_id)
+    with torch.no_grad():
+        model.generate(**inputs, **kwargs)  # warmup, includes graph compilation
+
+        latencies = []
+        for _ in range(runs):
+            start_time = time.perf_counter()
+            model.generate(**inputs, **kwargs)
+            latencies.append(time.perf_counter() - start_time)
+
+    return {
+        "load_seconds": round(load_seconds, 2),
+        "model_rss_mb": round((rss_after - rss_before) / 1024 ** 2, 1),
+        "peak_rss_mb": round(process.memory_info().rss / 1024 ** 2, 1),
+        "latency_seconds": round(sum(latencies) / len(latencies), 3),
+        "tokens_per_second": round(max_new_tokens * len(latencies) / sum(latencies), 2),
+    }
+
+def run_isolated(module: str, args: List[str]) -> Dict[str, Any]:
+    """Run a benchmark module in a fresh interpreter and parse the JSON it prints last"""
+    completed = subprocess.run(
+        [sys.executable, "-m", module, *args],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def print_comparison(report: List[Dict[str, Any]], label: str):
+    """Print load, memory and latency of every variant relative to the first one"""
+    baseline = report[0]
+    print(f"{label:<10}{'load s':>8}{'model MB':>10}{'latency s':>11}{'tok/s':>8}{'mem x':>7}{'speed x':>9}")
+    for result in report:
+        memory_ratio = result["model_rss_mb"] / baseline["model_rss_mb"] if baseline["model_rss_mb"] else 0
+        speedup = baseline["latency_seconds"] / result["latency_seconds"] if result["latency_seconds"] else 0
+        print(
+            f"{result[label]:<10}{result['load_seconds']:>8}{result['model_rss_mb']:>10}"
+            f"{result['latency_seconds']:>11}{result['tokens_per_second']:>8}"
+            f"{memory_ratio:>7.2f}{speedup:>9.2f}"
+        )
@@ -0,0 +1,54 @@
+"""Compare memory and latency of the CPU precision profiles
+
+Usage:
+    python -m benchmarks.cpu_profiles --precisions fp32 bf16 int8 --runs 3
+
+Every profile is measured in a fresh interpreter so resident memory is not
+shared between runs. The report shows load time, resident memory added by
+the text model and mean generation latency.
+"""
+import argparse
+import json
+import os
+
+from benchmarks.common import measure_text_model, print_comparison, run_isolated
+
+def measure(precision: str, runs: int, max_new_tokens: int) -> dict:
+    os.environ["CPU_PRECISION"] = precision
+    from utils.model_loader import ModelLoader
+
+    result = {
+        "precision": precision,
+        "dtype": "qint8" if precision == "int8" else str(ModelLoader._model_dtype()).replace("torch.", ""),
+    }
+    result.update(measure_text_model(runs, max_new_tokens))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--precisions", nargs="+", default=["fp32", "bf16", "int8"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(measure(args.single, args.runs, args.max_new_tokens)))
+        return
+
+    report = [
+        run_isolated(
+            "benchmarks.cpu_profiles",
+            ["--single", precision, "--runs", str(args.runs), "--max-new-tokens", str(args.max_new_tokens)]
+        )
+        for precision in args.precisions
+    ]
+    print_comparison(report, "precision")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
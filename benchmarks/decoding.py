@@ -0,0 +1,105 @@
+"""Compare text decoding profiles against the current beam search
+
+Usage:
+    python -m benchmarks.decoding --profiles beam greedy speculative --max-length 256
+
+Reports generated tokens per second for every profile and how closely its
+answers match the beam-search reference.
+"""
+import argparse
+import difflib
+import json
+import time
+from typing import Any, Dict, List
+
+import torch
+
+from services.decoding import generation_kwargs, resolve_profile
+from utils.model_loader import ModelLoader
+
+DEFAULT_PROMPTS = [
+    "I have had a headache and mild fever for three days. What should I do?",
+    "What are the common side effects of metformin?",
+    "My child has a dry cough at night. When should I see a doctor?",
+    "I feel chest tightness after climbing stairs.",
+    "How can I lower my blood pressure without medication?",
+]
+
+def run_profile(profile: str, prompts: List[str], max_length: int) -> Dict[str, Any]:
+    model, tokenizer = ModelLoader.get_text_model()
+    kwargs = generation_kwargs(profile, tokenizer)
+
+    answers = []
+    new_tokens = 0
+    elapsed = 0.0
+    for prompt in prompts:
+        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+        prompt_length = inputs.input_ids.shape[-1]
+
+        start_time = time.perf_counter()
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs,
+                **kwargs,
+                max_length=max_length,
+                pad_token_id=tokenizer.pad_token_id
+            )
+        elapsed += time.perf_counter() - start_time
+
+        new_tokens += outputs.shape[-1] - prompt_length
+        answers.append(tokenizer.decode(outputs[0, prompt_length:], skip_special_tokens=True))
+
+    return {
+        "profile": resolve_profile(profile),
+        "new_tokens": int(new_tokens),
+        "seconds": round(elapsed, 3),
+        "tokens_per_second": round(new_tokens / elapsed, 2) if elapsed else 0.0,
+        "answers": answers,
+    }
+
+def parity(reference: List[str], candidate: List[str]) -> Dict[str, float]:
+    """Exact-match rate and mean character similarity against the reference answers"""
+    exact = sum(a == b for a, b in zip(reference, candidate)) / len(reference)
+    similarity = sum(
+        difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(reference, candidate)
+    ) / len(reference)
+    return {"exact_match": round(exact, 3), "similarity": round(similarity, 3)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", nargs="+", default=["beam", "greedy", "speculative"])
+    parser.add_argument("--prompts", help="Text file with one prompt per line")
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--output", help="Write the full report as JSON to this path")
+    args = parser.parse_args()
+
+    prompts = DEFAULT_PROMPTS
+    if args.prompts:
+        with open(args.prompts, encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip()]
+
+    # Load models and run one untimed generation so first-call overhead is excluded
+    for profile in args.profiles:
+        run_profile(profile, prompts[:1], args.max_length)
+
+    reference = run_profile("beam", prompts, args.max_length)
+    report = []
+    for profile in args.profiles:
+        result = reference if profile == "beam" else run_profile(profile, prompts, args.max_length)
+        result["parity_vs_beam"] = parity(reference["answers"], result["answers"])
+        report.append(result)
+
+    print(f"{'profile':<12}{'tokens/s':>10}{'tokens':>8}{'seconds':>9}{'exact':>8}{'similar':>9}")
+    for result in report:
+        print(
+            f"{result['profile']:<12}{result['tokens_per_second']:>10}{result['new_tokens']:>8}"
+            f"{result['seconds']:>9}{result['parity_vs_beam']['exact_match']:>8}"
+            f"{result['parity_vs_beam']['similarity']:>9}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
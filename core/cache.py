@@ -1,7 +1,7 @@
 import redis
 from core.config import settings
 import json
-from typing import Any
+from typing import Any, Dict, List
 
 # Initialize Redis client
 redis_client = None
@@ -48,5 +48,31 @@ def set_cache(key: str, value: Any, ttl: int = 300) -> bool:
         print(f"Cache set error: {e}")
         return False
 
+def get_cache_many(keys: List[str]) -> List[Any]:
+    """Fetch several keys in one round trip; missing keys come back as None"""
+    if not redis_client or not keys:
+        return [None] * len(keys)
+    
+    try:
+        return [json.loads(data) if data else None for data in redis_client.mget(keys)]
+    except Exception as e:
+        print(f"Cache get error: {e}")
+    return [None] * len(keys)
+
+def set_cache_many(items: Dict[str, Any], ttl: int = 300) -> bool:
+    """Store several keys in one pipelined round trip"""
+    if not redis_client or not items:
+        return False
+    
+    try:
+        pipeline = redis_client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.setex(key, ttl, json.dumps(value))
+        pipeline.execute()
+        return True
+    except Exception as e:
+        print(f"Cache set error: {e}")
+        return False
+
 # Initialize on import
 initialize_cache()
\ No newline at end of file
@@ -13,6 +13,12 @@ class Settings(BaseSettings):
     # نماذج الذكاء الاصطناعي
     HUGGING_FACE_MODEL_NAME: str = "MBZUAI/BiMediX2-4B"
     MEDGEMMA_MODEL: str = "google/medgemma-4b-it"
+    TEXT_BACKEND: str = "eager"  # eager أو compile أو onnx
+    IMAGE_BACKEND: str = "eager"  # eager أو compile
+    EXPORTED_MODELS_DIR: str = "local_ai/exported"
+    CONVERTED_MODELS_DIR: str = "local_ai/converted"  # نسخ safetensors بالدقة المستهدفة تُنشأ مسبقاً عبر scripts.export_models --convert ("" = تعطيل)
+    TEXT_MODEL_VERSION: str = "1"  # تغييره يبطل الإجابات المخزنة للنموذج السابق
+    CPU_PRECISION: str = "fp32"  # fp32 أو bf16 أو int8 (تكميم ديناميكي للطبقات الخطية)
     
     
     # الأمان
@@ -33,7 +39,90 @@ class Settings(BaseSettings):
     CACHE_TTL_IMAGE: int = 86400
     CACHE_TTL_AUDIO: int = 86400
     CACHE_TTL_RECOMMEND: int = 3600
+
+    # تجميع طلبات النص في دفعات (micro-batching)
+    TEXT_BATCHING_ENABLED: bool = True
+    TEXT_BATCH_MAX_SIZE: int = 8
+    TEXT_BATCH_WAIT_MS: int = 25
+    
+    # بث النص عبر Server-Sent Events
+    TEXT_STREAM_DO_SAMPLE: bool = False
+    TEXT_STREAM_TEMPERATURE: float = 0.7
+    TEXT_STREAM_TOP_P: float = 0.9
+    
+    # مجمع عمال الاستدلال
+    INFERENCE_WORKERS: int = 2
+    TEXT_INFERENCE_WORKERS: int = 8
+    INFERENCE_QUEUE_SIZE: int = 16
+    INFERENCE_TIMEOUT_SECONDS: float = 120.0  # المهلة القصوى لكل طلب استدلال
+    IMAGE_DECODE_WORKERS: int = 2  # فك ترميز الصور ومعالجتها المسبقة خارج عمال النموذج
+    IMAGE_BATCH_SIZE: int = 16  # عدد الصور في كل تمريرة للنموذج
+    IMAGE_BATCH_MAX_FILES: int = 200
+    IMAGE_UPLOAD_MAX_MB: int = 100  # الحد الأقصى لحجم ملف الصورة المرفوع
+    AUDIO_UPLOAD_MAX_MB: int = 1024  # الحد الأقصى لحجم الملف الصوتي المرفوع
+    
+    # إعادة استخدام ذاكرة KV للمقدمات الثابتة في القوالب
+    PREFIX_CACHE_ENABLED: bool = True
+    
+    # ملفات فك الترميز: greedy أو beam أو speculative
+    TEXT_DECODING_PROFILE: str = "beam"
+    DECODING_PROFILES_BY_ENDPOINT: dict = {}  # مثال: {"chat": "speculative", "specialty": "greedy"}
+    DRAFT_MODEL_NAME: str = ""  # نموذج مسودة صغير يشارك نفس المفردات
+    DRAFT_NUM_ASSISTANT_TOKENS: int = 5
+    
+    # التخزين المؤقت الدلالي لإجابات النص المتشابهة
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_ENCODER: str = "sentence-transformers/all-MiniLM-L6-v2"
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_TTL: int = 3600
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 5000
+    SEMANTIC_CACHE_SCOPE: str = "user"  # "global" يشارك الإجابات بين المستخدمين (الإجابة تتضمن نص السؤال)
+    
+    # نسخ متعددة من النماذج موزعة على أنوية المعالج (0 أو 1 = بدون نسخ)
+    SERVING_REPLICAS: int = 0
+    REPLICA_THREADS: int = 0  # 0 = عدد الأنوية المخصصة لكل نسخة
+    REPLICA_CONCURRENCY: int = 8  # الطلبات المتزامنة داخل كل نسخة
+    REPLICA_RESTART_BACKOFF: float = 1.0  # ثوانٍ قبل أول إعادة تشغيل، وتتضاعف مع كل إعادة
+    REPLICA_RESTART_BACKOFF_MAX: float = 60.0
+    REPLICA_MAX_RESTARTS: int = 5  # بعدها تُعلَّم النسخة كمعطلة ولا يُعاد تشغيلها
     
+    # تضمينات الصور والبحث عن الصور المشابهة
+    IMAGE_EMBEDDING_DIM: int = 1152  # حجم مخرجات مشفر الرؤية SigLIP في MedGemma
+    IMAGE_SIMILAR_TOP_K: int = 10
+    IMAGE_INDEX_DIR: str = "local_ai/index"  # فهرس float16 محلي عند عدم توفر pgvector
+    IMAGE_INDEX_IVF_LISTS: int = 1024  # 0 = بحث شامل دائماً
+    IMAGE_INDEX_IVF_MIN_ROWS: int = 200000  # بناء IVF عبر scripts.train_image_index عند تجاوز هذا العدد من الصور
+    IMAGE_INDEX_IVF_PROBES: int = 16
+    
+    # اكتشاف الصور شبه المكررة عبر البصمة الإدراكية (pHash)
+    IMAGE_NEAR_DUPLICATE_REUSE: bool = False  # إعادة استخدام تحليل صورة شبه مطابقة (اختياري)
+    IMAGE_PHASH_MAX_DISTANCE: int = 6  # أقصى مسافة Hamming بين البصمتين
+    
+    # حدود الذاكرة للصور الكبيرة والمعالجة المجزأة (tiles)
+    IMAGE_MAX_PIXELS: int = 400_000_000
+    IMAGE_DECODE_MEMORY_MB: int = 256  # أقصى ذاكرة لفك ترميز صورة واحدة
+    IMAGE_TILE_MAX_SIDE: int = 4096  # دقة العمل القصوى في وضع التجزئة
+    IMAGE_TILE_OVERLAP: int = 64
+    
+    # النسخ الصوتي للتسجيلات الطويلة: تقسيم حسب نشاط الصوت (VAD) ومعالجة دفعات
+    SPEECH_MODEL: str = "openai/whisper-small"
+    SPEECH_LANGUAGE: str = "ar"
+    AUDIO_DECODE_WORKERS: int = 2  # فك ترميز الصوت وإعادة تشكيله إلى 16 kHz خارج عمال النموذج
+    AUDIO_CHUNK_SECONDS: float = 30.0  # لا يتجاوز نافذة Whisper
+    AUDIO_BATCH_SIZE: int = 8  # عدد المقاطع في كل تمريرة للنموذج
+    AUDIO_VAD_MARGIN_DB: float = 12.0  # ارتفاع الكلام فوق مستوى الضوضاء
+    AUDIO_VAD_MIN_SILENCE_MS: int = 300  # الصمت الأقصر من هذا لا يقسم الكلام
+    AUDIO_VAD_PAD_MS: int = 200
+    AUDIO_STREAM_STEP_SECONDS: float = 1.0  # تحديث النص الجزئي في البث المباشر كل ثانية صوت
+    AUDIO_STREAM_MAX_SECONDS: int = 7200
+    
+    # دورة حياة النماذج: تحميل عند الطلب وإخلاء الأقل استخداماً عند تجاوز الميزانية
+    MODEL_MEMORY_BUDGET_MB: int = 0  # 0 = بدون حد؛ ذاكرة المعالج (أو GPU) المتاحة لأوزان النماذج
+    MODEL_IDLE_TIMEOUT_SECONDS: int = 0  # إخلاء النموذج غير المستخدم بعد هذه المدة (0 = أبداً)
+    
+    # تحميل النماذج وتسخينها بالتوازي عند بدء التشغيل؛ /ready يعيد 503 حتى تكتمل
+    WARMUP_MODELS: list = ["text", "image", "audio"]  # text, draft, embedding, image, audio ([] = التحميل عند أول طلب)
+
     # بناء عنوان PostgreSQL إذا لم يتم تقديمه
     @property
     def SQLALCHEMY_DATABASE_URI(self):
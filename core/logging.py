@@ -4,6 +4,7 @@ from pathlib import Path
 
 logger = logging.getLogger("medixai")
 logger.setLevel(logging.INFO)
+logger.propagate = False  # has its own handlers; alembic.ini also configures the root logger
 
 # Create handlers
 console_handler = logging.StreamHandler()
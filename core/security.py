@@ -1,6 +1,6 @@
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, WebSocket, WebSocketException, status
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
@@ -193,4 +193,27 @@ async def get_current_active_user(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Inactive user"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_websocket_user(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """Authenticate a WebSocket handshake
+
+    Browsers cannot set headers on WebSocket connections, so the access
+    token may be passed as ``?token=`` as well as a Bearer Authorization header.
+    """
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    if not token:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Not authenticated")
+    try:
+        current_user = await get_current_user(token, db)
+    except HTTPException as e:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+    if current_user['user'].is_active is False:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Inactive user")
+    return current_user
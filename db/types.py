@@ -0,0 +1,47 @@
+import numpy as np
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+try:
+    from pgvector.sqlalchemy import Vector as PgVector
+except ImportError:  # pgvector is only needed against PostgreSQL
+    PgVector = None
+
+class Vector(TypeDecorator):
+    """Fixed-size float32 vector column
+
+    Stored as a native pgvector ``vector(dim)`` on PostgreSQL (so it can be
+    indexed with HNSW) and as raw little-endian float32 bytes everywhere else.
+    Values are read back as float32 NumPy arrays without any text parsing.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dim: int):
+        super().__init__()
+        self.dim = dim
+
+    def _native(self, dialect) -> bool:
+        return dialect.name == "postgresql" and PgVector is not None
+
+    def load_dialect_impl(self, dialect):
+        if self._native(dialect):
+            return dialect.type_descriptor(PgVector(self.dim))
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        vector = np.asarray(value, dtype="<f4").reshape(-1)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Expected a vector of size {self.dim}, got {vector.shape[0]}")
+        if self._native(dialect):
+            return vector
+        return vector.tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if self._native(dialect):
+            return np.asarray(value, dtype=np.float32)
+        return np.frombuffer(value, dtype="<f4")
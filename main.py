@@ -2,6 +2,7 @@ import os
 import time
 import uvicorn
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
@@ -10,6 +11,9 @@ from core.logging import logger
 from db.database import init_db
 from routers import ai, healthcheck, auth, dashboard, search
 from utils.model_loader import ModelLoader
+from services.replicas import ReplicaPool
+from services.warmup import ModelWarmup
+from services.uploads import upload_limit
 
 # Preload models at startup
 @asynccontextmanager
@@ -21,12 +25,13 @@ async def lifespan(app: FastAPI):
         # Initialize database
         init_db()
         
-        # Preload models directly from Hugging Face Hub
-        logger.info("Preloading AI models from Hugging Face Hub...")
-        # ModelLoader.get_text_model()
-        # ModelLoader.get_image_model()
-        # ModelLoader.get_audio_model()
-        logger.info("All models loaded successfully")
+        # Start pinned model replicas when multi-replica serving is enabled
+        if ReplicaPool.active():
+            ReplicaPool.get()
+        ModelLoader.start_idle_eviction()
+        
+        # Load and warm up models in the background; /ready reports when they are done
+        ModelWarmup.start()
         
     except Exception as e:
         logger.error(f"Startup failed: {e}")
@@ -34,7 +39,8 @@ async def lifespan(app: FastAPI):
     yield
     
     logger.info("Shutting down Medical AI API")
-    # ModelLoader.unload_models()
+    ReplicaPool.shutdown()
+    ModelLoader.unload_models()
 
 app = FastAPI(
     title="Medical AI API",
@@ -43,6 +49,18 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Reject oversized uploads from their Content-Length, before the body is read
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    limit = upload_limit(request.url.path)
+    content_length = request.headers.get("content-length")
+    if limit is not None and content_length and content_length.isdigit() and int(content_length) > limit:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload exceeds the {limit / 1024 ** 2:.0f} MB limit"}
+        )
+    return await call_next(request)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -1,7 +1,8 @@
 from sqlalchemy.sql import func
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime
-import json
+from sqlalchemy import BigInteger, Column, Integer, String, Text, Float, DateTime
+from core.config import settings
 from db.database import Base
+from db.types import Vector
 
 class ImageAnalysis(Base):
     __tablename__ = "image_analyses"
@@ -9,16 +10,17 @@ class ImageAnalysis(Base):
     filename = Column(String(255), nullable=False)
     content_type = Column(String(50), nullable=True)
     file_hash = Column(String(64), unique=True, index=True)
-    embedding = Column(Text, nullable=True)
+    phash = Column(BigInteger, nullable=True, index=True)  # 64-bit perceptual hash, stored signed
+    embedding = Column(Vector(settings.IMAGE_EMBEDDING_DIM), nullable=True)
     prediction = Column(String(255), nullable=True)
     confidence = Column(Float, nullable=True)
     created_at = Column(DateTime, default=func.now())  # تم إزالة timezone=True
 
     def set_embedding(self, embedding_vector):
-        self.embedding = json.dumps(embedding_vector)
+        self.embedding = embedding_vector
 
     def get_embedding(self):
-        return json.loads(self.embedding) if self.embedding else None
+        return self.embedding.tolist() if self.embedding is not None else None
 
 class AudioTranscription(Base):
     __tablename__ = "audio_transcriptions"
@@ -1,37 +1,171 @@
-from fastapi import APIRouter, UploadFile, HTTPException, BackgroundTasks, Depends, status, File, Form, Request
+from fastapi import APIRouter, UploadFile, HTTPException, BackgroundTasks, Depends, status, File, Form, Request, WebSocket
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional, List
 from sqlalchemy.orm import Session
-import hashlib
+import asyncio
+import json
 import time
-import os
-from pathlib import Path
-import aiofiles
+from PIL import UnidentifiedImageError
 from typing import Dict,Any
-from db.database import get_db
+from db.database import SessionLocal, get_db
 from services.inference import InferenceService
-from schemas.prediction import TextResponse, ImageResponse, AudioResponse
+from services.decoding import profile_for
+from services.cancellation import CancellationToken, InferenceCancelled
+from services.semantic_cache import SemanticCache
+from services.executor import InferencePool, InferenceQueueFull, text_pool, media_pool, decode_pool, audio_decode_pool
+from services.image_io import ImageTooLarge, fingerprint_image, load_for_tiling, preprocess_decoded, preprocess_image
+from services.phash_index import PerceptualHashIndex, to_signed
+from services.image_search import ImageSearchService
+from services.audio_io import UnsupportedAudio, audio_duration, load_audio
+from services.audio_stream import StreamingTranscriber
+from services.uploads import UploadTooLarge, read_upload, spool_upload
+from schemas.prediction import TextResponse, ImageResponse, ImageBatchResponse, SimilarImagesResponse, AudioResponse
 from models.multimodal import ImageAnalysis, AudioTranscription
 from core.logging import logger
-from core.security import get_current_active_user
+from core.security import get_current_active_user, get_websocket_user
 from core.config import settings
-from core.cache import redis_client, get_cache, set_cache
+from core.cache import redis_client, get_cache, set_cache, get_cache_many, set_cache_many
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
-CHUNK_SIZE = 1024 * 1024  # 1MB chunks
+DISCONNECT_POLL_SECONDS = 0.5
+_END_OF_STREAM = object()
 
-async def save_upload_file(file: UploadFile, file_hash: str) -> str:
-    """Save uploaded file in chunks"""
-    file_ext = os.path.splitext(file.filename)[1]
-    temp_dir = Path("temp")
-    temp_dir.mkdir(exist_ok=True)
-    file_path = temp_dir / f"{file_hash}{file_ext}"
-    
-    async with aiofiles.open(file_path, 'wb') as f:
-        while chunk := await file.read(CHUNK_SIZE):
-            await f.write(chunk)
-            
-    return str(file_path)
+def text_cache_key(email: str, prompt: str, max_length: int, stream: bool = False) -> str:
+    """Cache key of a text answer
+
+    The blocking endpoint returns the prompt followed by the answer and the
+    streaming one only the generated tokens, so each keeps its own entry.
+    """
+    kind = "text:stream" if stream else "text"
+    return f"ai:{kind}:{email}:{hash(prompt)}:{max_length}"
+
+def queue_full_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Inference queue is full, please retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
+async def run_inference(pool: InferencePool, fn, *args, **kwargs):
+    """Run a blocking model call on a bounded inference pool"""
+    try:
+        return await pool.run(fn, *args, **kwargs)
+    except InferenceQueueFull:
+        raise queue_full_error()
+
+async def map_inference(pool: InferencePool, fn, items: List[Any]) -> List[Any]:
+    """Run a blocking call per item on a pool without overfilling it; per-item errors are returned"""
+    results = await pool.map(fn, items)
+    if any(isinstance(result, InferenceQueueFull) for result in results):
+        raise queue_full_error()
+    return results
+
+def cancelled_error(error: InferenceCancelled) -> HTTPException:
+    if error.deadline_exceeded:
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Inference deadline exceeded"
+        )
+    # Nginx-style "client closed request"; the client is normally gone already
+    return HTTPException(status_code=499, detail="Request cancelled")
+
+async def watch_disconnect(request: Request, cancel_token: CancellationToken):
+    """Cancel the inference job as soon as the client goes away"""
+    while not cancel_token.is_cancelled():
+        if await request.is_disconnected():
+            logger.info("Client disconnected, cancelling inference")
+            cancel_token.cancel(CancellationToken.CLIENT_DISCONNECTED)
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+async def run_cancellable(request: Request, pool: InferencePool, fn, *args, **kwargs):
+    """Run a model call with a deadline, cancelling it if the client disconnects"""
+    cancel_token = CancellationToken(settings.INFERENCE_TIMEOUT_SECONDS)
+    watcher = asyncio.create_task(watch_disconnect(request, cancel_token))
+    try:
+        return await run_inference(pool, fn, *args, cancel_token=cancel_token, **kwargs)
+    except InferenceCancelled as e:
+        raise cancelled_error(e)
+    except asyncio.CancelledError:
+        cancel_token.cancel(CancellationToken.CLIENT_DISCONNECTED)
+        raise
+    finally:
+        watcher.cancel()
+
+async def iterate_cancellable(request: Request, make_iterator, cancel_token: CancellationToken):
+    """Yield the items of a blocking iterator consumed on a worker thread
+
+    The token is cancelled as soon as the client disconnects or the consumer
+    stops early, and the thread stops iterating at its next item, so the
+    generation behind the iterator ends instead of running to max_length.
+    """
+    loop = asyncio.get_running_loop()
+    items: asyncio.Queue = asyncio.Queue()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(items.put_nowait, item)
+        except RuntimeError:
+            pass  # the event loop is already closed
+
+    def produce():
+        try:
+            for item in make_iterator():
+                put(item)
+                if cancel_token.is_cancelled():
+                    break
+        except Exception as e:
+            put(e)
+        finally:
+            put(_END_OF_STREAM)
+
+    watcher = asyncio.create_task(watch_disconnect(request, cancel_token))
+    loop.run_in_executor(None, produce)
+    finished = False
+    try:
+        while True:
+            item = await items.get()
+            if item is _END_OF_STREAM:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        finished = True
+    finally:
+        watcher.cancel()
+        # Stops the producer when the response was closed before the iterator ended
+        if not finished:
+            cancel_token.cancel(CancellationToken.CLIENT_DISCONNECTED)
+
+def upload_too_large(error: UploadTooLarge) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=str(error)
+    )
+
+def image_error(error: Exception) -> HTTPException:
+    if isinstance(error, ImageTooLarge):
+        return HTTPException(status_code=413, detail=str(error))
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Unsupported or corrupt image file"
+    )
+
+def find_near_duplicate(db: Session, phash: int):
+    """Analyzed image whose perceptual hash is within IMAGE_PHASH_MAX_DISTANCE, with its distance"""
+    match = PerceptualHashIndex.lookup(db, phash, settings.IMAGE_PHASH_MAX_DISTANCE)
+    if match is None:
+        return None
+    analysis_id, distance = match
+    analysis = db.get(ImageAnalysis, analysis_id)
+    return (analysis, distance) if analysis else None
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format a payload as a Server-Sent Events frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 @router.post("/text", response_model=TextResponse)
 async def ai_text(
@@ -43,28 +177,42 @@ async def ai_text(
     """Process text input and return AI-generated medical advice"""
     try:
         # Create unique cache key
-        cache_key = f"ai:text:{current_user['user'].email}:{hash(prompt)}:{max_length}"
+        cache_key = text_cache_key(current_user['user'].email, prompt, max_length)
         
         # Check cache first
         cached_result = get_cache(cache_key)
         if cached_result:
             logger.info(f"Using cached response for {current_user['user'].email}")
             return cached_result
-            
-        logger.info(f"Processing text request from {current_user['user'].email}")
         
-        result = InferenceService.text(prompt, max_length)
+        # Then look for an answer to a near-identical prompt
+        semantic_scope = SemanticCache.scope_for(current_user['user'].email, max_length)
+        similar_result = await run_in_threadpool(SemanticCache.lookup, prompt, semantic_scope)
+        if similar_result:
+            logger.info(f"Using semantic cache response for {current_user['user'].email}")
+            result = dict(similar_result)
+        else:
+            logger.info(f"Processing text request from {current_user['user'].email}")
+            
+            result = await run_cancellable(
+                request, text_pool, InferenceService.text, prompt, max_length, profile=profile_for("chat")
+            )
+            # Near-duplicate prompts may differ in asking for recommendations,
+            # so only the model's answer is shared, without the suffix below
+            await run_in_threadpool(SemanticCache.store, prompt, semantic_scope, dict(result))
         
         # Add recommendation system during chat
         if "recommend" in prompt.lower():
             from services.recommendation import RecommendationService
-            recommendations = RecommendationService.recommend_from_chat(prompt)
+            recommendations = await run_inference(text_pool, RecommendationService.recommend_from_chat, prompt)
             result["text"] += f"\n\nRecommendations:\n{recommendations}"
         
         # Cache result for 5 minutes
         set_cache(cache_key, result, 300)
         
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Text processing error: {str(e)}")
         raise HTTPException(
@@ -72,35 +220,121 @@ async def ai_text(
             detail="Internal processing error"
         )
 
+@router.post("/text/stream")
+async def ai_text_stream(
+    request: Request,
+    prompt: str = Form(...),
+    max_length: Optional[int] = Form(512),
+    current_user: Dict[str, Any] = Depends(get_current_active_user)
+):
+    """Stream AI-generated medical advice token by token as Server-Sent Events"""
+    cache_key = text_cache_key(current_user['user'].email, prompt, max_length, stream=True)
+    cached_result = get_cache(cache_key)
+    if not cached_result and text_pool.is_full():
+        raise queue_full_error()
+    logger.info(f"Streaming text request from {current_user['user'].email}")
+    
+    cancel_token = CancellationToken(settings.INFERENCE_TIMEOUT_SECONDS)
+    
+    async def event_stream():
+        if cached_result:
+            logger.info(f"Using cached response for {current_user['user'].email}")
+            yield sse_event({"token": cached_result["text"]})
+            yield sse_event(cached_result, event="done")
+            return
+        
+        start_time = time.time()
+        pieces = []
+        try:
+            async for piece in iterate_cancellable(
+                request, lambda: InferenceService.text_stream(prompt, max_length, cancel_token), cancel_token
+            ):
+                pieces.append(piece)
+                yield sse_event({"token": piece})
+            # A stopped generation ends the stream early with a truncated answer
+            cancel_token.raise_if_cancelled()
+            
+            if "recommend" in prompt.lower():
+                from services.recommendation import RecommendationService
+                recommendations = await run_inference(text_pool, RecommendationService.recommend_from_chat, prompt)
+                piece = f"\n\nRecommendations:\n{recommendations}"
+                pieces.append(piece)
+                yield sse_event({"token": piece})
+        except InferenceCancelled as e:
+            yield sse_event({"detail": f"Generation stopped: {e.reason}"}, event="error")
+            return
+        except HTTPException as e:
+            yield sse_event({"detail": e.detail}, event="error")
+            return
+        except Exception as e:
+            logger.error(f"Text streaming error: {str(e)}")
+            yield sse_event({"detail": "Internal processing error"}, event="error")
+            return
+        
+        result = {
+            "text": "".join(pieces),
+            "processing_time": time.time() - start_time,
+            "model_used": settings.HUGGING_FACE_MODEL_NAME
+        }
+        set_cache(cache_key, result, settings.CACHE_TTL_TEXT)
+        yield sse_event(result, event="done")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/image", response_model=ImageResponse)
 async def ai_image(
+    request: Request,
     file: UploadFile = File(...),
     return_features: Optional[bool] = Form(True),
     analyze: Optional[bool] = Form(True),
+    reuse_near_duplicates: Optional[bool] = Form(None),
+    tiled: Optional[bool] = Form(False),
     background_tasks: BackgroundTasks = None,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_active_user)
 ):
-    """Process medical image and return feature vector and/or analysis"""
+    """Process medical image and return feature vector and/or analysis
+    
+    With ``tiled`` the image is analyzed tile by tile at up to
+    IMAGE_TILE_MAX_SIDE pixels instead of being downsampled as a whole.
+    """
     try:
         start_time = time.time()
         
-        # Read and hash the image file in chunks
-        file_hash = hashlib.sha256()
-        while chunk := await file.read(CHUNK_SIZE):
-            file_hash.update(chunk)
-        file_hash = file_hash.hexdigest()
-        await file.seek(0)  # Reset file pointer
+        # Read the image into memory once and hash it
+        try:
+            data, file_hash = await read_upload(file, settings.IMAGE_UPLOAD_MAX_MB * 1024 ** 2)
+        except UploadTooLarge as e:
+            raise upload_too_large(e)
         
         # Check if we already have this image analyzed
-        cache_key = f"ai:image:{file_hash}"
+        cache_key = f"ai:image:{file_hash}:tiled" if tiled else f"ai:image:{file_hash}"
         cached_result = get_cache(cache_key)
         if cached_result:
             logger.info(f"Using cached analysis for image {file_hash[:8]}")
             return cached_result
         
+        if tiled:
+            # ImageAnalysis rows hold whole-image analyses, so tiled results are only cached
+            try:
+                image = await run_inference(decode_pool, load_for_tiling, data)
+            except (UnidentifiedImageError, ImageTooLarge) as e:
+                raise image_error(e)
+            result = await run_cancellable(request, media_pool, InferenceService.image_tiled, image)
+            result["processing_time"] = time.time() - start_time
+            if not return_features:
+                result["embedding"] = None
+            set_cache(cache_key, result, 86400)  # Cache for 24 hours
+            return result
+        
         # Check database cache
-        existing_analysis = db.query(ImageAnalysis).filter(ImageAnalysis.file_hash == file_hash).first()
+        existing_analysis = await run_in_threadpool(
+            lambda: db.query(ImageAnalysis).filter(ImageAnalysis.file_hash == file_hash).first()
+        )
         if existing_analysis:
             logger.info(f"Using database analysis for image {file_hash[:8]}")
             result = {
@@ -114,11 +348,31 @@ async def ai_image(
             set_cache(cache_key, result, 3600)  # Cache for 1 hour
             return result
         
-        # Save the file in chunks
-        file_path = await save_upload_file(file, file_hash)
+        # Decode and fingerprint from memory on the decode pool
+        try:
+            image, phash = await run_inference(decode_pool, fingerprint_image, data)
+        except (UnidentifiedImageError, ImageTooLarge) as e:
+            raise image_error(e)
         
-        # Process the image
-        result = InferenceService.image(file_path)
+        # Re-exported or re-compressed copies of an analyzed image, only when opted in
+        if settings.IMAGE_NEAR_DUPLICATE_REUSE if reuse_near_duplicates is None else reuse_near_duplicates:
+            similar_analysis = await run_in_threadpool(find_near_duplicate, db, phash)
+            if similar_analysis:
+                analysis, distance = similar_analysis
+                logger.info(f"Using near-duplicate analysis {analysis.file_hash[:8]} for image {file_hash[:8]} (distance {distance})")
+                return {
+                    "embedding": analysis.get_embedding() if return_features else None,
+                    "prediction": analysis.prediction if analyze else None,
+                    "confidence": analysis.confidence if analyze else None,
+                    "processing_time": time.time() - start_time,
+                    "model_used": "cache",
+                    "cached": True,
+                    "near_duplicate_of": analysis.file_hash,
+                    "hamming_distance": distance
+                }
+        
+        inputs = await run_inference(decode_pool, preprocess_decoded, image)
+        result = await run_cancellable(request, media_pool, InferenceService.image_inputs, inputs)
         result["processing_time"] = time.time() - start_time
         
         # Store analysis in database in background
@@ -128,6 +382,7 @@ async def ai_image(
                     filename=file.filename,
                     content_type=file.content_type,
                     file_hash=file_hash,
+                    phash=to_signed(phash),
                     prediction=result.get("prediction"),
                     confidence=result.get("confidence")
                 )
@@ -135,7 +390,9 @@ async def ai_image(
                     analysis.set_embedding(result["embedding"])
                 db.add(analysis)
                 db.commit()
+                PerceptualHashIndex.add(phash, analysis.id)
                 logger.info(f"Saved image analysis for {file_hash[:8]}")
+                ImageSearchService.refresh(db)
                 set_cache(cache_key, result, 86400)  # Cache for 24 hours
             except Exception as e:
                 logger.error(f"Failed to save image analysis: {str(e)}")
@@ -145,12 +402,10 @@ async def ai_image(
             background_tasks.add_task(save_analysis)
         else:
             save_analysis()
-        
-        # Clean up
-        if os.path.exists(file_path):
-            os.remove(file_path)
             
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Image processing error:{str(e)}")
         raise HTTPException(
@@ -158,23 +413,256 @@ async def ai_image(
             detail=f"Image processing failed: {str(e)}"
         )
 
+@router.post("/image/batch", response_model=ImageBatchResponse)
+async def ai_image_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    return_features: Optional[bool] = Form(True),
+    analyze: Optional[bool] = Form(True),
+    reuse_near_duplicates: Optional[bool] = Form(None),
+    background_tasks: BackgroundTasks = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Analyze a series of medical images, running only unseen images through the model in batches"""
+    if len(files) > settings.IMAGE_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.IMAGE_BATCH_MAX_FILES} images per batch"
+        )
+    try:
+        start_time = time.time()
+        
+        # Read and hash every upload; identical files in the series are analyzed once
+        uploads: Dict[str, Dict[str, Any]] = {}
+        file_hashes = []
+        for file in files:
+            try:
+                data, file_hash = await read_upload(file, settings.IMAGE_UPLOAD_MAX_MB * 1024 ** 2)
+            except UploadTooLarge as e:
+                raise upload_too_large(e)
+            file_hashes.append(file_hash)
+            uploads.setdefault(file_hash, {"file": file, "data": data})
+        
+        def view(file_hash: str, analysis: Dict[str, Any], cached: bool) -> Dict[str, Any]:
+            return {
+                "file_hash": file_hash,
+                "embedding": analysis.get("embedding") if return_features else None,
+                "prediction": analysis.get("prediction") if analyze else None,
+                "confidence": analysis.get("confidence") if analyze else None,
+                "cached": cached
+            }
+        
+        # Redis first, one round trip for the whole series
+        unique_hashes = list(uploads)
+        found: Dict[str, Dict[str, Any]] = {}
+        for file_hash, cached_result in zip(unique_hashes, get_cache_many([f"ai:image:{h}" for h in unique_hashes])):
+            if cached_result:
+                found[file_hash] = view(file_hash, cached_result, True)
+        
+        # Then the database, one query for all remaining hashes
+        missing = [h for h in unique_hashes if h not in found]
+        if missing:
+            existing = await run_in_threadpool(
+                lambda: db.query(ImageAnalysis).filter(ImageAnalysis.file_hash.in_(missing)).all()
+            )
+            from_db = {}
+            for analysis in existing:
+                from_db[f"ai:image:{analysis.file_hash}"] = {
+                    "embedding": analysis.get_embedding(),
+                    "prediction": analysis.prediction,
+                    "confidence": analysis.confidence,
+                    "processing_time": 0.0,
+                    "model_used": "cache",
+                    "cached": True
+                }
+                found[analysis.file_hash] = view(analysis.file_hash, from_db[f"ai:image:{analysis.file_hash}"], True)
+            set_cache_many(from_db, 3600)  # Cache for 1 hour
+        
+        # Decode the misses in parallel; undecodable files fail on their own
+        missing = [h for h in unique_hashes if h not in found]
+        logger.info(
+            f"Image batch from {current_user['user'].email}: {len(files)} files, "
+            f"{len(unique_hashes) - len(missing)} cached, {len(missing)} to analyze"
+        )
+        decoded = await map_inference(decode_pool, fingerprint_image, [uploads[h]["data"] for h in missing])
+        reuse = settings.IMAGE_NEAR_DUPLICATE_REUSE if reuse_near_duplicates is None else reuse_near_duplicates
+        fingerprinted = []
+        for file_hash, fingerprint in zip(missing, decoded):
+            if isinstance(fingerprint, Exception):
+                found[file_hash] = {"file_hash": file_hash, "error": image_error(fingerprint).detail}
+                continue
+            image, uploads[file_hash]["phash"] = fingerprint
+            similar_analysis = await run_in_threadpool(find_near_duplicate, db, uploads[file_hash]["phash"]) if reuse else None
+            if similar_analysis:
+                analysis, distance = similar_analysis
+                found[file_hash] = dict(
+                    view(file_hash, {
+                        "embedding": analysis.get_embedding(),
+                        "prediction": analysis.prediction,
+                        "confidence": analysis.confidence
+                    }, True),
+                    near_duplicate_of=analysis.file_hash,
+                    hamming_distance=distance
+                )
+            else:
+                fingerprinted.append((file_hash, image))
+        
+        preprocessed = await map_inference(decode_pool, preprocess_decoded, [image for _, image in fingerprinted])
+        to_analyze = []
+        for (file_hash, _), inputs in zip(fingerprinted, preprocessed):
+            if isinstance(inputs, Exception):
+                found[file_hash] = {"file_hash": file_hash, "error": image_error(inputs).detail}
+            else:
+                to_analyze.append((file_hash, inputs))
+        
+        analyzed = {}
+        if to_analyze:
+            predictions = await run_cancellable(
+                request, media_pool, InferenceService.image_batch, [inputs for _, inputs in to_analyze]
+            )
+            for (file_hash, _), prediction in zip(to_analyze, predictions):
+                analyzed[file_hash] = prediction
+                found[file_hash] = view(file_hash, prediction, False)
+        
+        # Store all new analyses with one insert and one cache round trip
+        def save_analyses():
+            try:
+                already_saved = {
+                    row.file_hash for row in
+                    db.query(ImageAnalysis.file_hash).filter(ImageAnalysis.file_hash.in_(list(analyzed))).all()
+                }
+                db.add_all([
+                    ImageAnalysis(
+                        filename=uploads[file_hash]["file"].filename,
+                        content_type=uploads[file_hash]["file"].content_type,
+                        file_hash=file_hash,
+                        phash=to_signed(uploads[file_hash]["phash"]),
+                        prediction=prediction.get("prediction"),
+                        confidence=prediction.get("confidence"),
+                        embedding=prediction.get("embedding")
+                    )
+                    for file_hash, prediction in analyzed.items()
+                    if file_hash not in already_saved
+                ])
+                db.commit()
+                PerceptualHashIndex.refresh(db, force=True)
+                logger.info(f"Saved {len(analyzed) - len(already_saved)} image analyses")
+                ImageSearchService.refresh(db)
+                set_cache_many({f"ai:image:{h}": p for h, p in analyzed.items()}, 86400)  # Cache for 24 hours
+            except Exception as e:
+                logger.error(f"Failed to save image analyses: {str(e)}")
+                db.rollback()
+        
+        if analyzed:
+            if background_tasks:
+                background_tasks.add_task(save_analyses)
+            else:
+                save_analyses()
+        
+        return {
+            "results": [
+                dict(found[file_hash], filename=file.filename)
+                for file, file_hash in zip(files, file_hashes)
+            ],
+            "analyzed": len(analyzed),
+            "cached": sum(1 for h in unique_hashes if found[h].get("cached")),
+            "processing_time": time.time() - start_time,
+            "model_used": settings.MEDGEMMA_MODEL
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Image batch processing error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Image batch processing failed: {str(e)}"
+        )
+
+@router.post("/image/similar", response_model=SimilarImagesResponse)
+async def ai_image_similar(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    file_hash: Optional[str] = Form(None),
+    top_k: Optional[int] = Form(settings.IMAGE_SIMILAR_TOP_K),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Find previously analyzed images most similar to an uploaded or already analyzed image"""
+    if file is None and not file_hash:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide an image file or the file_hash of an analyzed image"
+        )
+    try:
+        start_time = time.time()
+        top_k = max(1, min(top_k, 100))
+        
+        data = None
+        if file is not None:
+            try:
+                data, file_hash = await read_upload(file, settings.IMAGE_UPLOAD_MAX_MB * 1024 ** 2)
+            except UploadTooLarge as e:
+                raise upload_too_large(e)
+        
+        # Reuse the stored embedding when the image was analyzed before
+        existing_analysis = await run_in_threadpool(
+            lambda: db.query(ImageAnalysis).filter(ImageAnalysis.file_hash == file_hash).first()
+        )
+        embedding = existing_analysis.get_embedding() if existing_analysis else None
+        if embedding is None:
+            if data is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="No analyzed image with this file_hash"
+                )
+            try:
+                inputs = await run_inference(decode_pool, preprocess_image, data)
+            except (UnidentifiedImageError, ImageTooLarge) as e:
+                raise image_error(e)
+            result = await run_cancellable(request, media_pool, InferenceService.image_inputs, inputs)
+            embedding = result.get("embedding")
+            if embedding is None:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Image model does not expose a vision encoder for embeddings"
+                )
+        
+        results = await run_in_threadpool(ImageSearchService.search, db, embedding, top_k, file_hash)
+        return {
+            "file_hash": file_hash,
+            "results": results,
+            "processing_time": time.time() - start_time,
+            "backend": ImageSearchService.backend(db)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Similar image search error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Similar image search failed: {str(e)}"
+        )
+
 @router.post("/audio", response_model=AudioResponse)
 async def ai_audio(
+    request: Request,
     file: UploadFile = File(...),
     background_tasks: BackgroundTasks = None,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Process audio file and return transcription"""
+    upload = None
     try:
         start_time = time.time()
         
-        # Read and hash the audio file in chunks
-        file_hash = hashlib.sha256()
-        while chunk := await file.read(CHUNK_SIZE):
-            file_hash.update(chunk)
-        file_hash = file_hash.hexdigest()
-        await file.seek(0)  # Reset file pointer
+        # Hash the audio while spooling it to disk, reading the upload once
+        try:
+            upload = await spool_upload(file, settings.AUDIO_UPLOAD_MAX_MB * 1024 ** 2)
+        except UploadTooLarge as e:
+            raise upload_too_large(e)
+        file_hash = upload.file_hash
         
         # Check cache first
         cache_key = f"ai:audio:{file_hash}"
@@ -184,9 +672,11 @@ async def ai_audio(
             return cached_result
         
         # Check database cache
-        existing_transcription = db.query(AudioTranscription).filter(
-            AudioTranscription.file_hash == file_hash
-        ).first()
+        existing_transcription = await run_in_threadpool(
+            lambda: db.query(AudioTranscription).filter(
+                AudioTranscription.file_hash == file_hash
+            ).first()
+        )
         
         if existing_transcription:
             logger.info(f"Using database transcription for audio {file_hash[:8]}")
@@ -200,11 +690,18 @@ async def ai_audio(
             set_cache(cache_key, result, 3600)  # Cache for 1 hour
             return result
         
-        # Save the file in chunks
-        file_path = await save_upload_file(file, file_hash)
-        
-        # Process the audio
-        result = InferenceService.audio(file_path)
+        # Decode and resample the spooled copy off the model workers, then transcribe
+        try:
+            duration = await run_inference(audio_decode_pool, audio_duration, upload.file)
+            audio = await run_inference(audio_decode_pool, load_audio, upload.file)
+        except UnsupportedAudio:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Unsupported or corrupt audio file"
+            )
+        finally:
+            upload.close()
+        result = await run_cancellable(request, media_pool, InferenceService.transcribe, audio, duration=duration)
         result["processing_time"] = time.time() - start_time
         
         # Store transcription in database in background
@@ -230,18 +727,166 @@ async def ai_audio(
             background_tasks.add_task(save_transcription)
         else:
             save_transcription()
-        
-        # Clean up
-        if os.path.exists(file_path):
-            os.remove(file_path)
             
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Audio processing error: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Audio processing failed: {str(e)}"
         )
+    finally:
+        if upload is not None:
+            upload.close()
+
+async def stream_step(transcriber: StreamingTranscriber, cancel_token: CancellationToken, final: bool = False):
+    """Events of one transcription step of a live stream
+    
+    Intermediate steps are best effort: when the pool is full or the step
+    runs past its deadline nothing is sent, and the next step covers the
+    same audio. The final step waits for a free slot.
+    """
+    while True:
+        try:
+            return await media_pool.run(transcriber.step, final, cancel_token=cancel_token)
+        except InferenceQueueFull:
+            if not final:
+                return []
+            await asyncio.sleep(1)
+        except InferenceCancelled:
+            if final:
+                raise
+            return []
+
+async def send_stream_step(websocket: WebSocket, transcriber: StreamingTranscriber, cancel_token: CancellationToken):
+    for event in await stream_step(transcriber, cancel_token):
+        await websocket.send_json(event)
+
+async def finish_stream(transcriber: StreamingTranscriber, step: Optional[asyncio.Task], start_time: float):
+    """Finalize a live transcription and save it as an AudioTranscription
+    
+    Waits for the running intermediate ``step`` first. Uses its own session,
+    since it may outlive the request that started it.
+    """
+    if step is not None:
+        try:
+            await step
+        except Exception:
+            # Its events could not be sent; segments it finalized are kept
+            pass
+    events = await stream_step(transcriber, CancellationToken(settings.INFERENCE_TIMEOUT_SECONDS), final=True)
+    result = transcriber.result()
+    result["processing_time"] = time.time() - start_time
+    file_hash = transcriber.hash.hexdigest()
+    
+    def save_transcription():
+        db = SessionLocal()
+        try:
+            if db.query(AudioTranscription).filter(AudioTranscription.file_hash == file_hash).first():
+                return
+            transcription = AudioTranscription(
+                filename="stream",
+                content_type=f"audio/{transcriber.encoding}",
+                file_hash=file_hash,
+                transcription=result["transcript"],
+                language_detected=result["language_detected"],
+                duration_seconds=result["duration_seconds"]
+            )
+            db.add(transcription)
+            db.commit()
+            logger.info(f"Saved streamed transcription for {file_hash[:8]}")
+        except Exception as e:
+            logger.error(f"Failed to save streamed transcription: {str(e)}")
+            db.rollback()
+        finally:
+            db.close()
+    
+    await run_in_threadpool(save_transcription)
+    return events, result
+
+@router.websocket("/audio/stream")
+async def ai_audio_stream(
+    websocket: WebSocket,
+    encoding: str = "pcm_s16le",
+    sample_rate: int = 16000,
+    current_user: Dict[str, Any] = Depends(get_websocket_user)
+):
+    """Transcribe a live audio stream
+    
+    Binary messages carry audio: mono little-endian int16 PCM at
+    ``sample_rate``, or one raw Opus packet each with ``encoding=opus``.
+    The server sends ``partial`` events for the utterance in progress and
+    ``final`` events with segments that will not change. A ``{"type": "stop"}``
+    text message (or closing the socket) finalizes the transcript, which is
+    sent as a ``done`` event and saved as an AudioTranscription.
+    """
+    await websocket.accept()
+    try:
+        transcriber = StreamingTranscriber(encoding, sample_rate)
+    except (ValueError, RuntimeError) as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
+        return
+    
+    start_time = time.time()
+    step: Optional[asyncio.Task] = None
+    step_token: Optional[CancellationToken] = None
+    connected = True
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                connected = False
+                break
+            if message.get("bytes"):
+                transcriber.feed(message["bytes"])
+            elif message.get("text"):
+                # A malformed control message is reported without dropping the audio received so far
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    control = None
+                if not isinstance(control, dict):
+                    await websocket.send_json({"type": "error", "detail": "Text messages must be JSON objects"})
+                    continue
+                if control.get("type") == "stop":
+                    break
+            
+            if transcriber.duration > settings.AUDIO_STREAM_MAX_SECONDS:
+                await websocket.send_json({"type": "error", "detail": "Maximum stream duration reached"})
+                break
+            # One step at a time; audio arriving meanwhile is picked up by the next one
+            if (step is None or step.done()) and transcriber.due():
+                if step is not None:
+                    step.result()
+                step_token = CancellationToken(settings.INFERENCE_TIMEOUT_SECONDS)
+                step = asyncio.create_task(send_stream_step(websocket, transcriber, step_token))
+        
+        if not transcriber.duration:
+            if connected:
+                await websocket.close()
+            return
+        
+        # Finish and save the transcript even if the client went away or the handler is cancelled
+        events, result = await asyncio.shield(asyncio.ensure_future(finish_stream(transcriber, step, start_time)))
+        if connected:
+            for event in events:
+                await websocket.send_json(event)
+            await websocket.send_json({"type": "done", **result})
+            await websocket.close()
+    except Exception as e:
+        logger.error(f"Audio stream error: {str(e)}")
+        if connected:
+            try:
+                await websocket.send_json({"type": "error", "detail": f"Audio streaming failed: {str(e)}"})
+                await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+            except Exception:
+                pass
+    finally:
+        if step_token is not None:
+            step_token.cancel(CancellationToken.CLIENT_DISCONNECTED)
 
 @router.post("/recommend")
 async def recommend_doctors(
@@ -259,12 +904,16 @@ async def recommend_doctors(
             return cached_result
             
         from services.recommendation import RecommendationService
-        recommendations = RecommendationService.recommend_doctors(db, symptoms, lat, lng)
+        recommendations = await run_inference(
+            text_pool, RecommendationService.recommend_doctors, db, symptoms, lat, lng
+        )
         
         # Cache for 1 hour
         set_cache(cache_key, recommendations, 3600)
         
         return recommendations
+    except HTTPException:
+        raise
     except Exception as e: 
         logger.error(f"Recommendation error: {str(e)}")
         raise HTTPException(
@@ -8,6 +8,10 @@ import httpx
 from typing import Dict, Any, List
 from core.logging import logger
 from core.config import settings
+from services.executor import pool_stats
+from services.replicas import ReplicaPool
+from utils.model_loader import ModelLoader
+from services.warmup import ModelWarmup
 import socket
 import os
 from fastapi import Request
@@ -85,6 +89,19 @@ def get_system_disk_usage():
         logger.error(f"فشل الحصول على استخدام القرص: {str(e)}")
         return -1
 
+def get_process_memory() -> Dict[str, Any]:
+    """ذاكرة العامل الحالي؛ uss هي الذاكرة الخاصة به وحده (غير المشتركة مع العمال الآخرين)"""
+    try:
+        info = psutil.Process().memory_full_info()
+        return {
+            "pid": os.getpid(),
+            "rss_mb": round(info.rss / 1024 ** 2, 1),
+            "uss_mb": round(info.uss / 1024 ** 2, 1)
+        }
+    except Exception as e:
+        logger.error(f"فشل قياس ذاكرة العامل: {str(e)}")
+        return {"pid": os.getpid()}
+
 @router.get("/health")
 async def health_check():
     """فحص صحة النظام الأساسي وقياس أداء API"""
@@ -97,8 +114,14 @@ async def health_check():
             "memory_usage": psutil.virtual_memory().percent,
             "disk_usage": get_system_disk_usage(),
             "gpu_available": torch.cuda.is_available(),
+            "inference_queues": pool_stats(),
+            "models": ModelLoader.stats(),
+            "worker_memory": get_process_memory(),
         }
         
+        if ReplicaPool.active():
+            health_data["replicas"] = ReplicaPool.get().stats()
+        
         # معلومات GPU إذا كانت متوفرة
         if torch.cuda.is_available():
             health_data["gpu_count"] = torch.cuda.device_count()
@@ -116,6 +139,18 @@ async def health_check():
             content={"status": "error", "message": str(e)}
         )
 
+@router.get("/ready")
+async def readiness_check():
+    """جاهزية الخادم لاستقبال الطلبات: 200 بعد تحميل جميع النماذج وتسخينها، وإلا 503"""
+    ready = ModelWarmup.ready()
+    content = {"status": "ready" if ready else "not_ready", "models": ModelWarmup.status()}
+    if ReplicaPool.active():
+        replicas = ReplicaPool.get().stats()
+        content["replicas_alive"] = sum(replica["alive"] for replica in replicas)
+        ready = ready and content["replicas_alive"] == len(replicas)
+        content["status"] = "ready" if ready else "not_ready"
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
 @router.get("/health/detailed")
 async def detailed_health_check(request: Request):
     """فحص صحة مفصل يتضمن سرعة نقاط النهاية وتقييم تجربة المستخدم"""
@@ -13,9 +13,50 @@ class ImageResponse(BaseModel):
     confidence: Optional[float] = None
     processing_time: float
     model_used: str
+    near_duplicate_of: Optional[str] = None
+    hamming_distance: Optional[int] = None
+    tiles: Optional[int] = None
+    
+class ImageBatchItem(BaseModel):
+    filename: Optional[str] = None
+    file_hash: str
+    embedding: Optional[List[float]] = None
+    prediction: Optional[str] = None
+    confidence: Optional[float] = None
+    cached: bool = False
+    near_duplicate_of: Optional[str] = None
+    hamming_distance: Optional[int] = None
+    error: Optional[str] = None
+    
+class ImageBatchResponse(BaseModel):
+    results: List[ImageBatchItem]
+    analyzed: int
+    cached: int
+    processing_time: float
+    model_used: str
+    
+class SimilarImage(BaseModel):
+    file_hash: str
+    filename: Optional[str] = None
+    prediction: Optional[str] = None
+    confidence: Optional[float] = None
+    similarity: float
+    
+class SimilarImagesResponse(BaseModel):
+    file_hash: str
+    results: List[SimilarImage]
+    processing_time: float
+    backend: str
+    
+class AudioSegment(BaseModel):
+    start: float
+    end: float
+    text: str
     
 class AudioResponse(BaseModel):
     transcript: str
+    segments: Optional[List[AudioSegment]] = None
+    chunks: Optional[int] = None
     language_detected: Optional[str] = None
     duration_seconds: Optional[str] = None
     duration_seconds: float
@@ -0,0 +1,300 @@
+"""Replay a JSONL file of inference jobs through InferenceService without HTTP
+
+Usage:
+    python -m scripts.batch_infer jobs.jsonl --output results.jsonl [--resume]
+
+Each input line is one job:
+    {"id": "c-1", "type": "text", "prompt": "...", "max_length": 512, "profile": "beam"}
+    {"id": "c-2", "type": "image", "file": "scans/chest.png"}
+    {"id": "c-3", "type": "audio", "file": "calls/visit.wav"}
+
+The file is streamed in windows of --window jobs. Text jobs of a window are
+grouped by max_length and profile, sorted by token length and generated in
+padded batches, so prompts of similar length share a batch. Results are
+written in input order; after every window a checkpoint next to the output
+records how far the run got, and --resume continues from it. Repeated jobs
+are answered from an in-run cache (and the semantic cache with
+--semantic-cache).
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.logging import logger
+from services.decoding import UNBATCHABLE_PROFILES, profile_for, resolve_profile
+from services.inference import InferenceService
+from services.semantic_cache import SemanticCache
+from utils.model_loader import ModelLoader
+
+class BatchRunner:
+    """Run windows of jobs and keep the counters behind the final report"""
+
+    def __init__(self, batch_size: int, semantic_cache: bool = False):
+        self.batch_size = batch_size
+        self.semantic_cache = semantic_cache
+        self.cache: Dict[Tuple, Dict[str, Any]] = {}
+        self.stats: Dict[str, Any] = {"jobs": 0, "failed": 0, "cache_hits": 0, "elapsed": 0.0, "latencies": []}
+
+    def run_window(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Process one window of jobs and return their results in input order"""
+        start_time = time.time()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+        pending: Dict[Tuple, List[int]] = {}
+
+        for index, job in enumerate(jobs):
+            try:
+                key = self._cache_key(job)
+            except Exception as e:
+                results[index] = self._failed(job, e)
+                continue
+            cached = self.cache.get(key) or self._semantic_lookup(job)
+            if cached is not None:
+                results[index] = self._done(job, cached, 0.0, cached=True)
+            else:
+                # Duplicates inside the window run once and share the answer
+                pending.setdefault(key, []).append(index)
+
+        text_groups: Dict[Tuple[int, str], List[Tuple]] = {}
+        for key, indexes in pending.items():
+            job = jobs[indexes[0]]
+            if job["type"] == "text":
+                text_groups.setdefault((job["max_length"], job["profile"]), []).append(key)
+            else:
+                self._run_media(key, indexes, jobs, results)
+
+        for (max_length, profile), keys in text_groups.items():
+            self._run_text_group(max_length, profile, keys, pending, jobs, results)
+
+        self.stats["elapsed"] += time.time() - start_time
+        return results
+
+    def report(self) -> Dict[str, Any]:
+        latencies = np.array(self.stats["latencies"]) if self.stats["latencies"] else np.zeros(1)
+        jobs = self.stats["jobs"]
+        elapsed = self.stats["elapsed"]
+        return {
+            "jobs": jobs,
+            "failed": self.stats["failed"],
+            "elapsed_seconds": round(elapsed, 2),
+            "throughput_per_second": round(jobs / elapsed, 3) if elapsed else 0.0,
+            "latency_p50_seconds": round(float(np.percentile(latencies, 50)), 3),
+            "latency_p99_seconds": round(float(np.percentile(latencies, 99)), 3),
+            "cache_hit_rate": round(self.stats["cache_hits"] / jobs, 3) if jobs else 0.0,
+        }
+
+    def _cache_key(self, job: Dict[str, Any]) -> Tuple:
+        if job["type"] == "text":
+            return ("text", SemanticCache.normalize(job["prompt"]), job["max_length"], job["profile"])
+        # Media jobs are keyed by content so copies of the same file run once
+        digest = hashlib.sha256()
+        with open(job["file"], "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return (job["type"], digest.hexdigest())
+
+    def _semantic_lookup(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not self.semantic_cache or job["type"] != "text":
+            return None
+        return SemanticCache.lookup(job["prompt"], f"batch:{job['max_length']}:{job['profile']}")
+
+    def _run_media(self, key: Tuple, indexes: List[int], jobs: List[Dict[str, Any]], results: List):
+        job = jobs[indexes[0]]
+        start_time = time.time()
+        try:
+            value = getattr(InferenceService, job["type"])(job["file"])
+        except Exception as e:
+            for index in indexes:
+                results[index] = self._failed(jobs[index], e)
+            return
+        self._finish(key, indexes, jobs, results, value, time.time() - start_time)
+
+    def _run_text_group(
+        self,
+        max_length: int,
+        profile: str,
+        keys: List[Tuple],
+        pending: Dict[Tuple, List[int]],
+        jobs: List[Dict[str, Any]],
+        results: List
+    ):
+        _, tokenizer = ModelLoader.get_text_model()
+        prompts = [jobs[pending[key][0]]["prompt"] for key in keys]
+        lengths = [len(ids) for ids in tokenizer(prompts, add_special_tokens=False)["input_ids"]]
+        order = sorted(range(len(keys)), key=lambda i: lengths[i])
+        batch_size = 1 if profile in UNBATCHABLE_PROFILES else self.batch_size
+
+        for start in range(0, len(order), batch_size):
+            batch = [keys[i] for i in order[start:start + batch_size]]
+            batch_prompts = [jobs[pending[key][0]]["prompt"] for key in batch]
+            start_time = time.time()
+            try:
+                texts = InferenceService.text_batch(batch_prompts, max_length, profile)
+            except Exception as e:
+                if len(batch) == 1:
+                    for index in pending[batch[0]]:
+                        results[index] = self._failed(jobs[index], e)
+                    continue
+                # Retry one by one so a single bad prompt does not fail the whole batch
+                logger.warning(f"Batch of {len(batch)} prompts failed, retrying individually: {str(e)}")
+                for key in batch:
+                    self._run_text_group(max_length, profile, [key], pending, jobs, results)
+                continue
+
+            latency = time.time() - start_time
+            for key, text in zip(batch, texts):
+                value = {
+                    "text": text,
+                    "processing_time": latency,
+                    "model_used": settings.HUGGING_FACE_MODEL_NAME
+                }
+                self._finish(key, pending[key], jobs, results, value, latency)
+                if self.semantic_cache:
+                    job = jobs[pending[key][0]]
+                    SemanticCache.store(job["prompt"], f"batch:{max_length}:{profile}", value)
+
+    def _finish(self, key: Tuple, indexes: List[int], jobs: List[Dict[str, Any]], results: List, value, latency: float):
+        self.cache[key] = value
+        results[indexes[0]] = self._done(jobs[indexes[0]], value, latency, cached=False)
+        for index in indexes[1:]:
+            results[index] = self._done(jobs[index], value, 0.0, cached=True)
+
+    def _done(self, job: Dict[str, Any], value: Dict[str, Any], latency: float, cached: bool) -> Dict[str, Any]:
+        self.stats["jobs"] += 1
+        self.stats["latencies"].append(latency)
+        if cached:
+            self.stats["cache_hits"] += 1
+        return {"id": job["id"], "type": job["type"], "ok": True, "cached": cached, "latency": round(latency, 4), "result": value}
+
+    def _failed(self, job: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        logger.error(f"Batch job {job['id']} failed: {str(error)}")
+        self.stats["jobs"] += 1
+        self.stats["failed"] += 1
+        return {"id": job["id"], "type": job["type"], "ok": False, "error": str(error)}
+
+def parse_job(line_number: int, line: str, default_max_length: int, default_profile: str) -> Dict[str, Any]:
+    """Normalize one JSONL line into a job dict; malformed lines become failing jobs"""
+    try:
+        job = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {"id": str(line_number), "type": "invalid", "error": f"Invalid JSON: {str(e)}"}
+    if not isinstance(job, dict):
+        return {"id": str(line_number), "type": "invalid", "error": "Each line must be a JSON object"}
+
+    job.setdefault("id", str(line_number))
+    job.setdefault("type", "text" if "prompt" in job else "image")
+    if job["type"] == "text":
+        if not isinstance(job.get("prompt"), str):
+            return {"id": job["id"], "type": "invalid", "error": "Text jobs need a prompt"}
+        try:
+            job["max_length"] = int(job.get("max_length", default_max_length))
+        except (TypeError, ValueError):
+            return {"id": job["id"], "type": "invalid", "error": "max_length must be an integer"}
+        if job["max_length"] <= 0:
+            return {"id": job["id"], "type": "invalid", "error": "max_length must be positive"}
+        profile = job.get("profile", default_profile)
+        if profile is not None and not isinstance(profile, str):
+            return {"id": job["id"], "type": "invalid", "error": "profile must be a string"}
+        job["profile"] = resolve_profile(profile)
+    elif job["type"] in ("image", "audio"):
+        if not job.get("file"):
+            return {"id": job["id"], "type": "invalid", "error": f"{job['type'].capitalize()} jobs need a file"}
+    else:
+        return {"id": job["id"], "type": "invalid", "error": f"Unknown job type '{job['type']}'"}
+    return job
+
+def read_windows(path: Path, skip: int, window: int, **defaults) -> Iterator[List[Dict[str, Any]]]:
+    with open(path, "r", encoding="utf-8") as f:
+        numbered = ((number, line) for number, line in enumerate(f, start=1) if line.strip())
+        for number, _ in islice(numbered, skip):
+            pass
+        while True:
+            lines = list(islice(numbered, window))
+            if not lines:
+                return
+            yield [parse_job(number, line, **defaults) for number, line in lines]
+
+def load_checkpoint(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(path: Path, checkpoint: Dict[str, Any]):
+    # Write-then-rename so an interrupted run never leaves a half-written checkpoint
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of jobs")
+    parser.add_argument("--output", required=True, help="JSONL file to write results to")
+    parser.add_argument("--batch-size", type=int, default=settings.TEXT_BATCH_MAX_SIZE)
+    parser.add_argument("--window", type=int, default=256, help="Jobs read, sorted and checkpointed together")
+    parser.add_argument("--max-length", type=int, default=512, help="Default max_length for text jobs")
+    parser.add_argument("--profile", default=profile_for("batch"), help="Default decoding profile for text jobs")
+    parser.add_argument("--semantic-cache", action="store_true", help="Reuse answers of near-duplicate prompts")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint of a previous run")
+    parser.add_argument("--report", help="Write the final report as JSON to this path")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    output_path = Path(args.output)
+    checkpoint_path = output_path.with_name(output_path.name + ".checkpoint")
+    runner = BatchRunner(args.batch_size, args.semantic_cache)
+
+    checkpoint = load_checkpoint(checkpoint_path) if args.resume else None
+    if checkpoint and checkpoint["input"] != str(input_path.resolve()):
+        raise SystemExit(f"Checkpoint {checkpoint_path} belongs to {checkpoint['input']}")
+    skip = checkpoint["jobs_done"] if checkpoint else 0
+    if checkpoint:
+        runner.stats = checkpoint["stats"]
+        logger.info(f"Resuming batch run after {skip} jobs")
+
+    with open(output_path, "a+b" if checkpoint else "wb") as out:
+        if checkpoint:
+            # Drop results written after the last checkpoint; those jobs run again
+            out.truncate(checkpoint["output_bytes"])
+        out.seek(0, os.SEEK_END)
+
+        defaults = {"default_max_length": args.max_length, "default_profile": args.profile}
+        for jobs in read_windows(input_path, skip, args.window, **defaults):
+            valid = [job for job in jobs if job["type"] != "invalid"]
+            results = iter(runner.run_window(valid))
+            for job in jobs:
+                if job["type"] == "invalid":
+                    result = {"id": job["id"], "type": "invalid", "ok": False, "error": job["error"]}
+                    runner.stats["jobs"] += 1
+                    runner.stats["failed"] += 1
+                else:
+                    result = next(results)
+                out.write((json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8"))
+            out.flush()
+            os.fsync(out.fileno())
+
+            skip += len(jobs)
+            save_checkpoint(checkpoint_path, {
+                "input": str(input_path.resolve()),
+                "jobs_done": skip,
+                "output_bytes": out.tell(),
+                "stats": runner.stats
+            })
+            logger.info(f"Batch run: {skip} jobs done, {runner.report()['throughput_per_second']} jobs/s")
+
+    report = runner.report()
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Export models ahead of deployment: ONNX graphs, or converted safetensors checkpoints
+
+Usage:
+    python -m scripts.export_models --model text [--optimize O2] [--output DIR]
+    python -m scripts.export_models --model image --convert
+
+The exported graph and tokenizer are written to EXPORTED_MODELS_DIR/<model>,
+where ModelLoader picks them up when TEXT_BACKEND=onnx. The image model has
+no ONNX export path and runs through torch.compile instead (IMAGE_BACKEND=compile).
+
+With --convert, the model is loaded once from its original checkpoint and
+saved as safetensors in the dtype of the configured CPU_PRECISION under
+CONVERTED_MODELS_DIR, which later boots load from. Run it once per model and
+precision on the deploy host; serving processes never write the copy.
+"""
+import argparse
+import time
+from pathlib import Path
+
+from core.config import settings
+from core.logging import logger
+from utils.model_loader import ModelLoader
+
+def export_text_model(output: Path, optimize: str = ""):
+    try:
+        from optimum.onnxruntime import ORTModelForCausalLM, ORTOptimizer
+        from optimum.onnxruntime.configuration import AutoOptimizationConfig
+    except ImportError as e:
+        raise SystemExit("ONNX export requires `pip install optimum[onnxruntime]`") from e
+    from transformers import AutoTokenizer
+
+    source = ModelLoader._get_model_path() if settings.TEST_MODE else settings.HUGGING_FACE_MODEL_NAME
+    logger.info(f"Exporting text model {source} to ONNX at {output}")
+    start_time = time.time()
+
+    model = ORTModelForCausalLM.from_pretrained(
+        source,
+        export=True,
+        use_cache=True,
+        trust_remote_code=True
+    )
+    tokenizer = AutoTokenizer.from_pretrained(source, trust_remote_code=True)
+    model.save_pretrained(output)
+    tokenizer.save_pretrained(output)
+
+    if optimize:
+        # Graph fusions (attention, GELU, layer norm) for the CPU execution provider
+        optimizer = ORTOptimizer.from_pretrained(model)
+        optimization_config = getattr(AutoOptimizationConfig, optimize)()
+        optimizer.optimize(save_dir=output, optimization_config=optimization_config)
+
+    logger.info(f"Text model exported in {time.time() - start_time:.2f}s")
+
+def convert_model(model_type: str):
+    if not settings.CONVERTED_MODELS_DIR:
+        raise SystemExit("CONVERTED_MODELS_DIR is empty; set it to where converted checkpoints should go")
+    if ModelLoader.backend_for(model_type) == "onnx":
+        raise SystemExit(f"The {model_type} model runs on the onnx backend, which loads the exported graph instead")
+    # ModelLoader logs where the copy was written, or that the model already loads from one
+    start_time = time.time()
+    ModelLoader.convert(model_type)
+    logger.info(f"Converted {model_type} model in {time.time() - start_time:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", choices=["text", "draft", "image", "audio"], default="text")
+    parser.add_argument("--convert", action="store_true", help="Write a converted safetensors checkpoint instead of an ONNX graph")
+    parser.add_argument("--optimize", choices=["O1", "O2", "O3"], default="", help="ONNX Runtime graph optimization level")
+    parser.add_argument("--output", help="Output directory (defaults to EXPORTED_MODELS_DIR/<model>)")
+    args = parser.parse_args()
+
+    if args.convert:
+        convert_model(args.model)
+        return
+    if args.model != "text":
+        raise SystemExit("Only the text model can be exported to ONNX; use --convert for the others")
+
+    output = Path(args.output) if args.output else ModelLoader.exported_model_path(args.model)
+    output.mkdir(parents=True, exist_ok=True)
+    export_text_model(output, args.optimize)
+
+if __name__ == "__main__":
+    main()
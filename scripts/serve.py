@@ -0,0 +1,166 @@
+"""Production launcher: load models once, then fork HTTP workers that share them
+
+Usage:
+    python -m scripts.serve --workers 4 [--host 0.0.0.0] [--port 5000]
+
+The parent process loads every model in WARMUP_MODELS, puts them in
+inference mode and freezes the garbage collector, then binds the listening
+socket and forks the workers. Forked workers see the parent's memory
+copy-on-write, so the weights are kept once per machine instead of once per
+worker; each worker runs its own warmup pass and reports /ready when done.
+The parent restarts workers that exit and periodically logs how much
+memory each worker holds on its own (USS), which is what an extra worker
+actually costs.
+
+CPU only: CUDA contexts do not survive fork. Model replicas, idle eviction
+and the memory budget are turned off in this mode, since a worker that
+unloads a shared model frees nothing and would reload a private copy.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+import psutil
+import torch
+import uvicorn
+
+from core.config import settings
+from core.logging import logger
+from utils.model_loader import ModelLoader
+
+def preload_models():
+    """Load every model in WARMUP_MODELS in parallel and wait for all of them"""
+    models = list(dict.fromkeys(settings.WARMUP_MODELS))
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, len(models)), thread_name_prefix="preload") as executor:
+        for _ in executor.map(lambda model_type: getattr(ModelLoader, f"get_{model_type}_model")(), models):
+            pass
+    ModelLoader.freeze()
+    logger.info(
+        f"Preloaded {', '.join(models) or 'no'} models in {time.time() - start_time:.2f}s "
+        f"({ModelLoader.resident_bytes() / 1024 ** 2:.0f} MB)"
+    )
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def spawn_worker(index: int, sock: socket.socket, args) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # Worker: default signal handling for uvicorn, and a collector that only
+    # tracks objects created from here on
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    gc.enable()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    config = uvicorn.Config("main:app", workers=1, log_level=args.log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    try:
+        server.run(sockets=[sock])
+    finally:
+        os._exit(0)
+
+def memory_report(workers: Dict[int, int]) -> str:
+    """Resident, proportional and unique memory of the parent and every worker, in MB"""
+    lines = [f"{'process':<12}{'pid':>8}{'rss MB':>10}{'pss MB':>10}{'uss MB':>10}"]
+    processes = [("parent", os.getpid())] + [(f"worker {index}", pid) for pid, index in sorted(workers.items(), key=lambda item: item[1])]
+    for name, pid in processes:
+        try:
+            info = psutil.Process(pid).memory_full_info()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        lines.append(
+            f"{name:<12}{pid:>8}{info.rss / 1024 ** 2:>10.0f}"
+            f"{getattr(info, 'pss', 0) / 1024 ** 2:>10.0f}{info.uss / 1024 ** 2:>10.0f}"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=0, help="Torch threads per worker (default: cores / workers)")
+    parser.add_argument("--report-seconds", type=float, default=300, help="Interval of the per-worker memory report")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if torch.cuda.is_available():
+        raise SystemExit("Pre-fork serving is CPU only; run one worker per GPU with uvicorn instead")
+    if settings.SERVING_REPLICAS > 1:
+        raise SystemExit("Pre-fork serving shares models between workers; set SERVING_REPLICAS=0")
+    if settings.MODEL_IDLE_TIMEOUT_SECONDS or settings.MODEL_MEMORY_BUDGET_MB:
+        logger.warning("Model idle eviction and memory budget are disabled in pre-fork serving")
+        settings.MODEL_IDLE_TIMEOUT_SECONDS = 0
+        settings.MODEL_MEMORY_BUDGET_MB = 0
+    if not args.threads:
+        args.threads = max(1, (os.cpu_count() or 1) // args.workers)
+
+    # Objects created while loading never become garbage; keeping the collector
+    # off avoids fragmenting them across pages the workers would then copy
+    gc.disable()
+    import main as _  # noqa: F401  import the app once, so workers inherit it
+    from db.database import engine, init_db
+    # Create the schema before forking, so the workers' startups do not race to
+    # create the same tables, and close the connection instead of sharing it
+    init_db()
+    engine.dispose()
+    preload_models()
+    gc.collect()
+    # Move everything alive into the permanent generation: collections in the
+    # workers no longer write to these objects' headers, so their pages stay shared
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    logger.info(f"Serving on {args.host}:{args.port} with {args.workers} pre-forked workers")
+    workers = {spawn_worker(index, sock, args): index for index in range(args.workers)}
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    next_report = time.monotonic() + min(args.report_seconds, 30)
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            index = workers.pop(pid)
+            if not stopping:
+                logger.warning(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+                workers[spawn_worker(index, sock, args)] = index
+            continue
+        if args.report_seconds > 0 and time.monotonic() >= next_report and not stopping:
+            logger.info(f"Worker memory:\n{memory_report(workers)}")
+            next_report = time.monotonic() + args.report_seconds
+        time.sleep(0.5)
+    sock.close()
+    logger.info("All workers stopped")
+
+if __name__ == "__main__":
+    main()
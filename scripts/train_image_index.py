@@ -0,0 +1,51 @@
+"""Train the IVF lists of the on-disk image embedding index
+
+Usage:
+    python -m scripts.train_image_index [--lists 1024] [--iterations 10] [--sample-size 100000] [--force]
+
+Run offline (cron, a deploy hook) once the index outgrows exhaustive search.
+The index is first brought up to date with the database, then k-means runs
+on a sample without blocking the web workers, which keep appending rows and
+pick the new lists up on their next search. Re-running retrains the lists
+from scratch. Not needed on PostgreSQL with pgvector, which searches through
+its HNSW index instead.
+"""
+import argparse
+import time
+
+from core.config import settings
+from core.logging import logger
+from db.database import SessionLocal
+from services.image_search import ImageSearchService
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lists", type=int, default=settings.IMAGE_INDEX_IVF_LISTS, help="Number of IVF lists")
+    parser.add_argument("--iterations", type=int, default=10, help="k-means iterations")
+    parser.add_argument("--sample-size", type=int, default=100_000, help="Embeddings sampled for k-means")
+    parser.add_argument("--force", action="store_true", help="Train below IMAGE_INDEX_IVF_MIN_ROWS or retrain existing lists")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if ImageSearchService.uses_pgvector(db):
+            raise SystemExit("Image search runs on pgvector; there is no on-disk index to train")
+        ImageSearchService.refresh(db)
+    finally:
+        db.close()
+
+    index = ImageSearchService.index()
+    index.ivf_lists = args.lists
+    if not args.force and not index.needs_ivf:
+        reason = "already trained" if index.uses_ivf else f"below {index.ivf_min_rows} embeddings"
+        logger.info(f"Image search index has {len(index)} embeddings and is {reason}; use --force to train anyway")
+        return
+
+    start_time = time.time()
+    lists = index.train_ivf(iterations=args.iterations, sample_size=args.sample_size)
+    if not lists:
+        raise SystemExit(f"Image search index has {len(index)} embeddings, too few to cluster")
+    logger.info(f"Image search index trained in {time.time() - start_time:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+from math import ceil, gcd
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+from core.config import settings
+
+# Whisper's feature extractor expects 16 kHz mono
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+# Frames louder than this always count as speech, so recordings without any
+# pause (where the quietest frames are speech too) are never dropped
+SPEECH_FLOOR_DB = -40.0
+
+# Input frames decoded per block when streaming a file through the resampler
+READ_BLOCK_SECONDS = 10
+
+class UnsupportedAudio(ValueError):
+    """Raised when an upload cannot be decoded as audio"""
+
+AudioSource = Union[str, BinaryIO]
+
+def _rewind(source: AudioSource) -> AudioSource:
+    """libsndfile reads a file object from its current position, so start it over"""
+    if not isinstance(source, str):
+        source.seek(0)
+    return source
+
+def audio_duration(source: AudioSource) -> Optional[float]:
+    """Duration in seconds from the container header, without decoding; None if libsndfile cannot read it"""
+    try:
+        info = sf.info(_rewind(source))
+    except (sf.LibsndfileError, RuntimeError):
+        return None
+    return info.frames / info.samplerate if info.frames > 0 else None
+
+def load_audio(source: AudioSource) -> np.ndarray:
+    """Decode an audio file, given as a path or a seekable binary file object, to 16 kHz mono float32
+
+    libsndfile (WAV, FLAC, Ogg, MP3, ...) is read block by block: every
+    block is down-mixed and run through a polyphase resampler as it is
+    decoded, so neither the multichannel nor the full-rate signal is ever
+    held in memory. Containers libsndfile cannot open fall back to librosa,
+    which needs the file's path.
+    """
+    file_path = source if isinstance(source, str) else getattr(source, "name", None)
+    try:
+        source = sf.SoundFile(_rewind(source))
+    except (sf.LibsndfileError, RuntimeError):
+        if not isinstance(file_path, str):
+            raise UnsupportedAudio("Cannot decode audio from an unnamed file object")
+        # librosa is slow to import and only needed for formats like AAC/M4A
+        import librosa
+        try:
+            audio, _ = librosa.load(file_path, sr=SAMPLE_RATE, mono=True)
+        except Exception as e:
+            raise UnsupportedAudio(f"Cannot decode {file_path}: {e}") from e
+        return audio.astype(np.float32, copy=False)
+
+    with source:
+        factor = gcd(source.samplerate, SAMPLE_RATE)
+        up, down = SAMPLE_RATE // factor, source.samplerate // factor
+        blocks = (
+            block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+            for block in source.blocks(
+                blocksize=max(down, READ_BLOCK_SECONDS * source.samplerate // down * down),
+                dtype="float32",
+                always_2d=True
+            )
+        )
+        if up == down:
+            return np.concatenate(list(blocks)) if source.frames else np.zeros(0, dtype=np.float32)
+        return _resample_blocks(blocks, up, down)
+
+def _resample_blocks(blocks, up: int, down: int) -> np.ndarray:
+    """resample_poly over a signal arriving in blocks, equal to resampling it in one piece
+
+    Each block is filtered together with ``context`` neighbouring input
+    samples on both sides (at least the filter's half-length), and only the
+    outputs those neighbours fully determine are kept. Block sizes and the
+    context are multiples of ``down``, so every block's output starts
+    exactly on the output sample grid.
+    """
+    # resample_poly's default Kaiser filter spans 10 * max(up, down) upsampled taps per side
+    context = ceil(10 * max(up, down) / up / down) * down + down
+    trim = context * up // down
+    outputs = []
+    total = 0
+    history = np.zeros(context, dtype=np.float32)  # the signal is zero before its start
+    pending = np.zeros(0, dtype=np.float32)
+    for block in blocks:
+        total += len(block)
+        pending = np.concatenate([pending, block])
+        if len(pending) < context + down:
+            continue
+        # Keep the last `context` samples back as look-ahead for the next block
+        ready = (len(pending) - context) // down * down
+        window = np.concatenate([history, pending])
+        outputs.append(resample_poly(window[:context + ready + context], up, down)[trim:-trim])
+        history = window[ready:ready + context]
+        pending = pending[ready:]
+
+    window = np.concatenate([history, pending, np.zeros(context, dtype=np.float32)])
+    outputs.append(resample_poly(window, up, down)[trim:])
+    return np.concatenate(outputs)[:ceil(total * up / down)].astype(np.float32, copy=False)
+
+def frame_energies(audio: np.ndarray, frame: int) -> np.ndarray:
+    """RMS level in dBFS of consecutive ``frame``-sample frames"""
+    frames = len(audio) // frame
+    if len(audio) % frame:
+        frames += 1
+        audio = np.pad(audio, (0, frames * frame - len(audio)))
+    power = np.square(audio.reshape(frames, frame), dtype=np.float32).mean(axis=1)
+    return 10 * np.log10(np.maximum(power, 1e-10))
+
+def speech_segments(energies: np.ndarray, min_silence: int, pad: int) -> List[Tuple[int, int]]:
+    """Voiced [start, end) frame ranges from an energy VAD
+
+    A frame is voiced when it is more than AUDIO_VAD_MARGIN_DB above the
+    noise floor (the 10th percentile level) or above SPEECH_FLOOR_DB.
+    Pauses shorter than ``min_silence`` frames are bridged and every range
+    is widened by ``pad`` frames, so word onsets and tails are kept.
+    """
+    if not len(energies):
+        return []
+    threshold = min(float(np.percentile(energies, 10)) + settings.AUDIO_VAD_MARGIN_DB, SPEECH_FLOOR_DB)
+    voiced = np.concatenate([[False], energies > threshold, [False]])
+    edges = np.flatnonzero(np.diff(voiced.astype(np.int8)))
+    segments = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        start, end = max(0, start - pad), min(len(energies), end + pad)
+        if segments and start - segments[-1][1] < min_silence:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    return segments
+
+def plan_chunks(segments: List[Tuple[int, int]], energies: np.ndarray, max_frames: int) -> List[Tuple[int, int]]:
+    """Pack voiced ranges into [start, end) frame chunks of at most ``max_frames``
+
+    Consecutive ranges share a chunk while they fit, so chunks end in pauses.
+    A range longer than the limit is cut at its quietest frame in the second
+    half of the window, which is the most likely point between two words.
+    """
+    chunks = []
+    for start, end in segments:
+        while end - start > max_frames:
+            window = energies[start + max_frames // 2:start + max_frames]
+            cut = start + max_frames // 2 + int(np.argmin(window))
+            chunks.append((start, cut))
+            start = cut
+        if chunks and end - chunks[-1][0] <= max_frames:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
+
+def split_on_speech(audio: np.ndarray) -> List[Tuple[int, int]]:
+    """[start, end) sample ranges of the voiced parts, each fitting Whisper's window"""
+    frame = SAMPLE_RATE * FRAME_MS // 1000
+    energies = frame_energies(audio, frame)
+    segments = speech_segments(
+        energies,
+        min_silence=settings.AUDIO_VAD_MIN_SILENCE_MS // FRAME_MS,
+        pad=settings.AUDIO_VAD_PAD_MS // FRAME_MS
+    )
+    max_frames = int(settings.AUDIO_CHUNK_SECONDS * 1000) // FRAME_MS
+    return [
+        (int(start) * frame, min(int(end) * frame, len(audio)))
+        for start, end in plan_chunks(segments, energies, max_frames)
+    ]
+
+def stitch_segments(
+    spans: List[Tuple[int, int]],
+    pieces: List[List[Tuple[float, float, str]]],
+    offset: float = 0.0
+) -> List[Dict[str, Any]]:
+    """Chunk-relative (start, end, text) segments placed on the recording timeline, in order
+
+    ``spans`` are the chunks' sample ranges and ``offset`` is the time in
+    seconds of sample 0; timestamps never run past the end of their chunk.
+    """
+    segments = []
+    for (start, end), chunk_pieces in zip(spans, pieces):
+        chunk_start, chunk_end = offset + start / SAMPLE_RATE, offset + end / SAMPLE_RATE
+        segments.extend(
+            {
+                "start": round(min(chunk_start + piece_start, chunk_end), 2),
+                "end": round(min(chunk_start + piece_end, chunk_end), 2),
+                "text": text
+            }
+            for piece_start, piece_end, text in chunk_pieces
+        )
+    return segments
@@ -0,0 +1,152 @@
+import hashlib
+import threading
+from math import gcd
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from core.config import settings
+from services.audio_io import FRAME_MS, SAMPLE_RATE, split_on_speech, stitch_segments
+from services.cancellation import CancellationToken
+from services.inference import InferenceService
+
+ENCODINGS = ("pcm_s16le", "opus")
+
+def _opus_decoder():
+    """Raw Opus packet decoder producing 16 kHz mono; requires opuslib"""
+    try:
+        import opuslib
+    except ImportError as e:
+        raise RuntimeError("Opus streams require `pip install opuslib`") from e
+    return opuslib.Decoder(SAMPLE_RATE, 1)
+
+class StreamingTranscriber:
+    """Rolling-buffer transcription of a live audio stream
+
+    Frames are appended with ``feed``. Each ``step`` runs the VAD over the
+    audio not yet finalized: chunks followed by a pause (or cut at Whisper's
+    window) are transcribed as final segments and dropped from the buffer,
+    while the utterance still in progress is transcribed as a partial result
+    that later steps replace. The buffer therefore stays around one chunk
+    long however long the stream runs.
+    """
+
+    # Longest Opus frame (120 ms at 48 kHz), so any packet fits the output buffer
+    OPUS_MAX_FRAME = 5760
+
+    def __init__(self, encoding: str = "pcm_s16le", sample_rate: int = SAMPLE_RATE):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported encoding {encoding!r}, expected one of {', '.join(ENCODINGS)}")
+        self._decoder = _opus_decoder() if encoding == "opus" else None
+        # Opus is decoded straight to 16 kHz whatever rate it was encoded at
+        self.sample_rate = SAMPLE_RATE if self._decoder else sample_rate
+        if self.sample_rate <= 0 or self.sample_rate * FRAME_MS % 1000:
+            raise ValueError(f"Unsupported sample rate {sample_rate}")
+        self.encoding = encoding
+        self.segments: List[Dict[str, Any]] = []
+        self.hash = hashlib.sha256()
+
+        self._lock = threading.Lock()
+        self._parts: List[np.ndarray] = []
+        self._remainder = b""
+        self._committed = 0  # input-rate samples already finalized or dropped
+        self._received = 0
+        self._stepped = 0
+
+    @property
+    def duration(self) -> float:
+        return self._received / self.sample_rate
+
+    def feed(self, data: bytes):
+        """Append one binary frame: little-endian int16 PCM or a single Opus packet"""
+        self.hash.update(data)
+        if self._decoder is not None:
+            data = self._decoder.decode(data, self.OPUS_MAX_FRAME)
+        else:
+            # A sample may be split across two frames
+            data, self._remainder = self._remainder + data, b""
+            if len(data) % 2:
+                data, self._remainder = data[:-1], data[-1:]
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+        with self._lock:
+            self._parts.append(samples)
+            self._received += len(samples)
+
+    def due(self) -> bool:
+        """Whether enough audio arrived since the last step to update the transcript"""
+        return self._received - self._stepped >= settings.AUDIO_STREAM_STEP_SECONDS * self.sample_rate
+
+    def step(self, final: bool = False, cancel_token: Optional[CancellationToken] = None) -> List[Dict[str, Any]]:
+        """Transcribe the pending audio and return the ``final`` and ``partial`` events to send
+
+        With ``final`` the whole buffer is finalized, as when the stream ends.
+        """
+        with self._lock:
+            window = np.concatenate(self._parts) if self._parts else np.zeros(0, dtype=np.float32)
+            self._parts = [window]
+            committed = self._committed
+            self._stepped = self._received
+
+        audio = self._resample(window)
+        offset = committed / self.sample_rate
+        spans = split_on_speech(audio)
+        if final:
+            closed = spans
+        else:
+            # A chunk is settled once a pause long enough to split on follows it
+            settled = len(audio) - SAMPLE_RATE * settings.AUDIO_VAD_MIN_SILENCE_MS // 1000
+            closed = [span for span in spans if span[1] <= settled]
+        pending = spans[len(closed):]
+
+        pieces = InferenceService.audio_chunks([audio[start:end] for start, end in spans], cancel_token)
+        events = []
+        if closed:
+            segments = stitch_segments(closed, pieces[:len(closed)], offset)
+            self.segments.extend(segments)
+            events.append({"type": "final", "segments": segments})
+        if pending:
+            partial = stitch_segments(pending, pieces[len(closed):], offset)
+            events.append({
+                "type": "partial",
+                "text": " ".join(segment["text"] for segment in partial),
+                "start": round(offset + pending[0][0] / SAMPLE_RATE, 2),
+                "end": round(offset + len(audio) / SAMPLE_RATE, 2)
+            })
+
+        if final:
+            cut = len(audio)
+        elif closed:
+            cut = closed[-1][1]
+        elif not pending:
+            # Only silence so far; keep the padding the VAD may need for the next onset
+            frame = SAMPLE_RATE * FRAME_MS // 1000
+            cut = max(0, len(audio) - SAMPLE_RATE * settings.AUDIO_VAD_PAD_MS // 1000) // frame * frame
+        else:
+            cut = 0
+        self._commit(round(cut * self.sample_rate / SAMPLE_RATE))
+        return events
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "transcript": " ".join(segment["text"] for segment in self.segments),
+            "segments": self.segments,
+            "language_detected": settings.SPEECH_LANGUAGE,
+            "duration_seconds": self.duration,
+            "model_used": settings.SPEECH_MODEL
+        }
+
+    def _resample(self, samples: np.ndarray) -> np.ndarray:
+        if self.sample_rate == SAMPLE_RATE:
+            return samples
+        factor = gcd(self.sample_rate, SAMPLE_RATE)
+        return resample_poly(samples, SAMPLE_RATE // factor, self.sample_rate // factor).astype(np.float32)
+
+    def _commit(self, samples: int):
+        """Drop ``samples`` finalized input-rate samples from the front of the buffer"""
+        if not samples:
+            return
+        with self._lock:
+            window = np.concatenate(self._parts)
+            self._parts = [window[samples:]]
+            self._committed += samples
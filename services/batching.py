@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.logging import logger
+from services.cancellation import CancellationToken, InferenceCancelled
+
+GenerateFn = Callable[[List[str], int, Optional[str], List[Optional[CancellationToken]]], List[str]]
+
+class _PendingPrompt:
+    """A prompt waiting in the scheduler queue together with its result future"""
+
+    __slots__ = ("prompt", "max_length", "profile", "cancel_token", "future")
+
+    def __init__(
+        self,
+        prompt: str,
+        max_length: int,
+        profile: Optional[str],
+        cancel_token: Optional[CancellationToken]
+    ):
+        self.prompt = prompt
+        self.max_length = max_length
+        self.profile = profile
+        self.cancel_token = cancel_token
+        self.future: Future = Future()
+
+class TextBatchScheduler:
+    """Groups concurrent text prompts into padded batches for a single generate call"""
+
+    _instance: Optional["TextBatchScheduler"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        generate_fn: GenerateFn,
+        max_batch_size: int,
+        wait_ms: int
+    ):
+        self._generate_fn = generate_fn
+        self._max_batch_size = max(1, max_batch_size)
+        self._wait_seconds = max(0, wait_ms) / 1000.0
+        self._queue: "queue.Queue[_PendingPrompt]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls, generate_fn: GenerateFn) -> "TextBatchScheduler":
+        """Return the process-wide scheduler, creating it on first use"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(
+                        generate_fn,
+                        settings.TEXT_BATCH_MAX_SIZE,
+                        settings.TEXT_BATCH_WAIT_MS
+                    )
+        return cls._instance
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(
+        self,
+        prompt: str,
+        max_length: int,
+        profile: Optional[str] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Future:
+        """Queue a prompt and return a future resolving to its decoded text"""
+        self._ensure_started()
+        pending = _PendingPrompt(prompt, max_length, profile, cancel_token)
+        self._queue.put(pending)
+        return pending.future
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="text-batch-scheduler",
+                    daemon=True
+                )
+                self._thread.start()
+
+    def _collect_batch(self) -> List[_PendingPrompt]:
+        """Block for the first prompt, then gather more until the wait window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._wait_seconds
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # Prompts with different length limits or decoding profiles cannot share one generate call
+            groups: Dict[Tuple[int, Optional[str]], List[_PendingPrompt]] = {}
+            for pending in batch:
+                groups.setdefault((pending.max_length, pending.profile), []).append(pending)
+
+            for (max_length, profile), items in groups.items():
+                self._execute(items, max_length, profile)
+
+    def _execute(self, items: List[_PendingPrompt], max_length: int, profile: Optional[str]):
+        # Drop prompts whose callers already gave up or whose deadline passed in the queue
+        runnable = []
+        for item in items:
+            if not item.future.set_running_or_notify_cancel():
+                continue
+            if item.cancel_token is not None and item.cancel_token.is_cancelled():
+                item.future.set_exception(InferenceCancelled(item.cancel_token.reason))
+                continue
+            runnable.append(item)
+        items = runnable
+        if not items:
+            return
+
+        try:
+            start_time = time.time()
+            results = self._generate_fn(
+                [item.prompt for item in items],
+                max_length,
+                profile,
+                [item.cancel_token for item in items]
+            )
+            logger.info(
+                f"Text batch of {len(items)} completed in {time.time() - start_time:.2f}s"
+            )
+        except Exception as e:
+            logger.error(f"Text batch error: {str(e)}")
+            for item in items:
+                item.future.set_exception(e)
+            return
+
+        for item, result in zip(items, results):
+            item.future.set_result(result)
@@ -0,0 +1,61 @@
+import threading
+import time
+from typing import List, Optional
+
+import torch
+from transformers import StoppingCriteria
+
+class InferenceCancelled(Exception):
+    """Raised when a request was cancelled or ran past its deadline"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+    @property
+    def deadline_exceeded(self) -> bool:
+        return self.reason == CancellationToken.DEADLINE_EXCEEDED
+
+class CancellationToken:
+    """Deadline plus cancel flag shared between a request handler and its inference job"""
+
+    DEADLINE_EXCEEDED = "deadline exceeded"
+    CLIENT_DISCONNECTED = "client disconnected"
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def is_cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel(self.DEADLINE_EXCEEDED)
+            return True
+        return False
+
+    def raise_if_cancelled(self):
+        if self.is_cancelled():
+            raise InferenceCancelled(self.reason)
+
+class CancellationCriteria(StoppingCriteria):
+    """Stops the rows of a generate call whose requests were cancelled, checked between decode steps"""
+
+    def __init__(self, tokens: List[Optional[CancellationToken]]):
+        self.tokens = tokens
+
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> torch.BoolTensor:
+        flags = [token is not None and token.is_cancelled() for token in self.tokens]
+        rows = input_ids.shape[0]
+        if not any(flags):
+            return torch.zeros(rows, dtype=torch.bool, device=input_ids.device)
+
+        # Beams and sampled sequences of one request occupy consecutive rows
+        per_request = torch.tensor(flags, dtype=torch.bool, device=input_ids.device)
+        return per_request.repeat_interleave(rows // len(self.tokens))
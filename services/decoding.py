@@ -0,0 +1,89 @@
+from typing import Any, Dict, List, Optional
+
+import torch
+from transformers import StoppingCriteria
+
+from core.config import settings
+from core.logging import logger
+from utils.model_loader import ModelLoader
+
+# Generation arguments per decoding profile; "beam" is the historical default
+DECODING_PROFILES: Dict[str, Dict[str, Any]] = {
+    "greedy": {
+        "do_sample": False,
+        "num_beams": 1,
+        "no_repeat_ngram_size": 3,
+    },
+    "beam": {
+        "num_beams": 4,
+        "no_repeat_ngram_size": 3,
+        "early_stopping": True,
+    },
+    # Greedy acceptance with a small draft model proposing tokens for the main model
+    "speculative": {
+        "do_sample": False,
+        "num_beams": 1,
+        "no_repeat_ngram_size": 3,
+    },
+}
+
+# Assisted generation only supports one sequence per generate call
+UNBATCHABLE_PROFILES = {"speculative"}
+
+_shared_vocab: Dict[int, bool] = {}
+
+def profile_for(endpoint: str) -> str:
+    """Decoding profile configured for an endpoint, falling back to the global default"""
+    return settings.DECODING_PROFILES_BY_ENDPOINT.get(endpoint, settings.TEXT_DECODING_PROFILE)
+
+def resolve_profile(profile: Optional[str]) -> str:
+    profile = profile or settings.TEXT_DECODING_PROFILE
+    if profile not in DECODING_PROFILES:
+        logger.warning(f"Unknown decoding profile '{profile}', using beam search")
+        return "beam"
+    if profile == "speculative" and not settings.DRAFT_MODEL_NAME:
+        logger.warning("Speculative decoding requested without DRAFT_MODEL_NAME, using greedy")
+        return "greedy"
+    if profile == "speculative" and ModelLoader.backend_for("text") == "onnx":
+        logger.warning("Speculative decoding is not supported on the onnx backend, using greedy")
+        return "greedy"
+    return profile
+
+def generation_kwargs(profile: Optional[str], tokenizer) -> Dict[str, Any]:
+    """Build model.generate keyword arguments for a decoding profile"""
+    profile = resolve_profile(profile)
+    kwargs = dict(DECODING_PROFILES[profile])
+
+    if profile == "speculative":
+        draft_model, draft_tokenizer = ModelLoader.get_draft_model()
+        kwargs["assistant_model"] = draft_model
+        kwargs["num_assistant_tokens"] = settings.DRAFT_NUM_ASSISTANT_TOKENS
+        if not _shares_vocab(tokenizer, draft_tokenizer):
+            # Universal assisted decoding re-tokenizes between the two vocabularies
+            kwargs["tokenizer"] = tokenizer
+            kwargs["assistant_tokenizer"] = draft_tokenizer
+
+    return kwargs
+
+def _shares_vocab(tokenizer, draft_tokenizer) -> bool:
+    key = id(draft_tokenizer)
+    if key not in _shared_vocab:
+        _shared_vocab[key] = tokenizer.get_vocab() == draft_tokenizer.get_vocab()
+    return _shared_vocab[key]
+
+class TokenBudgetCriteria(StoppingCriteria):
+    """Stops each row of a left-padded batch once it has generated its own request's new tokens
+
+    A shared ``max_length`` counts the padded prompt, so a short prompt
+    batched with a long one would get fewer new tokens than it gets alone.
+    """
+
+    def __init__(self, prompt_length: int, budgets: List[int]):
+        self.prompt_length = prompt_length
+        self.budgets = budgets
+
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> torch.BoolTensor:
+        generated = input_ids.shape[1] - self.prompt_length
+        done = torch.tensor([generated >= budget for budget in self.budgets], dtype=torch.bool, device=input_ids.device)
+        # Beams and sampled sequences of one request occupy consecutive rows
+        return done.repeat_interleave(input_ids.shape[0] // len(self.budgets))
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from core.config import settings
+from core.logging import logger
+
+class InferenceQueueFull(Exception):
+    """Raised when an inference pool cannot accept more work"""
+
+class InferencePool:
+    """Bounded worker pool that keeps blocking model calls off the event loop"""
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0  # submitted and not finished (queued + running)
+        self._running = 0
+        self._rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    def is_full(self) -> bool:
+        return self._pending >= self.capacity
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Schedule a blocking call, failing fast when the queue is full"""
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                logger.warning(
+                    f"{self.name} inference queue full ({self._pending} pending), rejecting request"
+                )
+                raise InferenceQueueFull(f"{self.name} inference queue is full")
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix=f"inference-{self.name}"
+                )
+            executor = self._executor
+
+        def call():
+            with self._lock:
+                self._running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        future = executor.submit(call)
+        # Released when the job finishes or is cancelled before it started
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Await a blocking call executed on this pool"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    async def map(self, fn: Callable[..., Any], items: Iterable[Any]) -> List[Any]:
+        """Await ``fn(item)`` for every item, keeping at most ``workers`` of them on this pool at once
+
+        A large batch then waits on the caller's side instead of filling the
+        queue, which would reject it and every other request with
+        InferenceQueueFull. Exceptions are returned in place of their results.
+        """
+        slots = asyncio.Semaphore(self.workers)
+
+        async def run_one(item):
+            async with slots:
+                return await self.run(fn, item)
+
+        return await asyncio.gather(*(run_one(item) for item in items), return_exceptions=True)
+
+    def _release(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": max(0, self._pending - self._running),
+                "capacity": self.capacity,
+                "rejected": self._rejected
+            }
+
+# Text callers mostly wait on the batch scheduler, so the pool must be wide
+# enough to fill a batch; image and audio calls run the model themselves.
+text_pool = InferencePool(
+    "text",
+    settings.TEXT_INFERENCE_WORKERS,
+    settings.INFERENCE_QUEUE_SIZE
+)
+media_pool = InferencePool(
+    "media",
+    settings.INFERENCE_WORKERS,
+    settings.INFERENCE_QUEUE_SIZE
+)
+# Image decoding and preprocessing, overlapped with model execution on media_pool
+decode_pool = InferencePool(
+    "decode",
+    settings.IMAGE_DECODE_WORKERS,
+    settings.INFERENCE_QUEUE_SIZE
+)
+
+# Audio decoding and resampling to 16 kHz, kept apart from image decoding since
+# one long recording occupies a worker for seconds
+audio_decode_pool = InferencePool(
+    "audio_decode",
+    settings.AUDIO_DECODE_WORKERS,
+    settings.INFERENCE_QUEUE_SIZE
+)
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    return {pool.name: pool.stats() for pool in (text_pool, media_pool, decode_pool, audio_decode_pool)}
@@ -0,0 +1,192 @@
+import io
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from transformers import BatchFeature
+
+from core.config import settings
+from utils.model_loader import ModelLoader
+
+HASH_MIN_SIZE = 256
+
+# PIL's own decompression-bomb guard, aligned with ours
+Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
+
+def target_size(processor) -> Optional[Tuple[int, int]]:
+    """(width, height) the image processor resizes to, if it has a fixed target"""
+    image_processor = getattr(processor, "image_processor", processor)
+    size = getattr(image_processor, "size", None) or {}
+    if "height" in size and "width" in size:
+        return size["width"], size["height"]
+    if "shortest_edge" in size:
+        return size["shortest_edge"], size["shortest_edge"]
+    return None
+
+class ImageTooLarge(ValueError):
+    """Raised when an upload cannot be decoded within the per-request limits"""
+
+# Bytes per pixel and band of the modes scans come in; everything else is 8-bit
+_MODE_BYTES = {"I": 4, "F": 4, "I;16": 2, "I;16B": 2, "I;16L": 2, "I;16N": 2}
+
+def _open(data: bytes) -> Image.Image:
+    """Read an image header; PIL refuses images past twice MAX_IMAGE_PIXELS on its own"""
+    try:
+        return Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e)) from e
+
+def _decoded_bytes(image: Image.Image) -> int:
+    width, height = image.size
+    # convert("RGB") keeps the decoded source and its RGB copy alive together
+    source = width * height * len(image.getbands()) * _MODE_BYTES.get(image.mode, 1)
+    return source + width * height * 3
+
+def _reduce_on_load(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """Pick a smaller stored resolution before any pixel data is decoded
+
+    JPEG draft mode lets libjpeg decode straight to the smallest 1/2, 1/4 or
+    1/8 scale that is still at least ``size``; pyramidal TIFFs store reduced
+    levels as extra frames, of which the smallest one still covering
+    ``size`` is selected.
+    """
+    if image.format == "JPEG":
+        image.draft("RGB", size)
+    elif image.format == "TIFF" and getattr(image, "n_frames", 1) > 1:
+        best_frame, best_pixels = 0, image.size[0] * image.size[1]
+        for frame in range(1, image.n_frames):
+            image.seek(frame)
+            width, height = image.size
+            if width >= size[0] and height >= size[1] and width * height < best_pixels:
+                best_frame, best_pixels = frame, width * height
+        image.seek(best_frame)
+    return image
+
+def _vips_thumbnail(data: bytes, size: Tuple[int, int]) -> Optional[Image.Image]:
+    """Shrink-on-load through libvips, which streams the file in tiles; None without pyvips"""
+    try:
+        import pyvips
+    except ImportError:
+        return None
+    thumbnail = pyvips.Image.thumbnail_buffer(data, size[0], height=size[1], size="down")
+    # Drop alpha the way PIL's convert("RGB") does, so grey + alpha cannot stay two bands
+    if thumbnail.hasalpha():
+        thumbnail = thumbnail.extract_band(0, n=thumbnail.bands - 1)
+    if thumbnail.interpretation != "srgb":
+        # Also scales grey16 and rgb16 down to 8 bits
+        thumbnail = thumbnail.colourspace("srgb")
+    if thumbnail.bands == 1:
+        thumbnail = thumbnail.bandjoin([thumbnail, thumbnail])
+    elif thumbnail.bands > 3:
+        thumbnail = thumbnail.extract_band(0, n=3)
+    if thumbnail.format == "ushort":
+        # Keep the high byte of 16-bit samples instead of clipping them at 255
+        thumbnail = thumbnail.cast("uchar", shift=True)
+    elif thumbnail.format != "uchar":
+        thumbnail = thumbnail.cast("uchar")
+    pixels = np.ndarray(
+        buffer=thumbnail.write_to_memory(),
+        dtype=np.uint8,
+        shape=(thumbnail.height, thumbnail.width, thumbnail.bands)
+    )
+    return Image.fromarray(pixels, "RGB")
+
+def decode_image(data: bytes, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Decode an image from memory as RGB within the per-request memory cap
+
+    Only the header is read before deciding how to decode. Uploads over
+    IMAGE_MAX_PIXELS are rejected outright. When ``size`` is given, the
+    image is decoded at a reduced stored resolution where the format has
+    one; if the decode would still exceed IMAGE_DECODE_MEMORY_MB, it falls
+    back to a tile-streaming libvips thumbnail (when pyvips is installed)
+    or raises ImageTooLarge.
+    """
+    image = _open(data)
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ImageTooLarge(f"Image of {width}x{height} pixels exceeds the {settings.IMAGE_MAX_PIXELS} pixel limit")
+
+    if size is not None:
+        image = _reduce_on_load(image, size)
+    if _decoded_bytes(image) > settings.IMAGE_DECODE_MEMORY_MB * 1024 ** 2:
+        thumbnail = _vips_thumbnail(data, size or (settings.IMAGE_TILE_MAX_SIDE, settings.IMAGE_TILE_MAX_SIDE))
+        if thumbnail is None:
+            raise ImageTooLarge(
+                f"Decoding a {width}x{height} {image.format} image needs more than "
+                f"{settings.IMAGE_DECODE_MEMORY_MB} MB"
+            )
+        return thumbnail
+    return image.convert("RGB")
+
+def load_for_tiling(data: bytes) -> Image.Image:
+    """Decode an upload for tiled inference, at no more than IMAGE_TILE_MAX_SIDE pixels per side"""
+    with _open(data) as header:
+        width, height = header.size
+    # Largest 1/2^n reduction within the cap, matching the scales JPEG draft mode decodes at
+    factor = 1
+    while max(width, height) / factor > settings.IMAGE_TILE_MAX_SIDE and factor < 8:
+        factor *= 2
+    image = decode_image(data, (max(1, width // factor), max(1, height // factor)))
+    image.thumbnail((settings.IMAGE_TILE_MAX_SIDE, settings.IMAGE_TILE_MAX_SIDE))
+    return image
+
+def tile_boxes(width: int, height: int, tile: int, overlap: int) -> List[Tuple[int, int, int, int]]:
+    """Crop boxes of ``tile`` pixels covering the image, neighbours overlapping by ``overlap``"""
+    def starts(length: int) -> List[int]:
+        if length <= tile:
+            return [0]
+        stride = max(1, tile - overlap)
+        positions = list(range(0, length - tile, stride))
+        return positions + [length - tile]
+
+    return [
+        (left, top, min(left + tile, width), min(top + tile, height))
+        for top in starts(height)
+        for left in starts(width)
+    ]
+
+def preprocess_image(data: bytes) -> BatchFeature:
+    """Decode upload bytes and run the image processor, producing model inputs on CPU"""
+    processor = ModelLoader.get_image_processor()
+    return preprocess_decoded(decode_image(data, target_size(processor)))
+
+def fingerprint_image(data: bytes) -> Tuple[Image.Image, int]:
+    """Decode upload bytes for the image processor and compute their perceptual hash"""
+    processor = ModelLoader.get_image_processor()
+    size = target_size(processor)
+    if size is not None:
+        # Draft decoding must not shrink the image so far that the hash becomes unstable
+        size = (max(size[0], HASH_MIN_SIZE), max(size[1], HASH_MIN_SIZE))
+    image = decode_image(data, size)
+    return image, perceptual_hash(image)
+
+def preprocess_decoded(image: Image.Image) -> BatchFeature:
+    return ModelLoader.get_image_processor()(images=image, return_tensors="pt")
+
+def prepare_image(data: bytes) -> Tuple[BatchFeature, int]:
+    """Model inputs and perceptual hash of upload bytes, decoding them once"""
+    image, phash = fingerprint_image(data)
+    return preprocess_decoded(image), phash
+
+@lru_cache(maxsize=1)
+def _dct_matrix(size: int = 32) -> np.ndarray:
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+def perceptual_hash(image: Image.Image) -> int:
+    """64-bit DCT perceptual hash (pHash)
+
+    The image is reduced to 32x32 grayscale and the 8x8 lowest DCT
+    frequencies are thresholded at their median, so re-exports,
+    re-compression and rescaling change only a few bits.
+    """
+    gray = image.convert("L").resize((32, 32), Image.Resampling.LANCZOS)
+    dct = _dct_matrix() @ np.asarray(gray, dtype=np.float32) @ _dct_matrix().T
+    low = dct[:8, :8].flatten()
+    # The DC term only tracks overall brightness and is left out of the median
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
@@ -0,0 +1,161 @@
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import Float
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.logging import logger
+from db.types import PgVector
+from models.multimodal import ImageAnalysis
+from services.vector_index import MemmapVectorIndex
+
+class ImageSearchService:
+    """Nearest-neighbour search over stored image embeddings
+
+    On PostgreSQL with pgvector the query runs in the database and uses the
+    HNSW cosine index on ``image_analyses.embedding``. Elsewhere embeddings are
+    mirrored into a memory-mapped float16 index on disk (MemmapVectorIndex),
+    shared by all worker processes through the page cache and extended with
+    rows saved since the last search.
+    """
+
+    # Rows may commit out of id order; rescanning this many ids below the newest
+    # indexed one picks up transactions that were still in flight last time
+    REFRESH_OVERLAP = 256
+
+    _index: Optional[MemmapVectorIndex] = None
+    _index_lock = threading.Lock()
+
+    @staticmethod
+    def uses_pgvector(db: Session) -> bool:
+        return db.get_bind().dialect.name == "postgresql" and PgVector is not None
+
+    @classmethod
+    def backend(cls, db: Session) -> str:
+        if cls.uses_pgvector(db):
+            return "pgvector"
+        return "ivf" if cls.index().uses_ivf else "mmap"
+
+    @classmethod
+    def index(cls) -> MemmapVectorIndex:
+        if cls._index is None:
+            with cls._index_lock:
+                if cls._index is None:
+                    directory = Path(settings.IMAGE_INDEX_DIR)
+                    if not directory.is_absolute():
+                        directory = Path(__file__).resolve().parents[1] / directory
+                    cls._index = MemmapVectorIndex(
+                        directory,
+                        "image_embeddings",
+                        settings.IMAGE_EMBEDDING_DIM,
+                        ivf_lists=settings.IMAGE_INDEX_IVF_LISTS,
+                        ivf_min_rows=settings.IMAGE_INDEX_IVF_MIN_ROWS,
+                        ivf_probes=settings.IMAGE_INDEX_IVF_PROBES
+                    )
+        return cls._index
+
+    @classmethod
+    def search(
+        cls,
+        db: Session,
+        embedding: List[float],
+        top_k: int,
+        exclude_hash: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Most similar stored images by cosine similarity, best first"""
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        if cls.uses_pgvector(db):
+            matches = cls._search_pgvector(db, query, top_k + 1)
+        else:
+            matches = cls._search_index(db, query, top_k + 1)
+
+        results = []
+        for analysis, similarity in matches:
+            if analysis.file_hash == exclude_hash:
+                continue
+            results.append({
+                "file_hash": analysis.file_hash,
+                "filename": analysis.filename,
+                "prediction": analysis.prediction,
+                "confidence": analysis.confidence,
+                "similarity": similarity
+            })
+        return results[:top_k]
+
+    @classmethod
+    def _search_pgvector(cls, db: Session, query: np.ndarray, limit: int):
+        # <=> is pgvector's cosine distance, served by the vector_cosine_ops HNSW index
+        distance = ImageAnalysis.embedding.op("<=>", return_type=Float)(query)
+        rows = (
+            db.query(ImageAnalysis, distance.label("distance"))
+            .filter(ImageAnalysis.embedding.isnot(None))
+            .order_by(distance)
+            .limit(limit)
+            .all()
+        )
+        return [(analysis, 1.0 - float(distance)) for analysis, distance in rows]
+
+    @classmethod
+    def _search_index(cls, db: Session, query: np.ndarray, limit: int):
+        cls.refresh(db)
+        ids, similarities = cls.index().search(query, limit)
+        if not len(ids):
+            return []
+
+        # Rows deleted from the database since they were indexed are skipped here
+        analyses = {
+            analysis.id: analysis
+            for analysis in db.query(ImageAnalysis).filter(ImageAnalysis.id.in_(ids.tolist())).all()
+        }
+        return [
+            (analyses[int(row_id)], float(similarity))
+            for row_id, similarity in zip(ids, similarities)
+            if int(row_id) in analyses
+        ]
+
+    @classmethod
+    def refresh(cls, db: Session) -> int:
+        """Append embeddings of rows saved since the last refresh; returns the number added"""
+        if cls.uses_pgvector(db):
+            return 0
+        index = cls.index()
+        last_ids = index.last_ids(1)
+        since = int(last_ids[0]) - cls.REFRESH_OVERLAP if len(last_ids) else 0
+        added = 0
+        while True:
+            ids = np.array([
+                row_id for row_id, in
+                db.query(ImageAnalysis.id)
+                .filter(ImageAnalysis.id > since, ImageAnalysis.embedding.isnot(None))
+                .order_by(ImageAnalysis.id)
+                .limit(MemmapVectorIndex.BLOCK_ROWS)
+                .all()
+            ], dtype=np.int64)
+            if not len(ids):
+                break
+            # Only load the embeddings the index does not have yet
+            missing = ids[~np.isin(ids, index.last_ids(len(ids) + cls.REFRESH_OVERLAP))]
+            if len(missing):
+                rows = (
+                    db.query(ImageAnalysis.id, ImageAnalysis.embedding)
+                    .filter(ImageAnalysis.id.in_(missing.tolist()))
+                    .order_by(ImageAnalysis.id)
+                    .all()
+                )
+                added += index.append(
+                    np.array([row_id for row_id, _ in rows], dtype=np.int64),
+                    np.stack([embedding for _, embedding in rows])
+                )
+            since = int(ids[-1])
+        if added:
+            logger.info(f"Image search index extended by {added} to {len(index)} embeddings")
+            if index.needs_ivf:
+                logger.warning(
+                    f"Image search index has {len(index)} embeddings and no IVF lists; "
+                    f"train them offline with `python -m scripts.train_image_index`"
+                )
+        return added
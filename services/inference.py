@@ -1,131 +1,589 @@
 import time
 import torch
-from PIL import Image
-from typing import Dict, Any
+from typing import Dict, Any, List, Iterator, Optional, Tuple
 import numpy as np
-import librosa
+from PIL import Image
+from transformers import BatchFeature, TextIteratorStreamer, StoppingCriteriaList
 
 from utils.model_loader import ModelLoader
+from services.batching import TextBatchScheduler
+from services.executor import text_pool
+from services.prefix_cache import PrefixCache
+from services.image_io import preprocess_image, target_size, tile_boxes
+from services.audio_io import SAMPLE_RATE, audio_duration, load_audio, split_on_speech, stitch_segments
+from services.decoding import generation_kwargs, resolve_profile, TokenBudgetCriteria, UNBATCHABLE_PROFILES
+from services.cancellation import CancellationToken, CancellationCriteria, InferenceCancelled
+from services.replicas import ReplicaPool
+from services.semantic_cache import SemanticCache
 from core.logging import logger
 from core.config import settings
 
+WARMUP_MODEL_TYPES = ("text", "draft", "embedding", "image", "audio")
+
 class InferenceService:
     """Service for running AI inference on text, images, and audio"""
     
     @staticmethod
-    def text(prompt: str, max_length: int = 512) -> Dict[str, Any]:
-        """Run text-to-text inference using BiMediX2"""
+    def text(
+        prompt: str,
+        max_length: int = 512,
+        prefix: Optional[str] = None,
+        profile: Optional[str] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Dict[str, Any]:
+        """Run text-to-text inference using BiMediX2
+        
+        A constant ``prefix`` registered with PrefixCache is prefilled once and
+        generation resumes from its cached KV state for the ``prompt`` suffix.
+        ``profile`` selects greedy, beam or speculative decoding. Generation stops
+        between decode steps once ``cancel_token`` is cancelled or past its deadline.
+        """
+        if ReplicaPool.active():
+            return ReplicaPool.get().call(
+                "text", prompt, max_length, prefix=prefix, profile=profile, cancel_token=cancel_token
+            )
+        
         start_time = time.time()
         try:
-            model, tokenizer = ModelLoader.get_text_model()
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
             
+            profile = resolve_profile(profile)
+            if prefix is not None and InferenceService._use_prefix_cache(prefix):
+                result = InferenceService._text_with_prefix(prefix, prompt, max_length, profile, cancel_token)
+            else:
+                if prefix is not None:
+                    prompt = prefix + prompt
+                if settings.TEXT_BATCHING_ENABLED and profile not in UNBATCHABLE_PROFILES:
+                    scheduler = TextBatchScheduler.instance(InferenceService.text_batch)
+                    result = scheduler.submit(prompt, max_length, profile, cancel_token).result()
+                else:
+                    result = InferenceService.text_batch([prompt], max_length, profile, [cancel_token])[0]
+            
+            # A stopped generation returns a truncated answer that must not be used
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            
+            processing_time = time.time() - start_time
+            logger.info(f"Text inference completed in {processing_time:.2f}s")
+            
+            return {
+                "text": result,
+                "processing_time": processing_time,
+                "model_used": settings.HUGGING_FACE_MODEL_NAME
+            }
+        except InferenceCancelled as e:
+            logger.info(f"Text inference cancelled: {e.reason}")
+            raise
+        except Exception as e:
+            logger.error(f"Text inference error: {str(e)}")
+            raise
+    
+    @staticmethod
+    def text_batch(
+        prompts: List[str],
+        max_length: int = 512,
+        profile: Optional[str] = None,
+        cancel_tokens: Optional[List[Optional[CancellationToken]]] = None
+    ) -> List[str]:
+        """Run one padded generate call over several prompts
+        
+        ``max_length`` applies to every prompt on its own: each row stops after
+        ``max_length`` minus its unpadded prompt length new tokens, so an answer
+        does not depend on the prompts it was batched with.
+        """
+        with ModelLoader.using("text") as (model, tokenizer):
+            decoding = generation_kwargs(profile, tokenizer)
+        
             inputs = tokenizer(
-                prompt,
+                prompts,
                 return_tensors="pt",
                 max_length=512,
-                truncation=True
+                truncation=True,
+                padding=True
             ).to(model.device)
+            prompt_length = inputs["input_ids"].shape[1]
+            budgets = [max(1, max_length - int(length)) for length in inputs["attention_mask"].sum(dim=1)]
             
+            stopping_criteria = StoppingCriteriaList([TokenBudgetCriteria(prompt_length, budgets)])
+            stopping_criteria.extend(
+                InferenceService._cancellation_kwargs(cancel_tokens).get("stopping_criteria", [])
+            )
+        
             with torch.no_grad():
                 outputs = model.generate(
                     **inputs,
+                    **decoding,
+                    max_new_tokens=max(budgets),
+                    stopping_criteria=stopping_criteria,
+                    pad_token_id=tokenizer.pad_token_id
+                )
+            
+            # Rows stopped early are padded to the longest one; cut each to its own budget
+            return tokenizer.batch_decode(
+                [row[:prompt_length + budget] for row, budget in zip(outputs, budgets)],
+                skip_special_tokens=True
+            )
+    
+    @staticmethod
+    def _use_prefix_cache(prefix: str) -> bool:
+        # Exported ONNX graphs manage their own KV cache and cannot resume from ours
+        return (
+            settings.PREFIX_CACHE_ENABLED
+            and PrefixCache.is_registered(prefix)
+            and ModelLoader.backend_for("text") != "onnx"
+        )
+    
+    @staticmethod
+    def _text_with_prefix(
+        prefix: str,
+        suffix: str,
+        max_length: int,
+        profile: Optional[str] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> str:
+        """Generate from the cached KV state of ``prefix``, prefilling only ``suffix``"""
+        with ModelLoader.using("text") as (model, tokenizer):
+            decoding = generation_kwargs(profile, tokenizer)
+            decoding.update(InferenceService._cancellation_kwargs([cancel_token]))
+            prefix_ids, past_key_values = PrefixCache.get(model, tokenizer, prefix)
+        
+            suffix_ids = tokenizer(
+                suffix,
+                return_tensors="pt",
+                max_length=512,
+                truncation=True,
+                add_special_tokens=False
+            ).input_ids.to(model.device)
+            input_ids = torch.cat([prefix_ids, suffix_ids], dim=-1)
+        
+            # Beam search runs every beam as its own batch row
+            num_beams = decoding.get("num_beams", 1)
+            if num_beams > 1:
+                past_key_values.batch_repeat_interleave(num_beams)
+        
+            with torch.no_grad():
+                outputs = model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=past_key_values,
+                    **decoding,
                     max_length=max_length,
-                    num_beams=4,
-                    no_repeat_ngram_size=3,
-                    early_stopping=True
+                    pad_token_id=tokenizer.pad_token_id
                 )
-                
-            result = tokenizer.decode(
+            
+            return tokenizer.decode(
                 outputs[0],
                 skip_special_tokens=True
             )
+    
+    @staticmethod
+    def _cancellation_kwargs(cancel_tokens: Optional[List[Optional[CancellationToken]]]) -> Dict[str, Any]:
+        """Stopping criteria checking the request tokens between decode steps"""
+        if not cancel_tokens or all(token is None for token in cancel_tokens):
+            return {}
+        return {"stopping_criteria": StoppingCriteriaList([CancellationCriteria(cancel_tokens)])}
+    
+    @staticmethod
+    def text_stream(
+        prompt: str,
+        max_length: int = 512,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Iterator[str]:
+        """Yield generated text pieces as soon as the model decodes them
+        
+        Closing the iterator early (e.g. the client disconnected) cancels the generation.
+        """
+        if ReplicaPool.active():
+            yield from ReplicaPool.get().stream("text_stream", prompt, max_length, cancel_token=cancel_token)
+            return
+        
+        with ModelLoader.using("text") as (model, tokenizer):
+            cancel_token = cancel_token or CancellationToken(settings.INFERENCE_TIMEOUT_SECONDS)
+        
+            inputs = tokenizer(
+                prompt,
+                return_tensors="pt",
+                max_length=512,
+                truncation=True
+            ).to(model.device)
+        
+            streamer = TextIteratorStreamer(
+                tokenizer,
+                skip_prompt=True,
+                skip_special_tokens=True
+            )
+            generation_kwargs = dict(
+                **inputs,
+                max_length=max_length,
+                no_repeat_ngram_size=3,
+                pad_token_id=tokenizer.pad_token_id,
+                streamer=streamer,
+                **InferenceService._cancellation_kwargs([cancel_token])
+            )
+            # Streaming works token by token, so beam search is replaced by greedy or sampling
+            if settings.TEXT_STREAM_DO_SAMPLE:
+                generation_kwargs.update(
+                    do_sample=True,
+                    temperature=settings.TEXT_STREAM_TEMPERATURE,
+                    top_p=settings.TEXT_STREAM_TOP_P
+                )
+            else:
+                generation_kwargs.update(do_sample=False, num_beams=1)
+        
+            errors = []
+        
+            def generate():
+                try:
+                    with torch.no_grad():
+                        model.generate(**generation_kwargs)
+                except Exception as e:
+                    errors.append(e)
+                    # Unblock the consumer waiting on the streamer queue
+                    streamer.end()
+        
+            job = text_pool.submit(generate)
+            finished = False
+            try:
+                for piece in streamer:
+                    if piece:
+                        yield piece
+                finished = True
+            finally:
+                if not finished:
+                    cancel_token.cancel(CancellationToken.CLIENT_DISCONNECTED)
+                    # Hold the lease until generate has stopped, so the model is not evicted under it
+                    try:
+                        job.result()
+                    except Exception:
+                        pass
+            job.result()
+        
+            if errors:
+                logger.error(f"Text streaming error: {str(errors[0])}")
+                raise errors[0]
+    
+    @staticmethod
+    def image(file_path: str, cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """Run image inference using MedGemma on an image file"""
+        with open(file_path, "rb") as f:
+            data = f.read()
+        return InferenceService.image_inputs(preprocess_image(data), cancel_token)
+    
+    @staticmethod
+    def image_inputs(inputs: BatchFeature, cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """Run image inference using MedGemma on inputs from services.image_io.preprocess_image"""
+        if ReplicaPool.active():
+            return ReplicaPool.get().call("image_inputs", inputs, cancel_token=cancel_token)
+        
+        start_time = time.time()
+        try:
+            # The request may have expired while waiting in the inference queue
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            with ModelLoader.using("image") as (model, _):
+                prediction, confidence, embedding = InferenceService._classify_images(model, inputs)[0]
             
             processing_time = time.time() - start_time
-            logger.info(f"Text inference completed in {processing_time:.2f}s")
+            logger.info(f"Image inference completed in {processing_time:.2f}s")
             
             return {
-                "text": result,
+                "embedding": embedding,
+                "prediction": prediction,
+                "confidence": confidence,
                 "processing_time": processing_time,
-                "model_used": settings.HUGGING_FACE_MODEL_NAME
+                "model_used": settings.MEDGEMMA_MODEL
             }
         except Exception as e:
-            logger.error(f"Text inference error: {str(e)}")
+            logger.error(f"Image inference error: {str(e)}")
             raise
     
     @staticmethod
-    def image(file_path: str) -> Dict[str, Any]:
-        """Run image inference using MedGemma"""
+    def image_batch(
+        inputs: List[BatchFeature],
+        cancel_token: Optional[CancellationToken] = None
+    ) -> List[Dict[str, Any]]:
+        """Run image inference on several preprocessed images as stacked tensor batches"""
+        if ReplicaPool.active():
+            return ReplicaPool.get().call("image_batch", inputs, cancel_token=cancel_token)
+        
         start_time = time.time()
         try:
-            model, processor = ModelLoader.get_image_model()
+            with ModelLoader.using("image") as (model, _):
+                predictions = []
+                for start in range(0, len(inputs), settings.IMAGE_BATCH_SIZE):
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    chunk = inputs[start:start + settings.IMAGE_BATCH_SIZE]
+                    # The processor resizes to a fixed size, so per-image tensors stack along the batch axis
+                    stacked = BatchFeature({key: torch.cat([item[key] for item in chunk]) for key in chunk[0].keys()})
+                    predictions.extend(InferenceService._classify_images(model, stacked))
             
-            # Load and process image
-            image = Image.open(file_path).convert("RGB")
-            inputs = processor(
-                images=image,
-                return_tensors="pt"
-            ).to(model.device)
+            processing_time = time.time() - start_time
+            logger.info(f"Batch image inference of {len(inputs)} images completed in {processing_time:.2f}s")
             
-            # Generate predictions
-            with torch.no_grad():
-                outputs = model(**inputs)
-                logits = outputs.logits
-                predicted_class_idx = logits.argmax(-1).item()
-                confidence = torch.softmax(logits, dim=-1)[0, predicted_class_idx].item()
-                
-                # Get label (simplified)
-                labels = ["Normal", "Abnormal"]
-                prediction = labels[predicted_class_idx] if predicted_class_idx < len(labels) else "Unknown"
+            return [
+                {
+                    "embedding": embedding,
+                    "prediction": prediction,
+                    "confidence": confidence,
+                    "processing_time": processing_time / len(inputs),
+                    "model_used": settings.MEDGEMMA_MODEL
+                }
+                for prediction, confidence, embedding in predictions
+            ]
+        except InferenceCancelled as e:
+            logger.info(f"Batch image inference cancelled: {e.reason}")
+            raise
+        except Exception as e:
+            logger.error(f"Batch image inference error: {str(e)}")
+            raise
+    
+    @staticmethod
+    def image_tiled(image: Image.Image, cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """Run image inference tile by tile over a large image and aggregate the tile results
+        
+        Tiles have the processor's input size and are preprocessed one batch at a
+        time, so at most IMAGE_BATCH_SIZE tile tensors are alive at once. The image
+        is reported abnormal if any tile is, with the strongest abnormal tile's
+        confidence; its embedding is the normalized mean of the tile embeddings.
+        """
+        if ReplicaPool.active():
+            return ReplicaPool.get().call("image_tiled", image, cancel_token=cancel_token)
+        
+        start_time = time.time()
+        try:
+            with ModelLoader.using("image") as (model, processor):
+                tile = max(target_size(processor) or (896, 896))
+                boxes = tile_boxes(image.size[0], image.size[1], tile, settings.IMAGE_TILE_OVERLAP)
+            
+                tiles = []
+                for start in range(0, len(boxes), settings.IMAGE_BATCH_SIZE):
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    inputs = processor(
+                        images=[image.crop(box) for box in boxes[start:start + settings.IMAGE_BATCH_SIZE]],
+                        return_tensors="pt"
+                    )
+                    tiles.extend(InferenceService._classify_images(model, inputs))
+            
+            abnormal = [confidence for prediction, confidence, _ in tiles if prediction == "Abnormal"]
+            if abnormal:
+                prediction, confidence = "Abnormal", max(abnormal)
+            else:
+                predictions = [prediction for prediction, _, _ in tiles]
+                prediction = max(set(predictions), key=predictions.count)
+                confidence = float(np.mean([c for p, c, _ in tiles if p == prediction]))
+            
+            embedding = None
+            embeddings = [e for _, _, e in tiles if e is not None]
+            if embeddings:
+                mean = np.mean(embeddings, axis=0)
+                embedding = (mean / max(float(np.linalg.norm(mean)), 1e-12)).tolist()
             
             processing_time = time.time() - start_time
-            logger.info(f"Image inference completed in {processing_time:.2f}s")
+            logger.info(f"Tiled image inference over {len(boxes)} tiles completed in {processing_time:.2f}s")
             
             return {
+                "embedding": embedding,
                 "prediction": prediction,
                 "confidence": confidence,
+                "tiles": len(boxes),
                 "processing_time": processing_time,
                 "model_used": settings.MEDGEMMA_MODEL
             }
+        except InferenceCancelled as e:
+            logger.info(f"Tiled image inference cancelled: {e.reason}")
+            raise
         except Exception as e:
-            logger.error(f"Image inference error: {str(e)}")
+            logger.error(f"Tiled image inference error: {str(e)}")
             raise
     
     @staticmethod
-    def audio(file_path: str) -> Dict[str, Any]:
-        """Transcribe audio using Whisper Medical Arabic"""
+    def _classify_images(model, inputs: BatchFeature) -> List[Tuple[str, float, Optional[List[float]]]]:
+        """Prediction label, confidence and pooled vision embedding for every image in a batch"""
+        inputs = inputs.to(model.device, dtype=model.dtype)
+        vision_tower = InferenceService._vision_tower(model)
+        captured = []
+        # Capture the encoder output of the forward pass instead of encoding the images twice
+        hook = vision_tower.register_forward_hook(
+            lambda module, args, output: captured.append(output)
+        ) if vision_tower is not None else None
+        try:
+            with torch.no_grad():
+                logits = model(**inputs).logits
+                probabilities = torch.softmax(logits.float(), dim=-1)
+                confidences, predicted = probabilities.max(dim=-1)
+                if vision_tower is not None and not captured:
+                    captured.append(vision_tower(pixel_values=inputs["pixel_values"]))
+        finally:
+            if hook is not None:
+                hook.remove()
+        
+        embeddings = [None] * len(confidences)
+        if captured:
+            hidden = captured[0].last_hidden_state if hasattr(captured[0], "last_hidden_state") else captured[0][0]
+            # Mean over image patches, L2-normalized so cosine similarity is a dot product
+            pooled = torch.nn.functional.normalize(hidden.float().mean(dim=1), dim=-1)
+            embeddings = pooled.cpu().tolist()
+        
+        # Get label (simplified)
+        labels = ["Normal", "Abnormal"]
+        return [
+            (labels[index] if index < len(labels) else "Unknown", confidence, embedding)
+            for index, confidence, embedding in zip(predicted.tolist(), confidences.tolist(), embeddings)
+        ]
+    
+    @staticmethod
+    def _vision_tower(model) -> Optional[torch.nn.Module]:
+        """SigLIP image encoder of the multimodal model, wherever this transformers version keeps it"""
+        for owner in (model, getattr(model, "model", None)):
+            tower = getattr(owner, "vision_tower", None)
+            if isinstance(tower, torch.nn.Module):
+                return tower
+        return None
+    
+    @staticmethod
+    def audio(file_path: str, cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """Decode and transcribe an audio file using Whisper"""
+        if ReplicaPool.active():
+            return ReplicaPool.get().call("audio", file_path, cancel_token=cancel_token)
+        
+        start_time = time.time()
+        result = InferenceService.transcribe(load_audio(file_path), cancel_token, audio_duration(file_path))
+        result["processing_time"] = time.time() - start_time
+        return result
+    
+    @staticmethod
+    def transcribe(
+        audio: np.ndarray,
+        cancel_token: Optional[CancellationToken] = None,
+        duration: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Transcribe 16 kHz mono audio of any length using Whisper
+        
+        The recording is split at pauses into voiced chunks that fit Whisper's
+        30 s window (silence is never sent to the model), the chunks are
+        transcribed AUDIO_BATCH_SIZE at a time, and their timestamped segments
+        are shifted back onto the recording's timeline in order. ``duration``
+        is the container's own figure when known.
+        """
         start_time = time.time()
         try:
-            model, processor = ModelLoader.get_audio_model()
-            
-            # Load audio file
-            audio, sr = librosa.load(file_path, sr=16000)
-            duration = librosa.get_duration(y=audio, sr=sr)
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
             
-            # Process audio
-            inputs = processor(
-                audio,
-                sampling_rate=sr,
-                return_tensors="pt"
-            ).to(model.device)
-            
-            # Generate transcription
-            with torch.no_grad():
-                outputs = model.generate(**inputs)
-                transcription = processor.batch_decode(
-                    outputs, 
-                    skip_special_tokens=True
-                )[0]
+            if duration is None:
+                duration = len(audio) / SAMPLE_RATE
+            spans = split_on_speech(audio)
+            pieces = InferenceService.audio_chunks([audio[start:end] for start, end in spans], cancel_token)
+            segments = stitch_segments(spans, pieces)
             
             processing_time = time.time() - start_time
-            logger.info(f"Audio transcription completed in {processing_time:.2f}s")
+            logger.info(
+                f"Audio transcription of {duration:.0f}s in {len(spans)} chunks completed in {processing_time:.2f}s"
+            )
             
             return {
-                "transcript": transcription,
-                "language_detected": "ar",
+                "transcript": " ".join(segment["text"] for segment in segments),
+                "segments": segments,
+                "chunks": len(spans),
+                "language_detected": settings.SPEECH_LANGUAGE,
                 "duration_seconds": duration,
                 "processing_time": processing_time,
                 "model_used": settings.SPEECH_MODEL
             }
         except Exception as e:
             logger.error(f"Audio inference error: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+    
+    @staticmethod
+    def audio_chunks(
+        chunks: List[np.ndarray],
+        cancel_token: Optional[CancellationToken] = None
+    ) -> List[List[Tuple[float, float, str]]]:
+        """Transcribe 16 kHz chunks of at most 30 s, AUDIO_BATCH_SIZE per generate call
+        
+        Returns the (start, end, text) segments of every chunk, in seconds
+        relative to the start of that chunk.
+        """
+        if ReplicaPool.active():
+            return ReplicaPool.get().call("audio_chunks", chunks, cancel_token=cancel_token)
+        
+        with ModelLoader.using("audio") as (model, processor):
+            pieces = []
+            for start in range(0, len(chunks), settings.AUDIO_BATCH_SIZE):
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                pieces.extend(InferenceService._transcribe_chunks(
+                    model, processor, chunks[start:start + settings.AUDIO_BATCH_SIZE], cancel_token
+                ))
+        # A stopped generation returns a truncated transcript that must not be used
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        return pieces
+    
+    @staticmethod
+    def _transcribe_chunks(
+        model,
+        processor,
+        chunks: List[np.ndarray],
+        cancel_token: Optional[CancellationToken] = None
+    ) -> List[List[Tuple[float, float, str]]]:
+        """(start, end, text) segments of each chunk in one batched generate, in chunk-relative seconds"""
+        # Every chunk is padded to Whisper's 30 s input, so they stack without masking
+        features = processor(chunks, sampling_rate=SAMPLE_RATE, return_tensors="pt").input_features
+        with torch.no_grad():
+            outputs = model.generate(
+                features.to(model.device, dtype=model.dtype),
+                language=settings.SPEECH_LANGUAGE,
+                task="transcribe",
+                return_timestamps=True,
+                **InferenceService._cancellation_kwargs([cancel_token] * len(chunks))
+            )
+        decoded = processor.batch_decode(outputs, skip_special_tokens=True, output_offsets=True)
+        
+        results = []
+        for chunk, item in zip(chunks, decoded):
+            chunk_seconds = len(chunk) / SAMPLE_RATE
+            pieces = [
+                (offset["timestamp"][0] or 0.0, offset["timestamp"][1] or chunk_seconds, offset["text"].strip())
+                for offset in item.get("offsets") or []
+                if offset["text"].strip()
+            ]
+            if not pieces and item["text"].strip():
+                # No timestamp tokens were generated; the chunk itself is the segment
+                pieces = [(0.0, chunk_seconds, item["text"].strip())]
+            results.append(pieces)
+        return results
+    
+    @staticmethod
+    def warmup(model_type: str, cancel_token: Optional[CancellationToken] = None) -> float:
+        """Load a model and run one short synthetic pass through it; returns the pass's seconds
+        
+        The first call into a model pays for kernel selection, allocator growth
+        and graph compilation, so running it at startup keeps that cost away
+        from the first user. With replicas every replica warms its own copy.
+        """
+        if model_type not in WARMUP_MODEL_TYPES:
+            raise ValueError(f"Unknown model type {model_type!r}, expected one of {', '.join(WARMUP_MODEL_TYPES)}")
+        if ReplicaPool.active() and model_type != "embedding":
+            return max(ReplicaPool.get().broadcast("warmup", model_type, cancel_token=cancel_token))
+        
+        # Load outside the timer so only the warmup pass itself is measured
+        with ModelLoader.using(model_type) as (model, processor):
+            start_time = time.time()
+            if model_type in ("text", "draft"):
+                profile = "speculative" if model_type == "draft" else "greedy"
+                InferenceService.text_batch(["Warmup"], max_length=16, profile=profile, cancel_tokens=[cancel_token])
+            elif model_type == "embedding":
+                SemanticCache.embed(["Warmup"])
+            elif model_type == "image":
+                size = target_size(processor) or (224, 224)
+                inputs = processor(images=Image.new("RGB", size), return_tensors="pt")
+                InferenceService._classify_images(model, inputs)
+            elif model_type == "audio":
+                InferenceService._transcribe_chunks(
+                    model, processor, [np.zeros(SAMPLE_RATE, dtype=np.float32)], cancel_token
+                )
+            return time.time() - start_time
@@ -0,0 +1,127 @@
+import threading
+import time
+from itertools import combinations
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from core.logging import logger
+from models.multimodal import ImageAnalysis
+
+CHUNKS = 4
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+def to_signed(phash: int) -> int:
+    """Store an unsigned 64-bit hash in a signed BIGINT column"""
+    return phash - (1 << 64) if phash >= 1 << 63 else phash
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+def _chunks(phash: int) -> List[int]:
+    return [(phash >> (index * CHUNK_BITS)) & CHUNK_MASK for index in range(CHUNKS)]
+
+def _variants(chunk: int, radius: int) -> List[int]:
+    """All chunk values within ``radius`` bit flips of ``chunk``"""
+    values = [chunk]
+    for flips in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), flips):
+            value = chunk
+            for bit in bits:
+                value ^= 1 << bit
+            values.append(value)
+    return values
+
+class PerceptualHashIndex:
+    """Multi-index hash table over the perceptual hashes of analyzed images
+
+    Each 64-bit hash is split into four 16-bit chunks, each with its own
+    table. Two hashes within Hamming distance ``r`` agree on at least one
+    chunk up to ``r // 4`` flipped bits (pigeonhole), so a lookup probes a
+    handful of table entries and checks the exact distance of the
+    candidates only. Rows are pulled from the database incrementally by id.
+    """
+
+    _lock = threading.Lock()
+    _tables: List[Dict[int, Set[int]]] = [{} for _ in range(CHUNKS)]
+    _owners: Dict[int, int] = {}  # hash -> id of the first analysis with it
+    _recent_ids: Set[int] = set()  # indexed ids inside the refresh overlap
+    _last_id = 0
+    _refreshed_at = 0.0
+
+    REFRESH_SECONDS = 1.0
+    # Rows may commit out of id order; rescanning this many ids below the newest
+    # indexed one picks up transactions that were still in flight last time
+    REFRESH_OVERLAP = 256
+
+    @classmethod
+    def add(cls, phash: int, analysis_id: int):
+        with cls._lock:
+            cls._add(phash, analysis_id)
+            cls._recent_ids.add(analysis_id)
+
+    @classmethod
+    def lookup(cls, db: Session, phash: int, max_distance: int) -> Optional[Tuple[int, int]]:
+        """Id and Hamming distance of the closest analyzed image within ``max_distance``"""
+        cls.refresh(db)
+        radius = max_distance // CHUNKS
+        best: Optional[Tuple[int, int]] = None
+        with cls._lock:
+            candidates = set()
+            for index, chunk in enumerate(_chunks(phash)):
+                table = cls._tables[index]
+                for value in _variants(chunk, radius):
+                    candidates.update(table.get(value, ()))
+            for candidate in candidates:
+                distance = bin(candidate ^ phash).count("1")
+                if distance <= max_distance and (best is None or distance < best[1]):
+                    best = (cls._owners[candidate], distance)
+        return best
+
+    @classmethod
+    def refresh(cls, db: Session, force: bool = False):
+        """Index hashes of analyses saved since the last refresh"""
+        if not force and time.monotonic() - cls._refreshed_at < cls.REFRESH_SECONDS:
+            return
+        since = max(0, cls._last_id - cls.REFRESH_OVERLAP)
+        rows = (
+            db.query(ImageAnalysis.id, ImageAnalysis.phash)
+            .filter(ImageAnalysis.id > since, ImageAnalysis.phash.isnot(None))
+            .order_by(ImageAnalysis.id)
+            .all()
+        )
+        added = 0
+        with cls._lock:
+            for analysis_id, phash in rows:
+                cls._last_id = max(cls._last_id, analysis_id)
+                if analysis_id in cls._recent_ids:
+                    continue
+                cls._add(to_unsigned(phash), analysis_id)
+                cls._recent_ids.add(analysis_id)
+                added += 1
+            # Ids below the next rescan window are never queried again
+            floor = cls._last_id - cls.REFRESH_OVERLAP
+            cls._recent_ids = {analysis_id for analysis_id in cls._recent_ids if analysis_id > floor}
+            cls._refreshed_at = time.monotonic()
+        if added:
+            logger.info(f"Perceptual hash index extended to {len(cls._owners)} hashes")
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._tables = [{} for _ in range(CHUNKS)]
+            cls._owners = {}
+            cls._recent_ids = set()
+            cls._last_id = 0
+            cls._refreshed_at = 0.0
+
+    @classmethod
+    def _add(cls, phash: int, analysis_id: int):
+        if phash in cls._owners:
+            # A row that committed late may still be the first analysis with this hash
+            cls._owners[phash] = min(cls._owners[phash], analysis_id)
+            return
+        cls._owners[phash] = analysis_id
+        for index, chunk in enumerate(_chunks(phash)):
+            cls._tables[index].setdefault(chunk, set()).add(phash)
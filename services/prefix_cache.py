@@ -0,0 +1,60 @@
+import copy
+import threading
+import weakref
+from typing import Any, Dict, Set, Tuple
+
+import torch
+
+from core.logging import logger
+
+class PrefixCache:
+    """Keeps precomputed attention KV state for registered constant prompt prefixes"""
+
+    _registered: Set[str] = set()
+    # prefix -> (weak reference to the model it was computed with, prefix ids, KV cache)
+    _entries: Dict[str, Tuple[Any, torch.Tensor, Any]] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls, prefix: str) -> str:
+        """Mark a prefix as worth caching; returns it so templates can be declared inline"""
+        cls._registered.add(prefix)
+        return prefix
+
+    @classmethod
+    def is_registered(cls, prefix: str) -> bool:
+        return prefix in cls._registered
+
+    @classmethod
+    def get(cls, model, tokenizer, prefix: str) -> Tuple[torch.Tensor, Any]:
+        """Return the prefix token ids and a private copy of its KV cache"""
+        entry = cls._entries.get(prefix)
+        if entry is None or entry[0]() is not model:
+            with cls._lock:
+                entry = cls._entries.get(prefix)
+                if entry is None or entry[0]() is not model:
+                    entry = cls._compute(model, tokenizer, prefix)
+                    cls._entries[prefix] = entry
+
+        _, prefix_ids, past_key_values = entry
+        # generate() appends to the cache in place, so every call needs its own copy
+        return prefix_ids, copy.deepcopy(past_key_values)
+
+    @classmethod
+    def warm(cls, model, tokenizer):
+        """Precompute every registered prefix, e.g. right after the model loads"""
+        for prefix in list(cls._registered):
+            cls.get(model, tokenizer, prefix)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries = {}
+
+    @classmethod
+    def _compute(cls, model, tokenizer, prefix: str) -> Tuple[Any, torch.Tensor, Any]:
+        prefix_ids = tokenizer(prefix, return_tensors="pt").input_ids.to(model.device)
+        with torch.no_grad():
+            outputs = model(input_ids=prefix_ids, use_cache=True)
+        logger.info(f"Cached KV state for a {prefix_ids.shape[-1]}-token prompt prefix")
+        return weakref.ref(model), prefix_ids, outputs.past_key_values
@@ -2,8 +2,19 @@ from typing import Dict, Any, List
 from sqlalchemy.orm import Session
 from services.inference import InferenceService
 from services.search import SearchService
+from services.prefix_cache import PrefixCache
+from services.decoding import profile_for
 from core.logging import logger
 
+# Constant template heads; their KV state is computed once and reused per call
+CHAT_RECOMMENDATION_PREFIX = PrefixCache.register("""
+            Based on the following medical conversation, provide recommendations for the patient:
+            """)
+
+SPECIALTY_PREFIX = PrefixCache.register("""
+            Based on the following patient symptoms, identify the most relevant medical specialty:
+            Symptoms: """)
+
 class RecommendationService:
     """Service for generating recommendations based on AI analysis"""
     
@@ -11,9 +22,7 @@ class RecommendationService:
     def recommend_from_chat(chat_history: str) -> str:
         """Generate recommendations from chat context"""
         try:
-            prompt = f"""
-            Based on the following medical conversation, provide recommendations for the patient:
-            {chat_history}
+            prompt = f"""{chat_history}
             
             Recommendations should include:
             1. Suggested doctors if needed
@@ -24,7 +33,12 @@ class RecommendationService:
             Keep the response concise and professional.
             """
             
-            response = InferenceService.text(prompt, max_length=512)
+            response = InferenceService.text(
+                prompt,
+                max_length=512,
+                prefix=CHAT_RECOMMENDATION_PREFIX,
+                profile=profile_for("recommendation")
+            )
             return response["text"]
         except Exception as e:
             logger.error(f"Recommendation from chat error: {str(e)}")
@@ -61,14 +75,17 @@ class RecommendationService:
     def _recommend_specialty(text_description: str) -> str:
         """Extract medical specialty from symptom description"""
         try:
-            prompt = f"""
-            Based on the following patient symptoms, identify the most relevant medical specialty:
-            Symptoms: {text_description}
+            prompt = f"""{text_description}
             
             Return only the name of the medical specialty.
             """
             
-            response = InferenceService.text(prompt, max_length=128)
+            response = InferenceService.text(
+                prompt,
+                max_length=128,
+                prefix=SPECIALTY_PREFIX,
+                profile=profile_for("specialty")
+            )
             return response["text"].strip()
         except Exception as e:
             logger.error(f"Error recommending specialty: {str(e)}")
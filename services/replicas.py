@@ -0,0 +1,356 @@
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from core.config import settings
+from core.logging import logger
+
+REPLICA_ENV = "MEDIXAI_REPLICA_INDEX"
+_POLL_SECONDS = 0.1
+_END_OF_STREAM = object()
+
+def _replica_main(
+    index: int,
+    cores: List[int],
+    threads: int,
+    requests: "mp.Queue",
+    cancellations: "mp.Queue",
+    results: "mp.Queue"
+):
+    """Entry point of a replica process: pin cores, size torch threads and serve jobs"""
+    # Mark the process so InferenceService runs locally instead of dispatching again
+    os.environ[REPLICA_ENV] = str(index)
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+    from services.cancellation import CancellationToken
+    from services.inference import InferenceService
+    from utils.model_loader import ModelLoader
+    ModelLoader.start_idle_eviction()
+
+    tokens: Dict[int, CancellationToken] = {}
+    tokens_lock = threading.Lock()
+
+    def watch_cancellations():
+        while True:
+            job_id = cancellations.get()
+            with tokens_lock:
+                token = tokens.get(job_id)
+            if token is not None:
+                token.cancel(CancellationToken.CLIENT_DISCONNECTED)
+
+    def run(job_id: int, method: str, args: tuple, kwargs: dict, timeout: Optional[float], stream: bool):
+        token = CancellationToken(timeout)
+        with tokens_lock:
+            tokens[job_id] = token
+        try:
+            result = getattr(InferenceService, method)(*args, cancel_token=token, **kwargs)
+            if stream:
+                # Generator methods send every item as it is produced, then end with None
+                for item in result:
+                    results.put((job_id, None, item))
+                result = None
+            results.put((job_id, True, result))
+        except Exception as e:
+            try:
+                results.put((job_id, False, e))
+            except Exception:
+                results.put((job_id, False, RuntimeError(str(e))))
+        finally:
+            with tokens_lock:
+                tokens.pop(job_id, None)
+
+    threading.Thread(target=watch_cancellations, daemon=True).start()
+    # Concurrent jobs inside one replica still share its micro-batcher
+    executor = ThreadPoolExecutor(max_workers=settings.REPLICA_CONCURRENCY)
+    while True:
+        job = requests.get()
+        if job is None:
+            break
+        executor.submit(run, *job)
+    executor.shutdown(wait=True)
+
+class _Replica:
+    def __init__(
+        self,
+        index: int,
+        cores: List[int],
+        process: mp.Process,
+        requests,
+        cancellations,
+        restarts: int = 0
+    ):
+        self.index = index
+        self.cores = cores
+        self.process = process
+        self.requests = requests
+        self.cancellations = cancellations
+        self.in_flight = 0
+        self.completed = 0
+        self.restarts = restarts  # consecutive restarts of this slot
+        self.started_at = time.monotonic()
+        self.exited_at: Optional[float] = None  # when the exit was first noticed
+        self.failed = False
+
+class ReplicaPool:
+    """Model replicas in separate processes, each pinned to its own cores, with least-loaded dispatch
+
+    A replica process that exits fails its in-flight jobs and is started
+    again on its cores the next time a job is dispatched, after an
+    exponential backoff. A slot that keeps exiting is marked failed after
+    REPLICA_MAX_RESTARTS restarts and gets no more jobs.
+    """
+
+    _instance: Optional["ReplicaPool"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, replicas: int, threads_per_replica: int = 0):
+        self._context = mp.get_context("spawn")
+        self._results = self._context.Queue()
+        self._replicas: List[_Replica] = []
+        self._futures: Dict[int, Future] = {}
+        self._owners: Dict[int, _Replica] = {}
+        self._streams: Dict[int, "queue.Queue"] = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stopping = False
+
+        available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        replicas = max(1, min(replicas, len(available)))
+        per_replica = len(available) // replicas
+        self._threads = threads_per_replica or per_replica
+
+        for index in range(replicas):
+            cores = available[index * per_replica:(index + 1) * per_replica]
+            self._replicas.append(self._spawn(index, cores))
+
+        threading.Thread(target=self._collect, name="replica-results", daemon=True).start()
+
+    def _spawn(self, index: int, cores: List[int], restarts: int = 0) -> _Replica:
+        requests = self._context.Queue()
+        cancellations = self._context.Queue()
+        process = self._context.Process(
+            target=_replica_main,
+            args=(index, cores, self._threads, requests, cancellations, self._results),
+            name=f"model-replica-{index}",
+            daemon=True
+        )
+        process.start()
+        logger.info(f"Started model replica {index} on cores {cores[0]}-{cores[-1]} with {self._threads} threads")
+        return _Replica(index, cores, process, requests, cancellations, restarts)
+
+    @staticmethod
+    def active() -> bool:
+        """Whether calls in this process should be dispatched to replicas"""
+        return settings.SERVING_REPLICAS > 1 and REPLICA_ENV not in os.environ
+
+    @classmethod
+    def get(cls) -> "ReplicaPool":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(settings.SERVING_REPLICAS, settings.REPLICA_THREADS)
+        return cls._instance
+
+    @classmethod
+    def shutdown(cls):
+        with cls._instance_lock:
+            if cls._instance is not None:
+                cls._instance.stop()
+                cls._instance = None
+
+    def call(self, method: str, *args, cancel_token=None, **kwargs) -> Any:
+        """Run an InferenceService method on the least-loaded replica and wait for its result"""
+        return self._run(None, method, args, kwargs, cancel_token)
+
+    def broadcast(self, method: str, *args, cancel_token=None, **kwargs) -> List[Any]:
+        """Run an InferenceService method on every replica at once and wait for all the results"""
+        with self._lock:
+            indexes = [replica.index for replica in self._replicas]
+        with ThreadPoolExecutor(max_workers=len(indexes), thread_name_prefix="replica-broadcast") as executor:
+            futures = [
+                executor.submit(self._run, index, method, args, kwargs, cancel_token)
+                for index in indexes
+            ]
+            return [future.result() for future in futures]
+
+    def stream(self, method: str, *args, cancel_token=None, **kwargs) -> Iterator[Any]:
+        """Run an InferenceService generator method on the least-loaded replica, yielding its items as they arrive
+
+        Closing the iterator early cancels the job in the replica.
+        """
+        items: "queue.Queue" = queue.Queue()
+        job_id, replica, future = self._submit(None, method, args, kwargs, cancel_token, items)
+        cancel_sent = False
+        try:
+            while True:
+                try:
+                    item = items.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    cancel_sent = self._check(job_id, replica, cancel_token, cancel_sent)
+                    continue
+                if item is _END_OF_STREAM:
+                    break
+                yield item
+        finally:
+            if not future.done() and not cancel_sent:
+                replica.cancellations.put(job_id)
+        future.result()
+
+    def _run(self, index: Optional[int], method: str, args: tuple, kwargs: dict, cancel_token) -> Any:
+        job_id, replica, future = self._submit(index, method, args, kwargs, cancel_token)
+        cancel_sent = False
+        while True:
+            try:
+                return future.result(timeout=_POLL_SECONDS)
+            except FutureTimeout:
+                cancel_sent = self._check(job_id, replica, cancel_token, cancel_sent)
+
+    def _submit(
+        self,
+        index: Optional[int],
+        method: str,
+        args: tuple,
+        kwargs: dict,
+        cancel_token,
+        items: Optional["queue.Queue"] = None
+    ) -> Tuple[int, _Replica, Future]:
+        """Queue a job on replica ``index``, or the least-loaded live one when None"""
+        timeout = None
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+            if cancel_token.deadline is not None:
+                timeout = max(0.001, cancel_token.deadline - time.monotonic())
+
+        with self._lock:
+            self._respawn_exited()
+            if index is None:
+                live = [replica for replica in self._replicas if replica.process.is_alive()]
+                if not live:
+                    raise RuntimeError("No model replica is available")
+                replica = min(live, key=lambda r: r.in_flight)
+            else:
+                replica = self._replicas[index]
+                if not replica.process.is_alive():
+                    raise RuntimeError(f"Model replica {index} is not running")
+            replica.in_flight += 1
+            job_id = next(self._job_ids)
+            future: Future = Future()
+            self._futures[job_id] = future
+            self._owners[job_id] = replica
+            if items is not None:
+                self._streams[job_id] = items
+        replica.requests.put((job_id, method, args, kwargs, timeout, items is not None))
+        return job_id, replica, future
+
+    def _check(self, job_id: int, replica: _Replica, cancel_token, cancel_sent: bool) -> bool:
+        """Fail the job if its replica exited and forward a cancellation once; returns whether one was sent"""
+        if not replica.process.is_alive():
+            self._finish(job_id, False, RuntimeError(f"Model replica {replica.index} exited"))
+        elif not cancel_sent and cancel_token is not None and cancel_token.is_cancelled():
+            replica.cancellations.put(job_id)
+            return True
+        return cancel_sent
+
+    def _respawn_exited(self):
+        """Replace replicas whose process has exited; called with the lock held
+
+        Jobs still waiting on an exited replica keep its old entry and fail
+        on their next poll, so new jobs never go to a dead process. A slot
+        is restarted only once its backoff has passed since the exit was
+        noticed, and its restart count resets when the process had outlived
+        the longest backoff.
+        """
+        if self._stopping:
+            return
+        now = time.monotonic()
+        for position, replica in enumerate(self._replicas):
+            if replica.failed or replica.process.is_alive():
+                continue
+            if replica.exited_at is None:
+                replica.exited_at = now
+            uptime = replica.exited_at - replica.started_at
+            restarts = 0 if uptime > settings.REPLICA_RESTART_BACKOFF_MAX else replica.restarts
+            if restarts >= settings.REPLICA_MAX_RESTARTS:
+                replica.failed = True
+                logger.error(
+                    f"Model replica {replica.index} exited with code {replica.process.exitcode} "
+                    f"after {restarts} restarts, marking it failed"
+                )
+                continue
+            backoff = min(settings.REPLICA_RESTART_BACKOFF * 2 ** restarts, settings.REPLICA_RESTART_BACKOFF_MAX)
+            if now - replica.exited_at < backoff:
+                continue
+            logger.warning(
+                f"Model replica {replica.index} exited with code {replica.process.exitcode}, "
+                f"restarting (attempt {restarts + 1}/{settings.REPLICA_MAX_RESTARTS})"
+            )
+            self._replicas[position] = self._spawn(replica.index, replica.cores, restarts + 1)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            # Health probes may be the only callers while traffic is drained
+            self._respawn_exited()
+            return [
+                {
+                    "replica": replica.index,
+                    "cores": len(replica.cores),
+                    "alive": replica.process.is_alive(),
+                    "failed": replica.failed,
+                    "restarts": replica.restarts,
+                    "in_flight": replica.in_flight,
+                    "completed": replica.completed
+                }
+                for replica in self._replicas
+            ]
+
+    def stop(self):
+        with self._lock:
+            self._stopping = True
+        for replica in self._replicas:
+            replica.requests.put(None)
+        for replica in self._replicas:
+            replica.process.join(timeout=10)
+            if replica.process.is_alive():
+                replica.process.terminate()
+
+    def _collect(self):
+        while True:
+            try:
+                job_id, ok, payload = self._results.get()
+            except (EOFError, OSError):
+                return
+            self._finish(job_id, ok, payload)
+
+    def _finish(self, job_id: int, ok: Optional[bool], payload: Any):
+        """Resolve a job from its result; ``ok`` is None for an item streamed before the result"""
+        with self._lock:
+            if ok is None:
+                items = self._streams.get(job_id)
+                if items is not None:
+                    items.put(payload)
+                return
+            future = self._futures.pop(job_id, None)
+            replica = self._owners.pop(job_id, None)
+            items = self._streams.pop(job_id, None)
+            if replica is not None:
+                replica.in_flight -= 1
+                replica.completed += 1
+        if future is None or future.done():
+            return
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(payload)
+        if items is not None:
+            items.put(_END_OF_STREAM)
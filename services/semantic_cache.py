@@ -0,0 +1,179 @@
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import torch
+
+from core.config import settings
+from core.logging import logger
+from utils.model_loader import ModelLoader
+
+class _Entry:
+    __slots__ = ("scope", "key", "value", "expires_at", "model_version")
+
+    def __init__(self, scope: str, key: str, value: Dict[str, Any], expires_at: float, model_version: str):
+        self.scope = scope
+        self.key = key
+        self.value = value
+        self.expires_at = expires_at
+        self.model_version = model_version
+
+class SemanticCache:
+    """In-process near-duplicate cache of text answers keyed by prompt embeddings
+
+    The sentence encoder is only read from local files. If it cannot be
+    loaded, the cache turns itself off for the rest of the process instead of
+    retrying the load on every request.
+    """
+
+    _lock = threading.Lock()
+    _encoder_error: Optional[str] = None
+    _entries: List[_Entry] = []
+    _vectors: Optional[np.ndarray] = None  # (capacity, dim) unit vectors, first len(_entries) rows used
+    _exact: Dict[str, int] = {}  # scope + normalized prompt -> row
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        """Case-fold, collapse whitespace and drop trailing punctuation"""
+        prompt = re.sub(r"\s+", " ", prompt.strip().lower())
+        return prompt.rstrip(" .!?؟،,;:")
+
+    @staticmethod
+    def model_version() -> str:
+        return f"{settings.HUGGING_FACE_MODEL_NAME}@{settings.TEXT_MODEL_VERSION}"
+
+    @staticmethod
+    def scope_for(email: str, max_length: int) -> str:
+        # Answers echo the prompt, so they are only shared across users when explicitly allowed
+        owner = "*" if settings.SEMANTIC_CACHE_SCOPE == "global" else email
+        return f"{owner}:{max_length}"
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return settings.SEMANTIC_CACHE_ENABLED and cls._encoder_error is None
+
+    @classmethod
+    def embed(cls, texts: List[str]) -> np.ndarray:
+        """Mean-pooled, L2-normalized sentence embeddings from the local encoder"""
+        try:
+            ModelLoader.get_embedding_model()
+        except Exception as e:
+            if cls._encoder_error is None:
+                cls._encoder_error = str(e)
+                logger.error(f"Semantic cache disabled, encoder {settings.SEMANTIC_CACHE_ENCODER} failed to load: {str(e)}")
+            raise
+        with ModelLoader.using("embedding") as (model, tokenizer):
+            inputs = tokenizer(
+                texts,
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=256
+            ).to(model.device)
+            with torch.no_grad():
+                hidden = model(**inputs).last_hidden_state
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        pooled = torch.nn.functional.normalize(pooled.float(), dim=-1)
+        return pooled.cpu().numpy().astype(np.float32)
+
+    @classmethod
+    def lookup(cls, prompt: str, scope: str) -> Optional[Dict[str, Any]]:
+        """Return the stored answer of the most similar live prompt above the threshold"""
+        if not cls.enabled():
+            return None
+        try:
+            key = cls.normalize(prompt)
+            now = time.time()
+            version = cls.model_version()
+
+            with cls._lock:
+                row = cls._exact.get(f"{scope}\x00{key}")
+                if row is not None and cls._is_live(cls._entries[row], now, version):
+                    return cls._entries[row].value
+                if not cls._entries:
+                    return None
+
+            query = cls.embed([key])[0]
+
+            with cls._lock:
+                count = len(cls._entries)
+                similarities = cls._vectors[:count] @ query
+                for row in np.argsort(-similarities):
+                    if similarities[row] < settings.SEMANTIC_CACHE_THRESHOLD:
+                        break
+                    entry = cls._entries[row]
+                    if entry.scope == scope and cls._is_live(entry, now, version):
+                        logger.info(f"Semantic cache hit (similarity {similarities[row]:.3f})")
+                        return entry.value
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {str(e)}")
+        return None
+
+    @classmethod
+    def store(cls, prompt: str, scope: str, value: Dict[str, Any], ttl: Optional[int] = None):
+        if not cls.enabled():
+            return
+        try:
+            key = cls.normalize(prompt)
+            vector = cls.embed([key])[0]
+            entry = _Entry(
+                scope,
+                key,
+                value,
+                time.time() + (ttl or settings.SEMANTIC_CACHE_TTL),
+                cls.model_version()
+            )
+
+            with cls._lock:
+                if len(cls._entries) >= settings.SEMANTIC_CACHE_MAX_ENTRIES:
+                    cls._compact()
+                if cls._vectors is None or len(cls._entries) >= cls._vectors.shape[0]:
+                    cls._grow(vector.shape[0])
+                row = len(cls._entries)
+                cls._vectors[row] = vector
+                cls._entries.append(entry)
+                cls._exact[f"{scope}\x00{key}"] = row
+        except Exception as e:
+            logger.warning(f"Semantic cache store failed: {str(e)}")
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries = []
+            cls._vectors = None
+            cls._exact = {}
+
+    @classmethod
+    def _is_live(cls, entry: _Entry, now: float, version: str) -> bool:
+        return entry.expires_at > now and entry.model_version == version
+
+    @classmethod
+    def _grow(cls, dim: int):
+        capacity = min(
+            settings.SEMANTIC_CACHE_MAX_ENTRIES,
+            max(64, 2 * (cls._vectors.shape[0] if cls._vectors is not None else 0))
+        )
+        vectors = np.zeros((capacity, dim), dtype=np.float32)
+        if cls._vectors is not None:
+            vectors[:len(cls._entries)] = cls._vectors[:len(cls._entries)]
+        cls._vectors = vectors
+
+    @classmethod
+    def _compact(cls):
+        """Drop expired and stale-version entries, then the oldest ones if still full"""
+        now = time.time()
+        version = cls.model_version()
+        keep = [row for row, entry in enumerate(cls._entries) if cls._is_live(entry, now, version)]
+        # Entries are appended in insertion order, so the head holds the oldest
+        overflow = len(keep) - settings.SEMANTIC_CACHE_MAX_ENTRIES + 1
+        if overflow > 0:
+            keep = keep[overflow:]
+
+        cls._vectors[:len(keep)] = cls._vectors[keep]
+        cls._entries = [cls._entries[row] for row in keep]
+        cls._exact = {
+            f"{entry.scope}\x00{entry.key}": row for row, entry in enumerate(cls._entries)
+        }
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from core.config import settings
+
+CHUNK_SIZE = 1024 * 1024  # 1MB chunks
+SPOOL_DIR = Path("temp")
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds the size limit of its endpoint"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit / 1024 ** 2:.0f} MB limit")
+        self.limit = limit
+
+def upload_limit(path: str) -> Optional[int]:
+    """Largest request body in bytes accepted by an upload endpoint; None for other paths"""
+    if path.startswith("/ai/audio"):
+        return settings.AUDIO_UPLOAD_MAX_MB * 1024 ** 2
+    if path.startswith("/ai/image/batch"):
+        return settings.IMAGE_UPLOAD_MAX_MB * settings.IMAGE_BATCH_MAX_FILES * 1024 ** 2
+    if path.startswith("/ai/image"):
+        return settings.IMAGE_UPLOAD_MAX_MB * 1024 ** 2
+    return None
+
+def _check_declared_size(file: UploadFile, limit: int):
+    # The multipart parser has already counted the bytes; fail before reading them again
+    if file.size is not None and file.size > limit:
+        raise UploadTooLarge(limit)
+
+def _read_and_hash(source: BinaryIO, limit: int) -> Tuple[bytes, str]:
+    data = source.read(limit + 1)
+    if len(data) > limit:
+        raise UploadTooLarge(limit)
+    return data, hashlib.sha256(data).hexdigest()
+
+async def read_upload(file: UploadFile, limit: int) -> Tuple[bytes, str]:
+    """Contents of an upload in one buffer and their sha256, reading it once off the event loop"""
+    _check_declared_size(file, limit)
+    await file.seek(0)
+    return await run_in_threadpool(_read_and_hash, file.file, limit)
+
+class SpooledUpload:
+    """An upload copied to ``temp/<sha256><ext>`` in the same pass that hashes it
+
+    ``file`` is the handle the copy was written through, opened before the
+    copy was renamed into place, so decoders read this request's bytes even
+    if an identical upload replaces or removes the path meanwhile. ``close``
+    removes the spool file unless another request has put its own copy there.
+    """
+
+    def __init__(self, path: Path, file_hash: str, size: int, file: BinaryIO):
+        self.path = path
+        self.file_hash = file_hash
+        self.size = size
+        self.file = file
+
+    def close(self):
+        if self.file.closed:
+            return
+        try:
+            if os.stat(self.path).st_ino == os.fstat(self.file.fileno()).st_ino:
+                os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        finally:
+            self.file.close()
+
+def _spool(source: BinaryIO, suffix: str, limit: int) -> SpooledUpload:
+    SPOOL_DIR.mkdir(exist_ok=True)
+    partial = SPOOL_DIR / f".upload-{uuid.uuid4().hex}"
+    digest = hashlib.sha256()
+    size = 0
+    f = open(partial, "w+b")
+    try:
+        while chunk := source.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > limit:
+                raise UploadTooLarge(limit)
+            digest.update(chunk)
+            f.write(chunk)
+        f.flush()
+        f.seek(0)
+        file_hash = digest.hexdigest()
+        path = SPOOL_DIR / f"{file_hash}{suffix}"
+        # Identical bytes under the same name, so replacing a concurrent copy is harmless
+        os.replace(partial, path)
+        return SpooledUpload(path, file_hash, size, f)
+    except BaseException:
+        f.close()
+        partial.unlink(missing_ok=True)
+        raise
+
+async def spool_upload(file: UploadFile, limit: int) -> SpooledUpload:
+    """Hash an upload while copying it to a content-addressed spool file, in one pass off the event loop"""
+    _check_declared_size(file, limit)
+    await file.seek(0)
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    if not re.fullmatch(r"\.[a-z0-9]{1,8}", suffix):
+        suffix = ""
+    return await run_in_threadpool(_spool, file.file, suffix, limit)
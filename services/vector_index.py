@@ -0,0 +1,252 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from core.logging import logger
+
+class _Snapshot:
+    """Consistent read-only view of the committed rows"""
+
+    __slots__ = ("rows", "vectors", "ids", "lists", "centroids")
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.vectors: Optional[np.memmap] = None
+        self.ids: Optional[np.memmap] = None
+        self.lists: Optional[np.memmap] = None
+        self.centroids: Optional[np.ndarray] = None
+
+class MemmapVectorIndex:
+    """Append-only float16 embedding matrix on disk, searched through np.memmap
+
+    Files under ``directory``:
+      ``<name>.f16``    row-major float16 vectors, ``dim`` values per row
+      ``<name>.ids``    int64 row ids (database primary keys), one per row
+      ``<name>.lists``  int32 IVF list of every row, once IVF is trained
+      ``<name>.ivf.npy`` float32 IVF centroids
+      ``<name>.json``   dimension of the stored vectors
+
+    Rows are appended under an exclusive file lock, vectors first and ids
+    last, so the size of the ids file is the number of complete rows. Every
+    process maps the same files read-only; pages are shared through the OS
+    page cache instead of each worker holding its own copy.
+
+    IVF centroids are only trained by ``train_ivf``, run offline through
+    ``scripts.train_image_index``; appends just assign new rows to the
+    existing centroids.
+    """
+
+    BLOCK_ROWS = 8192  # float32 scratch of ~36 MB per block at 1152 dims
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        dim: int,
+        ivf_lists: int = 0,
+        ivf_min_rows: int = 0,
+        ivf_probes: int = 8
+    ):
+        self.directory = Path(directory)
+        self.dim = dim
+        self.ivf_lists = ivf_lists
+        self.ivf_min_rows = ivf_min_rows
+        self.ivf_probes = ivf_probes
+        self._vectors_path = self.directory / f"{name}.f16"
+        self._ids_path = self.directory / f"{name}.ids"
+        self._lists_path = self.directory / f"{name}.lists"
+        self._centroids_path = self.directory / f"{name}.ivf.npy"
+        self._meta_path = self.directory / f"{name}.json"
+        self._lock_path = self.directory / f"{name}.lock"
+        self._local = threading.Lock()
+        self._snapshot_key: Optional[Tuple[int, bool]] = None
+        self._snapshot: Optional[_Snapshot] = None
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self._meta_path.exists():
+            stored_dim = json.loads(self._meta_path.read_text())["dim"]
+            if stored_dim != dim:
+                raise ValueError(f"Index at {self._vectors_path} holds {stored_dim}-dim vectors, expected {dim}")
+        else:
+            self._meta_path.write_text(json.dumps({"dim": dim}))
+
+    def __len__(self) -> int:
+        return self._ids_path.stat().st_size // 8 if self._ids_path.exists() else 0
+
+    @property
+    def uses_ivf(self) -> bool:
+        return self._centroids_path.exists()
+
+    def last_ids(self, count: int) -> np.ndarray:
+        """Ids of the most recently appended rows"""
+        snapshot = self._remap()
+        return np.array(snapshot.ids[-count:]) if snapshot.rows else np.zeros(0, dtype=np.int64)
+
+    def append(self, ids: np.ndarray, vectors: np.ndarray) -> int:
+        """Append rows whose ids are not already in the index tail; returns the number added"""
+        if not len(ids):
+            return 0
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        with self._file_lock():
+            # Another worker may have appended the same rows while we waited for the lock
+            known = self.last_ids(len(ids) * 4 + 1024)
+            keep = ~np.isin(ids, known)
+            ids, vectors = np.asarray(ids, dtype=np.int64)[keep], vectors[keep]
+            if not len(ids):
+                return 0
+
+            # Drop a partial row left behind by a writer that died before committing its ids
+            rows = len(self)
+            self._truncate(self._vectors_path, rows * self.dim * 2)
+            centroids = self._load_centroids()
+            if centroids is not None:
+                self._truncate(self._lists_path, rows * 4)
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.astype(np.float16).tobytes())
+            if centroids is not None:
+                with open(self._lists_path, "ab") as f:
+                    f.write(self._assign(vectors, centroids).astype(np.int32).tobytes())
+            with open(self._ids_path, "ab") as f:
+                f.write(ids.tobytes())
+        return len(ids)
+
+    @property
+    def needs_ivf(self) -> bool:
+        """Whether the index has outgrown exhaustive search and IVF has not been trained yet"""
+        return bool(self.ivf_lists) and not self.uses_ivf and len(self) >= self.ivf_min_rows
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and cosine similarities of the ``k`` nearest rows, best first"""
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+
+        snapshot = self._remap()
+        if not snapshot.rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        if snapshot.lists is not None:
+            probes = np.argsort(-(snapshot.centroids @ query))[:self.ivf_probes]
+            probed = np.flatnonzero(np.isin(snapshot.lists, probes))
+            candidates = ((probed[start:start + self.BLOCK_ROWS], None) for start in range(0, len(probed), self.BLOCK_ROWS))
+        else:
+            candidates = ((None, start) for start in range(0, snapshot.rows, self.BLOCK_ROWS))
+
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        for rows, start in candidates:
+            if rows is None:
+                rows = np.arange(start, min(start + self.BLOCK_ROWS, snapshot.rows))
+                block = snapshot.vectors[start:start + len(rows)]
+            else:
+                block = snapshot.vectors[rows]
+            scores = block.astype(np.float32) @ query
+            # Keep a running top-k across blocks
+            best_rows = np.concatenate([best_rows, rows])
+            best_scores = np.concatenate([best_scores, scores])
+            if len(best_scores) > k:
+                top = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[top], best_scores[top]
+
+        order = np.argsort(-best_scores)
+        return np.array(snapshot.ids[best_rows[order]]), best_scores[order]
+
+    def train_ivf(self, iterations: int = 10, sample_size: int = 100_000, seed: int = 0) -> int:
+        """Cluster the stored vectors into ``ivf_lists`` lists with spherical k-means; returns the list count
+
+        K-means runs on a snapshot without holding the file lock, so writers
+        are only blocked while every row is assigned to the new centroids.
+        """
+        snapshot = self._remap()
+        lists = min(self.ivf_lists, snapshot.rows)
+        if lists < 2:
+            return 0
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(snapshot.rows, min(sample_size, snapshot.rows), replace=False))
+        sample = snapshot.vectors[sample_rows].astype(np.float32)
+
+        centroids = sample[rng.choice(len(sample), lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.concatenate([
+                self._assign(sample[start:start + self.BLOCK_ROWS], centroids)
+                for start in range(0, len(sample), self.BLOCK_ROWS)
+            ])
+            for index in range(lists):
+                members = sample[assignment == index]
+                if len(members):
+                    centroids[index] = members.mean(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        with self._file_lock():
+            # Rows appended during k-means are assigned too
+            rows = len(self)
+            vectors = np.memmap(self._vectors_path, dtype=np.float16, mode="r", shape=(rows, self.dim))
+            staged_lists = self._lists_path.with_name(self._lists_path.name + ".tmp")
+            with open(staged_lists, "wb") as f:
+                for start in range(0, rows, self.BLOCK_ROWS):
+                    block = vectors[start:start + self.BLOCK_ROWS].astype(np.float32)
+                    f.write(self._assign(block, centroids).astype(np.int32).tobytes())
+            del vectors
+            # np.save appends .npy to names without it, so write through a handle
+            staged_centroids = self._centroids_path.with_name(self._centroids_path.name + ".tmp")
+            with open(staged_centroids, "wb") as f:
+                np.save(f, centroids)
+            os.replace(staged_lists, self._lists_path)
+            os.replace(staged_centroids, self._centroids_path)
+        logger.info(f"Trained IVF with {lists} lists over {rows} image embeddings")
+        return lists
+
+    def clear(self):
+        with self._file_lock():
+            for path in (self._vectors_path, self._ids_path, self._lists_path, self._centroids_path):
+                if path.exists():
+                    path.unlink()
+            with self._local:
+                self._snapshot_key = None
+                self._snapshot = None
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ centroids.T, axis=1)
+
+    def _load_centroids(self) -> Optional[np.ndarray]:
+        return np.load(self._centroids_path) if self._centroids_path.exists() else None
+
+    @staticmethod
+    def _truncate(path: Path, size: int):
+        if path.exists() and path.stat().st_size > size:
+            os.truncate(path, size)
+
+    def _remap(self) -> "_Snapshot":
+        """Maps of the committed rows, re-opened when other processes appended or trained IVF"""
+        key = (len(self), self.uses_ivf)
+        with self._local:
+            if key == self._snapshot_key:
+                return self._snapshot
+            rows, has_ivf = key
+            snapshot = _Snapshot(rows)
+            if rows:
+                snapshot.vectors = np.memmap(self._vectors_path, dtype=np.float16, mode="r", shape=(rows, self.dim))
+                snapshot.ids = np.memmap(self._ids_path, dtype=np.int64, mode="r", shape=(rows,))
+                if has_ivf and self._lists_path.exists() and self._lists_path.stat().st_size // 4 >= rows:
+                    snapshot.centroids = self._load_centroids()
+                    snapshot.lists = np.memmap(self._lists_path, dtype=np.int32, mode="r", shape=(rows,))
+            self._snapshot_key = key
+            self._snapshot = snapshot
+            return snapshot
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,75 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from core.config import settings
+from core.logging import logger
+from services.inference import InferenceService
+
+class ModelWarmup:
+    """Parallel model loading and warmup at startup, tracked for the readiness probe
+
+    Every model in WARMUP_MODELS is loaded and run once on a synthetic input
+    in its own thread. The instance reports ready only once all of them
+    have finished warming, so a load balancer polling ``/ready`` keeps
+    traffic away until the first real request can be served at full speed.
+    """
+
+    _lock = threading.Lock()
+    _status: Dict[str, Dict[str, Any]] = {}
+    _threads: List[threading.Thread] = []
+    _started = False
+
+    @classmethod
+    def start(cls, models: Optional[List[str]] = None):
+        """Start loading and warming ``models`` (default WARMUP_MODELS) in background threads"""
+        models = list(dict.fromkeys(settings.WARMUP_MODELS if models is None else models))
+        with cls._lock:
+            if cls._started:
+                return
+            cls._started = True
+            cls._status = {model_type: {"status": "pending"} for model_type in models}
+            cls._threads = [
+                threading.Thread(target=cls._warm, args=(model_type,), name=f"warmup-{model_type}", daemon=True)
+                for model_type in models
+            ]
+        logger.info(f"Warming up models in parallel: {', '.join(models) or 'none'}")
+        for thread in cls._threads:
+            thread.start()
+
+    @classmethod
+    def ready(cls) -> bool:
+        with cls._lock:
+            return cls._started and all(state["status"] == "ready" for state in cls._status.values())
+
+    @classmethod
+    def status(cls) -> Dict[str, Dict[str, Any]]:
+        with cls._lock:
+            return {model_type: dict(state) for model_type, state in cls._status.items()}
+
+    @classmethod
+    def _set(cls, model_type: str, **state):
+        with cls._lock:
+            cls._status[model_type].update(state)
+
+    @classmethod
+    def _warm(cls, model_type: str):
+        start_time = time.time()
+        cls._set(model_type, status="warming")
+        try:
+            warmup_seconds = InferenceService.warmup(model_type)
+        except Exception as e:
+            logger.error(f"Warmup of {model_type} model failed: {str(e)}")
+            cls._set(model_type, status="failed", error=str(e))
+            return
+        total_seconds = time.time() - start_time
+        logger.info(
+            f"{model_type.capitalize()} model ready in {total_seconds:.2f}s "
+            f"(warmup pass {warmup_seconds:.2f}s)"
+        )
+        cls._set(
+            model_type,
+            status="ready",
+            load_seconds=round(total_seconds - warmup_seconds, 2),
+            warmup_seconds=round(warmup_seconds, 2)
+        )
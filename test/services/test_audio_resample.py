@@ -0,0 +1,80 @@
+import io
+from math import ceil, gcd
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+from services import audio_io
+from services.audio_io import SAMPLE_RATE, _resample_blocks, load_audio
+
+RATES = (8000, 22050, 44100, 48000)
+
+def _factors(rate: int):
+    factor = gcd(rate, SAMPLE_RATE)
+    return SAMPLE_RATE // factor, rate // factor
+
+def _one_shot(signal: np.ndarray, rate: int) -> np.ndarray:
+    up, down = _factors(rate)
+    return resample_poly(signal, up, down)[:ceil(len(signal) * up / down)]
+
+def _blocks(signal: np.ndarray, size: int):
+    return (signal[start:start + size] for start in range(0, len(signal), size))
+
+def test_block_resampling_matches_one_shot():
+    """إعادة التشكيل على دفعات تطابق resample_poly على الإشارة كاملة"""
+    rng = np.random.default_rng(0)
+    for rate in RATES:
+        up, down = _factors(rate)
+        signal = rng.uniform(-1, 1, rate * 3 + 17).astype(np.float32)
+        expected = _one_shot(signal, rate)
+        # Block sizes as load_audio reads them, and smaller than the filter context
+        for size in (rate // down * down, down, 7 * down, 3 * rate // 2 // down * down):
+            result = _resample_blocks(_blocks(signal, size), up, down)
+            assert result.dtype == np.float32
+            assert len(result) == len(expected), (rate, size)
+            np.testing.assert_array_equal(result, expected, err_msg=f"{rate} Hz in blocks of {size}")
+
+def test_block_resampling_of_short_and_empty_signals():
+    """الإشارات الأقصر من سياق المرشح والفارغة"""
+    for rate in RATES:
+        up, down = _factors(rate)
+        signal = np.linspace(-1, 1, down * 3 + 1, dtype=np.float32)
+        np.testing.assert_array_equal(_resample_blocks(_blocks(signal, down), up, down), _one_shot(signal, rate))
+        assert len(_resample_blocks(iter([]), up, down)) == 0
+
+def test_load_audio_streams_and_downmixes():
+    """قراءة ملف WAV ستيريو على دفعات تساوي دمج القناتين ثم إعادة التشكيل مرة واحدة"""
+    rng = np.random.default_rng(1)
+    block_seconds = audio_io.READ_BLOCK_SECONDS
+    audio_io.READ_BLOCK_SECONDS = 1  # many blocks in a short file
+    try:
+        for rate in RATES:
+            stereo = rng.uniform(-0.5, 0.5, (rate * 4 + 5, 2)).astype(np.float32)
+            buffer = io.BytesIO()
+            sf.write(buffer, stereo, rate, format="WAV", subtype="FLOAT")
+            expected = _one_shot(stereo.mean(axis=1), rate)
+
+            buffer.seek(0)
+            audio = load_audio(buffer)
+            assert audio.dtype == np.float32
+            assert len(audio) == len(expected), rate
+            np.testing.assert_array_equal(audio, expected, err_msg=f"{rate} Hz")
+            # A file object that was already read is decoded from its start again
+            np.testing.assert_array_equal(load_audio(buffer), audio)
+    finally:
+        audio_io.READ_BLOCK_SECONDS = block_seconds
+
+def test_load_audio_at_target_rate_is_not_resampled():
+    """الملف المسجل بتردد 16 kHz يُعاد كما هو بعد دمج القنوات"""
+    mono = np.random.default_rng(2).uniform(-0.5, 0.5, SAMPLE_RATE * 2).astype(np.float32)
+    buffer = io.BytesIO()
+    sf.write(buffer, mono, SAMPLE_RATE, format="WAV", subtype="FLOAT")
+    np.testing.assert_array_equal(load_audio(buffer), mono)
+
+if __name__ == "__main__":
+    test_block_resampling_matches_one_shot()
+    test_block_resampling_of_short_and_empty_signals()
+    test_load_audio_streams_and_downmixes()
+    test_load_audio_at_target_rate_is_not_resampled()
+    print("✅ اختبارات إعادة تشكيل الصوت على دفعات مكتملة")
@@ -0,0 +1,98 @@
+import numpy as np
+
+from core.config import settings
+from services.audio_io import (
+    FRAME_MS,
+    SAMPLE_RATE,
+    frame_energies,
+    plan_chunks,
+    speech_segments,
+    split_on_speech,
+    stitch_segments
+)
+
+def _energies(spans, frames: int, noise: float = -70.0, speech: float = -20.0) -> np.ndarray:
+    energies = np.full(frames, noise, dtype=np.float32)
+    for start, end in spans:
+        energies[start:end] = speech
+    return energies
+
+def test_speech_segments_pad_and_bridge():
+    """توسيع المقاطع بالهامش ودمج فترات الصمت القصيرة"""
+    energies = _energies([(10, 20), (23, 30), (60, 70)], 100)
+    assert speech_segments(energies, min_silence=5, pad=1) == [(9, 31), (59, 71)]
+    assert speech_segments(energies, min_silence=0, pad=0) == [(10, 20), (23, 30), (60, 70)]
+    # Padding never runs past the recording
+    assert speech_segments(_energies([(0, 5), (95, 100)], 100), min_silence=0, pad=3) == [(0, 8), (92, 100)]
+
+def test_speech_segments_without_pauses():
+    """التسجيل الخالي من الصمت يبقى كلاماً كاملاً والصامت لا ينتج مقاطع"""
+    assert speech_segments(np.full(50, -25.0, dtype=np.float32), min_silence=5, pad=2) == [(0, 50)]
+    assert speech_segments(np.full(50, -80.0, dtype=np.float32), min_silence=5, pad=2) == []
+    assert speech_segments(np.zeros(0, dtype=np.float32), min_silence=5, pad=2) == []
+
+def test_plan_chunks_respects_window():
+    """المقاطع تُجمع حتى حد النافذة، والمقطع الطويل يُقطع عند أهدأ إطار"""
+    energies = _energies([(0, 40), (50, 70), (100, 400)], 400)
+    energies[300] = -45.0  # a short dip inside the long run
+    chunks = plan_chunks([(0, 40), (50, 70), (100, 400)], energies, max_frames=250)
+
+    assert chunks[0] == (0, 70)
+    assert all(end - start <= 250 for start, end in chunks)
+    assert chunks[1] == (100, 300)
+    assert chunks[2] == (300, 400)
+    # Consecutive chunks never overlap and keep every voiced frame
+    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+        assert end <= start
+    covered = np.zeros(400, dtype=bool)
+    for start, end in chunks:
+        covered[start:end] = True
+    assert covered[0:40].all() and covered[50:70].all() and covered[100:400].all()
+
+def test_split_on_speech_end_to_end():
+    """تقسيم تسجيل اصطناعي: نغمات تفصلها فترات صمت، وكل جزء ضمن نافذة Whisper"""
+    rng = np.random.default_rng(0)
+    seconds = 75
+    audio = rng.normal(0, 1e-4, SAMPLE_RATE * seconds).astype(np.float32)
+    tone = 0.3 * np.sin(2 * np.pi * 220 * np.arange(SAMPLE_RATE * 20) / SAMPLE_RATE).astype(np.float32)
+    for start in (2, 27, 52):
+        audio[start * SAMPLE_RATE:(start + 20) * SAMPLE_RATE] += tone
+
+    spans = split_on_speech(audio)
+    window = int(settings.AUDIO_CHUNK_SECONDS * SAMPLE_RATE)
+    assert len(spans) == 3, spans
+    for (start, end), speech_start in zip(spans, (2, 27, 52)):
+        assert 0 <= start < end <= len(audio)
+        assert end - start <= window
+        assert start <= speech_start * SAMPLE_RATE and end >= (speech_start + 20) * SAMPLE_RATE
+
+def test_frame_energies_pads_last_frame():
+    """آخر إطار غير مكتمل يُحسب مع حشوه بالأصفار"""
+    frame = SAMPLE_RATE * FRAME_MS // 1000
+    energies = frame_energies(np.ones(frame * 2 + frame // 2, dtype=np.float32), frame)
+    assert len(energies) == 3
+    assert np.allclose(energies[:2], 0.0, atol=1e-5)
+    assert np.isclose(energies[2], 10 * np.log10(0.5), atol=1e-3)
+
+def test_stitch_segments_places_and_clamps():
+    """توقيتات المقاطع تُنقل إلى خط زمن التسجيل ولا تتجاوز نهاية جزئها"""
+    spans = [(0, 5 * SAMPLE_RATE), (10 * SAMPLE_RATE, 12 * SAMPLE_RATE)]
+    pieces = [
+        [(0.0, 2.5, "first"), (2.5, 6.0, "second")],
+        [(0.5, 1.25, "third")]
+    ]
+    assert stitch_segments(spans, pieces, offset=100.0) == [
+        {"start": 100.0, "end": 102.5, "text": "first"},
+        {"start": 102.5, "end": 105.0, "text": "second"},
+        {"start": 110.5, "end": 111.25, "text": "third"}
+    ]
+    assert stitch_segments([], []) == []
+
+if __name__ == "__main__":
+    test_speech_segments_pad_and_bridge()
+    test_speech_segments_without_pauses()
+    test_plan_chunks_respects_window()
+    test_split_on_speech_end_to_end()
+    test_frame_energies_pads_last_frame()
+    test_stitch_segments_places_and_clamps()
+    print("✅ اختبارات تقسيم الصوت حسب نشاط الكلام مكتملة")
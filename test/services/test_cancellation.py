@@ -0,0 +1,69 @@
+import threading
+import time
+
+import torch
+
+from services.cancellation import CancellationCriteria, CancellationToken, InferenceCancelled
+
+def test_token_cancel_keeps_first_reason():
+    """أول سبب للإلغاء هو الذي يُحفظ"""
+    token = CancellationToken()
+    assert not token.is_cancelled()
+    token.cancel(CancellationToken.CLIENT_DISCONNECTED)
+    token.cancel(CancellationToken.DEADLINE_EXCEEDED)
+    assert token.is_cancelled()
+    assert token.reason == CancellationToken.CLIENT_DISCONNECTED
+    try:
+        token.raise_if_cancelled()
+        assert False, "cancelled token did not raise"
+    except InferenceCancelled as e:
+        assert e.reason == CancellationToken.CLIENT_DISCONNECTED
+        assert not e.deadline_exceeded
+
+def test_token_deadline():
+    """تجاوز المهلة يلغي الطلب بسبب deadline exceeded، وبدون مهلة لا ينتهي"""
+    token = CancellationToken(0.05)
+    assert not token.is_cancelled()
+    time.sleep(0.1)
+    assert token.is_cancelled()
+    try:
+        token.raise_if_cancelled()
+        assert False, "expired token did not raise"
+    except InferenceCancelled as e:
+        assert e.deadline_exceeded
+    assert CancellationToken(None).deadline is None
+    assert CancellationToken(0).deadline is None
+
+def test_cancel_from_another_thread():
+    """الإلغاء من خيط آخر يظهر فوراً لخيط الاستدلال"""
+    token = CancellationToken(60)
+    seen = threading.Event()
+
+    def worker():
+        while not token.is_cancelled():
+            time.sleep(0.001)
+        seen.set()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    token.cancel(CancellationToken.CLIENT_DISCONNECTED)
+    assert seen.wait(2)
+    thread.join()
+
+def test_criteria_stop_only_cancelled_requests():
+    """معيار التوقف يوقف صفوف الطلب الملغى فقط، بما فيها جميع حزمه (beams)"""
+    tokens = [CancellationToken(60), None, CancellationToken(60)]
+    criteria = CancellationCriteria(tokens)
+    assert criteria(torch.zeros(3, 5, dtype=torch.long), None).tolist() == [False, False, False]
+
+    tokens[2].cancel(CancellationToken.CLIENT_DISCONNECTED)
+    assert criteria(torch.zeros(3, 5, dtype=torch.long), None).tolist() == [False, False, True]
+    # Two beams per request occupy consecutive rows
+    assert criteria(torch.zeros(6, 5, dtype=torch.long), None).tolist() == [False, False, False, False, True, True]
+
+if __name__ == "__main__":
+    test_token_cancel_keeps_first_reason()
+    test_token_deadline()
+    test_cancel_from_another_thread()
+    test_criteria_stop_only_cancelled_requests()
+    print("✅ اختبارات الإلغاء والمهلة مكتملة")
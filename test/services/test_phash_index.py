@@ -0,0 +1,132 @@
+import io
+import random
+
+from PIL import Image, ImageDraw
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.multimodal import ImageAnalysis
+from services.image_io import perceptual_hash
+from services.phash_index import PerceptualHashIndex, to_signed, to_unsigned
+
+def _flip(phash: int, bits) -> int:
+    for bit in bits:
+        phash ^= 1 << bit
+    return phash
+
+def _brute_force(hashes, phash: int, max_distance: int):
+    distances = [(bin(candidate ^ phash).count("1"), analysis_id) for analysis_id, candidate in hashes]
+    distance, _ = min(distances)
+    return distance if distance <= max_distance else None
+
+def _lookup(phash: int, max_distance: int):
+    # A refresh window that never expires keeps lookup() away from the database
+    return PerceptualHashIndex.lookup(None, phash, max_distance)
+
+def test_lookup_matches_brute_force():
+    """البحث عبر جداول الأجزاء الأربعة يطابق المقارنة مع جميع البصمات"""
+    rng = random.Random(0)
+    refresh_seconds = PerceptualHashIndex.REFRESH_SECONDS
+    PerceptualHashIndex.clear()
+    PerceptualHashIndex.REFRESH_SECONDS = float("inf")
+    try:
+        hashes = [(analysis_id, rng.getrandbits(64)) for analysis_id in range(1, 2001)]
+        for analysis_id, phash in hashes:
+            PerceptualHashIndex.add(phash, analysis_id)
+
+        for max_distance in (0, 3, 4, 6, 8, 11):
+            for _ in range(200):
+                _, base = rng.choice(hashes)
+                query = _flip(base, rng.sample(range(64), rng.randint(0, 12)))
+                expected = _brute_force(hashes, query, max_distance)
+                match = _lookup(query, max_distance)
+                if expected is None:
+                    assert match is None, (max_distance, query, match)
+                else:
+                    assert match is not None and match[1] == expected, (max_distance, query, match, expected)
+                    assert bin(dict(hashes)[match[0]] ^ query).count("1") == match[1]
+    finally:
+        PerceptualHashIndex.REFRESH_SECONDS = refresh_seconds
+        PerceptualHashIndex.clear()
+
+def test_first_analysis_owns_duplicate_hashes():
+    """البصمة المكررة تعود إلى أول تحليل سُجلت له"""
+    refresh_seconds = PerceptualHashIndex.REFRESH_SECONDS
+    PerceptualHashIndex.clear()
+    PerceptualHashIndex.REFRESH_SECONDS = float("inf")
+    try:
+        PerceptualHashIndex.add(0xF0F0F0F0F0F0F0F0, 7)
+        PerceptualHashIndex.add(0xF0F0F0F0F0F0F0F0, 9)
+        assert _lookup(_flip(0xF0F0F0F0F0F0F0F0, [0, 17, 63]), 6) == (7, 3)
+    finally:
+        PerceptualHashIndex.REFRESH_SECONDS = refresh_seconds
+        PerceptualHashIndex.clear()
+
+def test_refresh_picks_up_rows_committed_out_of_order():
+    """الصفوف التي تُحفظ بعد صفوف بمعرفات أكبر تُفهرس في التحديث التالي مرة واحدة فقط"""
+    engine = create_engine("sqlite://")
+    ImageAnalysis.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+
+    def save(analysis_id: int, phash: int):
+        db.add(ImageAnalysis(id=analysis_id, filename=f"{analysis_id}.png", phash=to_signed(phash)))
+        db.commit()
+
+    PerceptualHashIndex.clear()
+    try:
+        save(1, 0x1111111111111111)
+        save(3, 0x3333333333333333)
+        PerceptualHashIndex.refresh(db, force=True)
+        assert PerceptualHashIndex.lookup(db, 0x3333333333333333, 0) == (3, 0)
+
+        # Id 2 was allocated before 3 but its transaction committed afterwards,
+        # and it is an earlier copy of the same image, so it owns the hash
+        save(2, 0x3333333333333333)
+        PerceptualHashIndex.refresh(db, force=True)
+        assert PerceptualHashIndex.lookup(db, 0x3333333333333333, 0) == (2, 0)
+        assert len(PerceptualHashIndex._owners) == 2
+
+        # Rows already indexed are not added again on later rescans
+        PerceptualHashIndex.refresh(db, force=True)
+        assert PerceptualHashIndex._recent_ids == {1, 2, 3}
+
+        # Ids that fall below the rescan window are forgotten
+        overlap = PerceptualHashIndex.REFRESH_OVERLAP
+        save(overlap + 10, 0x4444444444444444)
+        PerceptualHashIndex.refresh(db, force=True)
+        assert PerceptualHashIndex._recent_ids == {overlap + 10}
+        assert PerceptualHashIndex.lookup(db, 0x4444444444444444, 0) == (overlap + 10, 0)
+    finally:
+        PerceptualHashIndex.clear()
+        db.close()
+
+def test_signed_round_trip():
+    """تحويل البصمة إلى BIGINT موقّع والعودة منه دون فقدان"""
+    for phash in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = to_signed(phash)
+        assert -(1 << 63) <= signed < 1 << 63
+        assert to_unsigned(signed) == phash
+
+def test_hash_survives_rescale_and_recompression():
+    """إعادة التحجيم وإعادة الضغط لا تغير إلا بتات قليلة من البصمة"""
+    image = Image.new("RGB", (640, 480), "black")
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((120, 80, 420, 380), fill=(200, 200, 200))
+    draw.rectangle((380, 260, 600, 440), fill=(90, 90, 90))
+
+    buffer = io.BytesIO()
+    image.resize((320, 240)).save(buffer, "JPEG", quality=70)
+    copy = Image.open(io.BytesIO(buffer.getvalue()))
+
+    other = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    distance = bin(perceptual_hash(image) ^ perceptual_hash(copy)).count("1")
+    assert distance <= 6, distance
+    assert bin(perceptual_hash(image) ^ perceptual_hash(other)).count("1") > 6
+
+if __name__ == "__main__":
+    test_lookup_matches_brute_force()
+    test_first_analysis_owns_duplicate_hashes()
+    test_refresh_picks_up_rows_committed_out_of_order()
+    test_signed_round_trip()
+    test_hash_survives_rescale_and_recompression()
+    print("✅ اختبارات فهرس البصمة الإدراكية مكتملة")
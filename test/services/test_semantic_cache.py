@@ -0,0 +1,117 @@
+from contextlib import contextmanager
+
+import numpy as np
+
+from core.config import settings
+from services.semantic_cache import SemanticCache
+from utils.model_loader import ModelLoader
+
+VOCABULARY = ["diabetes", "symptoms", "of", "what", "are", "the", "fever", "treatment", "child"]
+
+def fake_embed(texts):
+    """تضمين حتمي من عدد الكلمات بدلاً من نموذج الترميز"""
+    vectors = np.zeros((len(texts), len(VOCABULARY) + 1), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.split():
+            column = VOCABULARY.index(word) if word in VOCABULARY else len(VOCABULARY)
+            vectors[row, column] += 1
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@contextmanager
+def semantic_cache(embed=fake_embed, **overrides):
+    """ذاكرة فارغة مع ترميز مزيف وإعدادات مؤقتة، تُستعاد بعد الاختبار"""
+    overrides.setdefault("SEMANTIC_CACHE_ENABLED", True)
+    previous = {name: getattr(settings, name) for name in overrides}
+    original_embed = SemanticCache.__dict__["embed"]
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    if embed is not None:
+        SemanticCache.embed = staticmethod(embed)
+    SemanticCache.clear()
+    SemanticCache._encoder_error = None
+    try:
+        yield SemanticCache
+    finally:
+        SemanticCache.embed = original_embed
+        SemanticCache.clear()
+        SemanticCache._encoder_error = None
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+def test_exact_and_near_duplicate_hits():
+    """السؤال المطابق بعد التطبيع أو القريب جداً يعيد الإجابة المخزنة"""
+    with semantic_cache(SEMANTIC_CACHE_THRESHOLD=0.9) as cache:
+        assert cache.lookup("What are the symptoms of diabetes?", "a:100") is None
+        cache.store("What are the symptoms of diabetes?", "a:100", {"answer": "A"})
+
+        assert cache.lookup("  what are the SYMPTOMS of diabetes ", "a:100") == {"answer": "A"}
+        assert cache.lookup("what are the symptoms of the diabetes", "a:100") == {"answer": "A"}
+        assert cache.lookup("treatment of fever in a child", "a:100") is None
+
+def test_scopes_are_isolated():
+    """الإجابة لا تُشارك بين مستخدمين أو أطوال مختلفة"""
+    with semantic_cache() as cache:
+        cache.store("symptoms of diabetes", "a:100", {"answer": "A"})
+        assert cache.lookup("symptoms of diabetes", "b:100") is None
+        assert cache.lookup("symptoms of diabetes", "a:200") is None
+        assert cache.lookup("symptoms of diabetes", "a:100") == {"answer": "A"}
+
+def test_expired_and_stale_version_entries_miss():
+    """المدخلات المنتهية أو الخاصة بإصدار نموذج قديم لا تُعاد"""
+    with semantic_cache(TEXT_MODEL_VERSION="v1") as cache:
+        cache.store("symptoms of diabetes", "a:100", {"answer": "A"}, ttl=-1)
+        assert cache.lookup("symptoms of diabetes", "a:100") is None
+
+        cache.store("fever treatment", "a:100", {"answer": "B"})
+        settings.TEXT_MODEL_VERSION = "v2"
+        assert cache.lookup("fever treatment", "a:100") is None
+
+def test_compaction_keeps_newest_entries():
+    """عند امتلاء الذاكرة تُحذف المدخلات المنتهية ثم الأقدم"""
+    with semantic_cache(SEMANTIC_CACHE_MAX_ENTRIES=3) as cache:
+        cache.store("diabetes", "a:100", {"answer": 0}, ttl=-1)
+        for index, prompt in enumerate(["symptoms", "fever", "treatment"], start=1):
+            cache.store(prompt, "a:100", {"answer": index})
+        assert len(cache._entries) == 3
+        assert cache.lookup("diabetes", "a:100") is None
+
+        cache.store("child", "a:100", {"answer": 4})
+        assert len(cache._entries) == 3
+        assert cache.lookup("symptoms", "a:100") is None
+        assert [cache.lookup(prompt, "a:100") for prompt in ["fever", "treatment", "child"]] == [
+            {"answer": 2}, {"answer": 3}, {"answer": 4}
+        ]
+
+def test_encoder_failure_disables_cache():
+    """فشل تحميل نموذج الترميز مرة واحدة يعطل الذاكرة بقية العملية بدون إعادة المحاولة"""
+    calls = []
+
+    def failing_load():
+        calls.append(1)
+        raise OSError("encoder is not in the local cache")
+
+    original_load = ModelLoader.__dict__["get_embedding_model"]
+    ModelLoader.get_embedding_model = staticmethod(failing_load)
+    try:
+        with semantic_cache(embed=None) as cache:
+            # A seeded row forces lookup past the exact-match fast path into the encoder
+            cache._entries.append(None)
+            assert cache.lookup("symptoms of diabetes", "a:100") is None
+            cache._entries.clear()
+            assert calls == [1]
+            assert not cache.enabled()
+
+            cache.store("symptoms of diabetes", "a:100", {"answer": "A"})
+            assert cache.lookup("symptoms of diabetes", "a:100") is None
+            assert calls == [1]
+            assert cache._entries == []
+    finally:
+        ModelLoader.get_embedding_model = original_load
+
+if __name__ == "__main__":
+    test_exact_and_near_duplicate_hits()
+    test_scopes_are_isolated()
+    test_expired_and_stale_version_entries_miss()
+    test_compaction_keeps_newest_entries()
+    test_encoder_failure_disables_cache()
+    print("✅ اختبارات ذاكرة الإجابات الدلالية مكتملة")
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import torch
+
+from services.batching import TextBatchScheduler
+from services.cancellation import CancellationToken, InferenceCancelled
+from services.decoding import TokenBudgetCriteria
+
+class _RecordingGenerate:
+    """generate_fn that records every batch and echoes its prompts"""
+
+    def __init__(self, delay: float = 0.0):
+        self.batches = []
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self, prompts, max_length, profile, cancel_tokens):
+        with self.lock:
+            self.batches.append((list(prompts), max_length, profile))
+        time.sleep(self.delay)
+        return [f"{prompt}:{max_length}:{profile}" for prompt in prompts]
+
+def test_concurrent_prompts_share_a_batch():
+    """الطلبات المتزامنة ضمن نافذة الانتظار تُجمع في استدعاء واحد"""
+    generate = _RecordingGenerate()
+    scheduler = TextBatchScheduler(generate, max_batch_size=8, wait_ms=200)
+    futures = [scheduler.submit(f"p{index}", 64, "greedy") for index in range(5)]
+    assert [future.result(timeout=5) for future in futures] == [f"p{index}:64:greedy" for index in range(5)]
+    assert len(generate.batches) == 1
+    assert generate.batches[0][0] == [f"p{index}" for index in range(5)]
+
+def test_batches_respect_size_and_grouping():
+    """حجم الدفعة الأقصى، وفصل الطلبات بحسب max_length وملف فك الترميز"""
+    generate = _RecordingGenerate()
+    scheduler = TextBatchScheduler(generate, max_batch_size=3, wait_ms=200)
+    futures = [scheduler.submit(f"a{index}", 64, "greedy") for index in range(4)]
+    futures += [scheduler.submit("b", 128, "greedy"), scheduler.submit("c", 64, "beam")]
+    results = [future.result(timeout=5) for future in futures]
+    assert results[4] == "b:128:greedy" and results[5] == "c:64:beam"
+    assert all(len(prompts) <= 3 for prompts, _, _ in generate.batches)
+    # Every batch holds prompts of a single (max_length, profile) group only
+    for prompts, max_length, profile in generate.batches:
+        assert all(f"{prompt}:{max_length}:{profile}" in results for prompt in prompts)
+
+def test_cancelled_prompts_are_dropped_before_generation():
+    """الطلب الملغى قبل بدء التوليد لا يدخل الدفعة"""
+    generate = _RecordingGenerate()
+    scheduler = TextBatchScheduler(generate, max_batch_size=8, wait_ms=100)
+    token = CancellationToken()
+    token.cancel(CancellationToken.CLIENT_DISCONNECTED)
+    cancelled = scheduler.submit("gone", 64, None, token)
+    kept = scheduler.submit("kept", 64, None, CancellationToken(60))
+    assert kept.result(timeout=5) == "kept:64:None"
+    try:
+        cancelled.result(timeout=5)
+        assert False, "cancelled prompt returned a result"
+    except InferenceCancelled as e:
+        assert e.reason == CancellationToken.CLIENT_DISCONNECTED
+    assert all("gone" not in prompts for prompts, _, _ in generate.batches)
+
+def test_generation_errors_reach_every_caller():
+    """خطأ التوليد يصل إلى جميع طلبات الدفعة ولا يوقف المجدول"""
+    calls = []
+
+    def failing(prompts, max_length, profile, cancel_tokens):
+        calls.append(prompts)
+        if len(calls) == 1:
+            raise RuntimeError("out of memory")
+        return list(prompts)
+
+    scheduler = TextBatchScheduler(failing, max_batch_size=8, wait_ms=100)
+    futures = [scheduler.submit(prompt, 64) for prompt in ("x", "y")]
+    for future in futures:
+        assert isinstance(future.exception(timeout=5), RuntimeError)
+    assert scheduler.submit("z", 64).result(timeout=5) == "z"
+
+def test_token_budget_is_per_row():
+    """كل صف يتوقف بعد عدد الرموز الجديدة الخاص به مهما كان طول الحشو"""
+    criteria = TokenBudgetCriteria(prompt_length=10, budgets=[3, 5])
+    assert criteria(torch.zeros(2, 12, dtype=torch.long), None).tolist() == [False, False]
+    assert criteria(torch.zeros(2, 13, dtype=torch.long), None).tolist() == [True, False]
+    assert criteria(torch.zeros(2, 15, dtype=torch.long), None).tolist() == [True, True]
+    # Beam search keeps num_beams consecutive rows per request
+    assert criteria(torch.zeros(4, 13, dtype=torch.long), None).tolist() == [True, True, False, False]
+
+if __name__ == "__main__":
+    test_concurrent_prompts_share_a_batch()
+    test_batches_respect_size_and_grouping()
+    test_cancelled_prompts_are_dropped_before_generation()
+    test_generation_errors_reach_every_caller()
+    test_token_budget_is_per_row()
+    print("✅ اختبارات مجدول دفعات النص مكتملة")
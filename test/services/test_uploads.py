@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import io
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from fastapi import UploadFile
+
+from core.config import settings
+from services import uploads
+from services.uploads import UploadTooLarge, read_upload, spool_upload, upload_limit
+
+DATA = b"RIFF" + bytes(range(256)) * 4096
+
+@contextmanager
+def spool_dir():
+    """مجلد مؤقت بدلاً من temp/ في جذر المشروع"""
+    original = uploads.SPOOL_DIR
+    with tempfile.TemporaryDirectory() as directory:
+        uploads.SPOOL_DIR = Path(directory)
+        try:
+            yield Path(directory)
+        finally:
+            uploads.SPOOL_DIR = original
+
+def _upload(data: bytes, filename: str = "clip.wav", size=None) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename=filename, size=size)
+
+def test_spool_is_content_addressed():
+    """الملف يُنسخ باسم بصمته مع الامتداد، ويُقرأ عبر المقبض المفتوح"""
+    with spool_dir() as directory:
+        upload = asyncio.run(spool_upload(_upload(DATA, "Clip.WAV"), len(DATA)))
+        try:
+            assert upload.file_hash == hashlib.sha256(DATA).hexdigest()
+            assert upload.size == len(DATA)
+            assert upload.path == directory / f"{upload.file_hash}.wav"
+            assert upload.file.read() == DATA
+            assert [path.name for path in directory.iterdir()] == [upload.path.name]
+        finally:
+            upload.close()
+        assert list(directory.iterdir()) == []
+
+def test_unsafe_suffix_is_dropped():
+    """الامتدادات غير المألوفة لا تدخل في اسم الملف"""
+    with spool_dir() as directory:
+        upload = asyncio.run(spool_upload(_upload(DATA, "clip.wav;rm"), len(DATA)))
+        try:
+            assert upload.path == directory / upload.file_hash
+        finally:
+            upload.close()
+
+def test_oversized_upload_leaves_nothing_behind():
+    """تجاوز الحد يرفع UploadTooLarge ويحذف النسخة الجزئية"""
+    with spool_dir() as directory:
+        try:
+            asyncio.run(spool_upload(_upload(DATA), len(DATA) - 1))
+            assert False, "oversized upload was spooled"
+        except UploadTooLarge as e:
+            assert e.limit == len(DATA) - 1
+        assert list(directory.iterdir()) == []
+
+        # A declared size over the limit fails before any byte is read
+        source = _upload(DATA, size=len(DATA))
+        try:
+            asyncio.run(spool_upload(source, 10))
+            assert False, "declared size was not checked"
+        except UploadTooLarge:
+            pass
+        assert source.file.tell() == 0
+
+def test_duplicate_uploads_keep_their_own_copies():
+    """رفعان متطابقان متزامنان: كل طلب يقرأ نسخته، ولا يحذف أحدهما نسخة الآخر"""
+    with spool_dir() as directory:
+        first = asyncio.run(spool_upload(_upload(DATA), len(DATA)))
+        second = asyncio.run(spool_upload(_upload(DATA), len(DATA)))
+        assert first.path == second.path
+
+        # The second copy replaced the first at the shared path
+        first.close()
+        assert second.path.exists()
+        assert second.file.read() == DATA
+
+        third = asyncio.run(spool_upload(_upload(DATA), len(DATA)))
+        # The third request's close removes the path while the second still decodes
+        third.close()
+        assert not second.path.exists()
+        second.file.seek(0)
+        assert second.file.read() == DATA
+        second.close()
+        assert list(directory.iterdir()) == []
+
+def test_read_upload_and_limits():
+    """قراءة الرفع في الذاكرة مع بصمته، وحدود الحجم حسب المسار"""
+    data, file_hash = asyncio.run(read_upload(_upload(DATA), len(DATA)))
+    assert data == DATA and file_hash == hashlib.sha256(DATA).hexdigest()
+    try:
+        asyncio.run(read_upload(_upload(DATA), len(DATA) - 1))
+        assert False, "oversized upload was read"
+    except UploadTooLarge:
+        pass
+
+    megabyte = 1024 ** 2
+    assert upload_limit("/ai/audio") == settings.AUDIO_UPLOAD_MAX_MB * megabyte
+    assert upload_limit("/ai/image") == settings.IMAGE_UPLOAD_MAX_MB * megabyte
+    assert upload_limit("/ai/image/batch") == settings.IMAGE_UPLOAD_MAX_MB * settings.IMAGE_BATCH_MAX_FILES * megabyte
+    assert upload_limit("/ai/text") is None
+
+if __name__ == "__main__":
+    test_spool_is_content_addressed()
+    test_unsafe_suffix_is_dropped()
+    test_oversized_upload_leaves_nothing_behind()
+    test_duplicate_uploads_keep_their_own_copies()
+    test_read_upload_and_limits()
+    print("✅ اختبارات حفظ الملفات المرفوعة مكتملة")
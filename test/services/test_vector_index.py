@@ -0,0 +1,160 @@
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from scripts import train_image_index
+from services.image_search import ImageSearchService
+from services.vector_index import MemmapVectorIndex
+
+DIM = 16
+
+def _vectors(count: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def _brute_force(vectors: np.ndarray, ids: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    stored = vectors.astype(np.float16).astype(np.float32)
+    return ids[np.argsort(-(stored @ query))[:k]]
+
+def test_search_matches_brute_force():
+    """البحث الشامل عبر الكتل يطابق المقارنة المباشرة مع جميع المتجهات"""
+    with tempfile.TemporaryDirectory() as directory:
+        index = MemmapVectorIndex(Path(directory), "test", DIM)
+        index.BLOCK_ROWS = 64
+        vectors = _vectors(500)
+        ids = np.arange(1, 501, dtype=np.int64) * 10
+        assert index.append(ids[:300], vectors[:300]) == 300
+        assert index.append(ids[300:], vectors[300:]) == 200
+        assert len(index) == 500
+
+        for query in _vectors(20, seed=1):
+            found, scores = index.search(query, 7)
+            assert found.tolist() == _brute_force(vectors, ids, query, 7).tolist()
+            assert np.all(np.diff(scores) <= 0)
+
+def test_append_skips_known_ids_and_partial_rows():
+    """الصفوف الموجودة لا تُكرر، وبقايا كاتب توقف قبل حفظ المعرفات تُحذف"""
+    with tempfile.TemporaryDirectory() as directory:
+        index = MemmapVectorIndex(Path(directory), "test", DIM)
+        vectors = _vectors(10)
+        index.append(np.arange(5), vectors[:5])
+        assert index.append(np.arange(3, 8), vectors[3:8]) == 3
+        assert len(index) == 8
+
+        # A writer that died after writing its vectors but before its ids
+        with open(Path(directory) / "test.f16", "ab") as f:
+            f.write(b"\x00" * (DIM * 2 * 3 + 5))
+        index.append(np.array([8, 9]), vectors[8:])
+        assert (Path(directory) / "test.f16").stat().st_size == 10 * DIM * 2
+        found, _ = index.search(vectors[9], 1)
+        assert found.tolist() == [9]
+
+def test_dimension_mismatch_is_rejected():
+    """فتح فهرس بحجم متجهات مختلف يرفع خطأ"""
+    with tempfile.TemporaryDirectory() as directory:
+        MemmapVectorIndex(Path(directory), "test", DIM)
+        try:
+            MemmapVectorIndex(Path(directory), "test", DIM * 2)
+            assert False, "opened an index with the wrong dimension"
+        except ValueError:
+            pass
+
+def test_concurrent_appends_keep_rows_whole():
+    """الكتابة المتزامنة من عدة كتّاب تحت قفل الملف لا تخلط الصفوف"""
+    with tempfile.TemporaryDirectory() as directory:
+        vectors = _vectors(400)
+        ids = np.arange(400, dtype=np.int64)
+
+        def writer(part: int):
+            # Each writer opens its own index, as separate worker processes do
+            index = MemmapVectorIndex(Path(directory), "test", DIM)
+            for start in range(part * 100, (part + 1) * 100, 10):
+                index.append(ids[start:start + 10], vectors[start:start + 10])
+
+        threads = [threading.Thread(target=writer, args=(part,)) for part in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        index = MemmapVectorIndex(Path(directory), "test", DIM)
+        assert len(index) == 400
+        stored_ids = np.array(index.last_ids(400))
+        assert sorted(stored_ids.tolist()) == ids.tolist()
+        stored = np.memmap(Path(directory) / "test.f16", dtype=np.float16, mode="r", shape=(400, DIM))
+        np.testing.assert_array_equal(stored, vectors[stored_ids].astype(np.float16))
+
+def test_ivf_training_and_appends():
+    """بعد تدريب IVF يجد البحث المتجهات المخزنة، والصفوف الجديدة تُسند إلى القوائم الموجودة"""
+    with tempfile.TemporaryDirectory() as directory:
+        index = MemmapVectorIndex(Path(directory), "test", DIM, ivf_lists=8, ivf_min_rows=300, ivf_probes=8)
+        vectors = _vectors(400)
+        index.append(np.arange(200), vectors[:200])
+        assert not index.needs_ivf
+        index.append(np.arange(200, 300), vectors[200:300])
+        # Appends never train on their own
+        assert index.needs_ivf and not index.uses_ivf
+
+        assert index.train_ivf(iterations=5) == 8
+        assert index.uses_ivf and not index.needs_ivf
+        index.append(np.arange(300, 400), vectors[300:])
+        assert (Path(directory) / "test.lists").stat().st_size == 400 * 4
+
+        # Probing every list is exhaustive, so results match brute force
+        for row in (0, 150, 350, 399):
+            found, _ = index.search(vectors[row], 5)
+            assert found[0] == row
+            assert found.tolist() == _brute_force(vectors, np.arange(400), vectors[row], 5).tolist()
+
+        index.clear()
+        assert len(index) == 0 and not index.uses_ivf
+
+@contextmanager
+def _train_script(index: MemmapVectorIndex, pgvector: bool = False):
+    """تشغيل سكربت التدريب على فهرس مؤقت بدون قاعدة بيانات"""
+    originals = {
+        name: ImageSearchService.__dict__[name] for name in ("_index", "uses_pgvector", "refresh")
+    }
+    argv = sys.argv
+    ImageSearchService._index = index
+    ImageSearchService.uses_pgvector = staticmethod(lambda db: pgvector)
+    ImageSearchService.refresh = staticmethod(lambda db: 0)
+    try:
+        yield lambda *args: (setattr(sys, "argv", ["train_image_index", *args]), train_image_index.main())
+    finally:
+        sys.argv = argv
+        for name, value in originals.items():
+            setattr(ImageSearchService, name, value)
+
+def test_train_image_index_script():
+    """السكربت يتجاوز الفهرس الصغير أو المدرب إلا مع --force، ويرفض العمل مع pgvector"""
+    with tempfile.TemporaryDirectory() as directory:
+        index = MemmapVectorIndex(Path(directory), "test", DIM, ivf_lists=4, ivf_min_rows=1000)
+        index.append(np.arange(100), _vectors(100))
+
+        with _train_script(index) as run:
+            run("--lists", "4")
+            assert not index.uses_ivf
+            run("--lists", "4", "--force", "--iterations", "3")
+            assert index.uses_ivf
+            assert np.load(Path(directory) / "test.ivf.npy").shape == (4, DIM)
+
+        with _train_script(index, pgvector=True) as run:
+            try:
+                run("--force")
+                assert False, "trained an on-disk index on pgvector"
+            except SystemExit:
+                pass
+
+if __name__ == "__main__":
+    test_search_matches_brute_force()
+    test_append_skips_known_ids_and_partial_rows()
+    test_dimension_mismatch_is_rejected()
+    test_concurrent_appends_keep_rows_whole()
+    test_ivf_training_and_appends()
+    test_train_image_index_script()
+    print("✅ اختبارات فهرس المتجهات مكتملة")
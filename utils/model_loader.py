@@ -1,22 +1,54 @@
 import torch
 from transformers import (
+    AutoModel,
     AutoModelForCausalLM,
     AutoTokenizer,
     AutoProcessor,
     WhisperForConditionalGeneration,
     WhisperProcessor
 )
+import gc
+import json
+import os
+import re
+import shutil
+import threading
 import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+import psutil
 from core.config import settings
 from core.logging import logger
 
 class ModelLoader:
-    """Singleton class to load and cache AI models"""
+    """Singleton class to load and cache AI models
+    
+    Models are loaded on first use and tracked with their resident size and
+    last use. When MODEL_MEMORY_BUDGET_MB is set, least recently used models
+    that no request is using are evicted to make room, and are loaded again
+    the next time they are needed.
+    """
     
     _instances = {}
     _device = "cuda" if torch.cuda.is_available() else "cpu"
     
+    # Evictions run one at a time; each model type loads under its own lock so
+    # different models can load in parallel, and leases are counted under a
+    # separate lock so requests for loaded models never wait behind a slow load
+    _lock = threading.RLock()
+    _lease_lock = threading.Lock()
+    _load_locks: Dict[str, threading.Lock] = {}
+    _loading: Set[str] = set()
+    _overlapped: Set[str] = set()  # loads that ran alongside another, so RSS growth is shared
+    _leases: Dict[str, int] = {}
+    _sizes: Dict[str, int] = {}  # kept after eviction as the estimate for reloading
+    _last_used: Dict[str, float] = {}
+    _idle_thread = None
+    _processors: Dict[str, Any] = {}
+    _processor_lock = threading.Lock()
+    _convert_on_load = False  # only set by convert(), run offline
+    
     # Determine project root dynamically and point to local_ai/bimedx2_local_
     _project_root = Path(__file__).resolve().parents[1]
     _text_model_path = _project_root / "local_ai" / "bimedx2_local_"
@@ -26,92 +58,519 @@ class ModelLoader:
         """Get base model path"""
         return str(cls._text_model_path)
 
+    @classmethod
+    def _cpu_bf16_supported(cls) -> bool:
+        """Whether this CPU has native bfloat16 kernels (AVX512-BF16 / AMX)"""
+        try:
+            return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+        except Exception:
+            return False
+    
+    @classmethod
+    def _model_dtype(cls):
+        """Weight dtype for the current device and CPU precision profile"""
+        if cls._device == "cuda":
+            return torch.float16
+        if settings.CPU_PRECISION == "bf16":
+            if cls._cpu_bf16_supported():
+                return torch.bfloat16
+            logger.warning("CPU has no bfloat16 support, falling back to float32")
+        return torch.float32
+    
+    @classmethod
+    def _apply_cpu_profile(cls, model):
+        """Apply dynamic int8 quantization of linear layers when the int8 profile is selected"""
+        model.eval()
+        if settings.CPU_PRECISION == "int8":
+            model = torch.ao.quantization.quantize_dynamic(
+                model,
+                {torch.nn.Linear},
+                dtype=torch.qint8
+            )
+        return model
+    
+    @classmethod
+    def _pretrained_kwargs(cls, **overrides) -> Dict[str, Any]:
+        """from_pretrained arguments that materialize every weight once, in its final dtype and place
+        
+        Modules are created on the meta device and filled straight from the
+        checkpoint; safetensors shards are memory-mapped and read tensor by
+        tensor, so no randomly initialized or full-precision copy is ever held.
+        """
+        kwargs = {
+            "torch_dtype": cls._model_dtype(),
+            "low_cpu_mem_usage": True,
+            "device_map": "auto" if cls._device == "cuda" else None
+        }
+        kwargs.update(overrides)
+        return kwargs
+    
+    @classmethod
+    def converted_model_path(cls, model_type: str, model_name: str) -> Optional[Path]:
+        """Local copy of a checkpoint already converted to this instance's dtype; None when disabled"""
+        if not settings.CONVERTED_MODELS_DIR:
+            return None
+        path = Path(settings.CONVERTED_MODELS_DIR)
+        if not path.is_absolute():
+            path = cls._project_root / path
+        dtype = str(cls._model_dtype()).replace("torch.", "")
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "--", str(model_name).strip("/"))
+        return path / f"{model_type}-{slug}-{dtype}"
+    
+    @classmethod
+    def _checkpoint(cls, model_type: str, model_name: str) -> Tuple[str, bool]:
+        """Where to load a model from, and whether that is its converted local copy"""
+        path = cls.converted_model_path(model_type, model_name)
+        if path is not None and path.is_dir():
+            logger.info(f"Using converted {model_type} checkpoint at {path}")
+            return str(path), True
+        return model_name, False
+    
+    @classmethod
+    def _is_converted(cls, source: Path) -> bool:
+        """Whether a local checkpoint directory holds safetensors in this instance's dtype"""
+        config_path = source / "config.json"
+        if not config_path.is_file() or not any(source.glob("*.safetensors")):
+            return False
+        config = json.loads(config_path.read_text(encoding="utf-8"))
+        dtype = str(cls._model_dtype()).replace("torch.", "")
+        return config.get("torch_dtype", config.get("dtype")) == dtype
+    
+    @classmethod
+    def convert(cls, model_type: str):
+        """Load a model from its original checkpoint and write its converted copy
+        
+        Run offline through ``scripts.export_models --convert`` before
+        deploying; serving processes only ever read the converted copy, so
+        no request waits on a multi-GB save.
+        """
+        cls._convert_on_load = True
+        try:
+            getattr(cls, f"get_{model_type}_model")()
+        finally:
+            cls._convert_on_load = False
+    
+    @classmethod
+    def _save_converted(cls, model_type: str, model_name: str, model, processor):
+        """Save a freshly loaded model as safetensors in its target dtype, for later boots
+        
+        Only done inside convert(). Skipped when the source already is such
+        a checkpoint on local disk.
+        Written to a temporary directory and renamed into place, so replicas
+        starting together and interrupted saves never leave a partial copy.
+        Int8 weights are quantized after loading, so the copy keeps the
+        float weights they are quantized from.
+        """
+        path = cls.converted_model_path(model_type, model_name)
+        if not cls._convert_on_load or path is None or cls._is_converted(Path(model_name)):
+            return
+        staging = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        start_time = time.time()
+        try:
+            model.save_pretrained(staging, safe_serialization=True)
+            processor.save_pretrained(staging)
+            os.replace(staging, path)
+            logger.info(f"Saved converted {model_type} checkpoint to {path} in {time.time() - start_time:.2f}s")
+        except Exception as e:
+            # Another process renamed its copy into place first, or the disk is read-only
+            logger.warning(f"Could not save converted {model_type} checkpoint to {path}: {e}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    
+    @classmethod
+    def backend_for(cls, model_type: str) -> str:
+        """Execution backend configured for a model type: eager, compile or onnx"""
+        backends = {"text": settings.TEXT_BACKEND, "image": settings.IMAGE_BACKEND}
+        backend = backends.get(model_type, "eager")
+        if backend == "onnx" and model_type != "text":
+            # Only the causal LM graph is exported; the multimodal model uses torch.compile
+            logger.warning(f"ONNX backend is not available for the {model_type} model, using compile")
+            return "compile"
+        return backend
+    
+    @classmethod
+    def exported_model_path(cls, model_type: str) -> Path:
+        path = Path(settings.EXPORTED_MODELS_DIR)
+        if not path.is_absolute():
+            path = cls._project_root / path
+        return path / model_type
+    
+    @classmethod
+    def _load_onnx_model(cls, model_type: str):
+        """Load an exported ONNX graph (see scripts/export_models.py) on ONNX Runtime"""
+        try:
+            from optimum.onnxruntime import ORTModelForCausalLM
+        except ImportError as e:
+            raise RuntimeError("The onnx backend requires `pip install optimum[onnxruntime]`") from e
+        
+        path = cls.exported_model_path(model_type)
+        if not path.exists():
+            raise FileNotFoundError(
+                f"No exported {model_type} model at {path}; run `python -m scripts.export_models --model {model_type}`"
+            )
+        provider = "CUDAExecutionProvider" if cls._device == "cuda" else "CPUExecutionProvider"
+        return ORTModelForCausalLM.from_pretrained(path, provider=provider, use_cache=True)
+    
+    @classmethod
+    def _apply_backend(cls, model, model_type: str):
+        """Wrap the forward pass in a torch.compile graph for the compile backend"""
+        if cls.backend_for(model_type) == "compile":
+            # Prompt and batch sizes vary per call, so compile with dynamic shapes
+            model.forward = torch.compile(model.forward, dynamic=True)
+        return model
+    
     @classmethod
     def _load_model(cls, model_name, model_type="text"):
-        """Load a model directly from Hugging Face Hub"""
-        if model_type not in cls._instances:
-            logger.info(f"Loading {model_type} model: {model_name}")
-            start_time = time.time()
-            
-            try:
-                if model_type == "text":
-                    if settings.TEST_MODE:
-                        model_name = cls._get_model_path()
+        """Load a model directly from Hugging Face Hub, or return the loaded instance
+        
+        Concurrent first requests wait on the model's load lock and share one
+        load, while other models load alongside. Idle models are evicted
+        before loading, using the size this model had last time, and again
+        once its actual size is known.
+        """
+        instance = cls._instances.get(model_type)
+        if instance is None:
+            with cls._lease_lock:
+                load_lock = cls._load_locks.setdefault(model_type, threading.Lock())
+            with load_lock:
+                if model_type not in cls._instances:
+                    with cls._lock:
+                        cls._make_room(cls._sizes.get(model_type, 0), keep=model_type)
+                    with cls._lease_lock:
+                        if cls._loading:
+                            cls._overlapped.update(cls._loading | {model_type})
+                        cls._loading.add(model_type)
+                    rss_before = psutil.Process().memory_info().rss
+                    logger.info(f"Loading {model_type} model: {model_name}")
+                    start_time = time.time()
                     
-                    tokenizer = AutoTokenizer.from_pretrained(
-                        model_name,
-                        trust_remote_code=True,
-                        local_files_only=True,
-                        use_fast=True,
-                    )
-                    model = AutoModelForCausalLM.from_pretrained(
-                        model_name,
-                        torch_dtype=torch.float16 if cls._device == "cuda" else torch.float32,
-                        trust_remote_code=True,
-                        local_files_only=True,
-                        device_map="auto" if cls._device == "cuda" else None
-                    )
-                    if cls._device != "cuda":
-                        model = model.to(cls._device)
-                    cls._instances[model_type] = (model, tokenizer)
+                    try:
+                        if model_type == "text":
+                            if settings.TEST_MODE:
+                                model_name = cls._get_model_path()
+                            source, converted = cls._checkpoint(model_type, model_name)
+                    
+                            tokenizer = AutoTokenizer.from_pretrained(
+                                source,
+                                trust_remote_code=True,
+                                local_files_only=True,
+                                use_fast=True,
+                            )
+                            # Batched generation needs left padding for decoder-only models
+                            if tokenizer.pad_token is None:
+                                tokenizer.pad_token = tokenizer.eos_token
+                            tokenizer.padding_side = "left"
+                            if cls.backend_for(model_type) == "onnx":
+                                model = cls._load_onnx_model(model_type)
+                                # The exported graph only takes ids and mask
+                                tokenizer.model_input_names = ["input_ids", "attention_mask"]
+                            else:
+                                model = AutoModelForCausalLM.from_pretrained(
+                                    source,
+                                    trust_remote_code=True,
+                                    local_files_only=True,
+                                    **cls._pretrained_kwargs()
+                                )
+                                if not converted:
+                                    cls._save_converted(model_type, model_name, model, tokenizer)
+                                if cls._device != "cuda":
+                                    model = cls._apply_cpu_profile(model.to(cls._device))
+                                model = cls._apply_backend(model, model_type)
+                            cls._instances[model_type] = (model, tokenizer)
                 
-                elif model_type == "image":
-                    # Load image model directly from Hugging Face Hub
-                    processor = AutoProcessor.from_pretrained(
-                        model_name,
-                        trust_remote_code=True
-                    )
-                    model = AutoModelForCausalLM.from_pretrained(
-                        model_name,
-                        torch_dtype=torch.float16 if cls._device == "cuda" else torch.float32,
-                        trust_remote_code=True,
-                        device_map="auto" if cls._device == "cuda" else None
-                    )
-                    if cls._device != "cuda":
-                        model = model.to(cls._device)
-                    cls._instances[model_type] = (model, processor)
+                        elif model_type == "draft":
+                            # Small draft model proposing tokens for speculative decoding
+                            source, converted = cls._checkpoint(model_type, model_name)
+                            tokenizer = AutoTokenizer.from_pretrained(
+                                source,
+                                trust_remote_code=True,
+                                use_fast=True,
+                            )
+                            model = AutoModelForCausalLM.from_pretrained(
+                                source,
+                                trust_remote_code=True,
+                                **cls._pretrained_kwargs()
+                            )
+                            if not converted:
+                                cls._save_converted(model_type, model_name, model, tokenizer)
+                            if cls._device != "cuda":
+                                model = cls._apply_cpu_profile(model.to(cls._device))
+                            cls._instances[model_type] = (model, tokenizer)
+                
+                        elif model_type == "embedding":
+                            # Small sentence encoder used by the semantic answer cache
+                            tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=True, use_fast=True)
+                            model = AutoModel.from_pretrained(
+                                model_name,
+                                local_files_only=True,
+                                low_cpu_mem_usage=True
+                            ).to(cls._device)
+                            model.eval()
+                            cls._instances[model_type] = (model, tokenizer)
                 
-                # elif model_type == "audio":
-                #     # Load audio model directly from Hugging Face Hub
-                #     processor = WhisperProcessor.from_pretrained(model_name)
-                #     model = WhisperForConditionalGeneration.from_pretrained(
-                #         model_name,
-                #         torch_dtype=torch.float16 if cls._device == "cuda" else torch.float32
-                #     ).to(cls._device)
-                #     model.config.forced_decoder_ids = None
-                #     cls._instances[model_type] = (model, processor)
+                        elif model_type == "image":
+                            # Load image model directly from Hugging Face Hub
+                            source, converted = cls._checkpoint(model_type, model_name)
+                            processor = AutoProcessor.from_pretrained(
+                                source,
+                                trust_remote_code=True
+                            )
+                            model = AutoModelForCausalLM.from_pretrained(
+                                source,
+                                trust_remote_code=True,
+                                **cls._pretrained_kwargs()
+                            )
+                            if not converted:
+                                cls._save_converted(model_type, model_name, model, processor)
+                            if cls._device != "cuda":
+                                model = cls._apply_cpu_profile(model.to(cls._device))
+                            model = cls._apply_backend(model, model_type)
+                            cls._instances[model_type] = (model, processor)
                 
-                # load_time = time.time() - start_time
-                # logger.info(f"{model_type.capitalize()} model loaded in {load_time:.2f}s")
-            
-            except Exception as e:
-                logger.error(f"Error loading {model_type} model: {str(e)}")
-                raise
+                        elif model_type == "audio":
+                            # Load audio model directly from Hugging Face Hub
+                            source, converted = cls._checkpoint(model_type, model_name)
+                            processor = WhisperProcessor.from_pretrained(source)
+                            model = WhisperForConditionalGeneration.from_pretrained(
+                                source,
+                                **cls._pretrained_kwargs(device_map=cls._device if cls._device == "cuda" else None)
+                            )
+                            if not converted:
+                                cls._save_converted(model_type, model_name, model, processor)
+                            # Language and task are passed to generate() per call instead
+                            model.config.forced_decoder_ids = None
+                            model.generation_config.forced_decoder_ids = None
+                            if cls._device != "cuda":
+                                model = cls._apply_cpu_profile(model)
+                            cls._instances[model_type] = (model, processor)
+                    except Exception as e:
+                        logger.error(f"Error loading {model_type} model: {str(e)}")
+                        raise
+                    finally:
+                        with cls._lease_lock:
+                            cls._loading.discard(model_type)
+                            shared = model_type in cls._overlapped
+                            cls._overlapped.discard(model_type)
+                    
+                    cls._sizes[model_type] = cls._resident_bytes(
+                        cls._instances[model_type][0], None if shared else rss_before
+                    )
+                    load_time = time.time() - start_time
+                    logger.info(
+                        f"{model_type.capitalize()} model loaded in {load_time:.2f}s "
+                        f"({cls._sizes[model_type] / 1024 ** 2:.0f} MB)"
+                    )
+                    with cls._lock:
+                        cls._make_room(0, keep=model_type)
+                instance = cls._instances[model_type]
+        cls._last_used[model_type] = time.monotonic()
+        return instance
+    
+    @classmethod
+    @contextmanager
+    def using(cls, model_type: str):
+        """Get a model and keep it from being evicted until the block exits
         
-        return cls._instances[model_type]
+        Yields what ``get_<model_type>_model`` returns, e.g.
+        ``with ModelLoader.using("image") as (model, processor): ...``
+        """
+        getter = getattr(cls, f"get_{model_type}_model")
+        with cls._lease_lock:
+            cls._leases[model_type] = cls._leases.get(model_type, 0) + 1
+        try:
+            yield getter()
+        finally:
+            with cls._lease_lock:
+                cls._leases[model_type] -= 1
+            cls._last_used[model_type] = time.monotonic()
+    
+    @classmethod
+    def _resident_bytes(cls, model, rss_before: Optional[int]) -> int:
+        """Memory held by a freshly loaded model
+        
+        Parameter and buffer bytes on GPU; on CPU the growth of the process,
+        if larger, which also covers ONNX Runtime sessions and packed int8
+        weights that are not torch parameters. ``rss_before`` is None when
+        other loads ran at the same time and the growth is not this model's.
+        """
+        tensors = 0
+        if isinstance(model, torch.nn.Module):
+            tensors = sum(
+                tensor.numel() * tensor.element_size()
+                for tensor in list(model.parameters()) + list(model.buffers())
+            )
+        if cls._device == "cuda" or rss_before is None:
+            return tensors
+        return max(tensors, psutil.Process().memory_info().rss - rss_before)
+    
+    @classmethod
+    def resident_bytes(cls) -> int:
+        return sum(cls._sizes.get(model_type, 0) for model_type in list(cls._instances))
+    
+    @classmethod
+    def _make_room(cls, needed: int, keep: str):
+        """Evict least recently used idle models until ``needed`` more bytes fit MODEL_MEMORY_BUDGET_MB"""
+        budget = settings.MODEL_MEMORY_BUDGET_MB * 1024 ** 2
+        if budget <= 0:
+            return
+        # Models still loading in other threads will need their last known size too
+        needed += sum(cls._sizes.get(model_type, 0) for model_type in set(cls._loading) - {keep})
+        while cls.resident_bytes() + needed > budget:
+            with cls._lease_lock:
+                idle = [
+                    model_type for model_type in cls._instances
+                    if model_type != keep and not cls._leases.get(model_type)
+                ]
+                if not idle:
+                    logger.warning(
+                        f"Models need {(cls.resident_bytes() + needed) / 1024 ** 2:.0f} MB, over the "
+                        f"{settings.MODEL_MEMORY_BUDGET_MB} MB budget, but all other loaded models are in use"
+                    )
+                    return
+                victim = min(idle, key=lambda model_type: cls._last_used.get(model_type, 0.0))
+                instance = cls._instances.pop(victim)
+            cls._release(victim, instance)
+    
+    @classmethod
+    def _release(cls, model_type: str, instance):
+        del instance
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        logger.info(f"Evicted {model_type} model ({cls._sizes.get(model_type, 0) / 1024 ** 2:.0f} MB)")
+    
+    @classmethod
+    def unload_model(cls, model_type: str) -> bool:
+        """Evict one model unless a request is using it; returns whether it was unloaded"""
+        with cls._lock:
+            with cls._lease_lock:
+                if cls._leases.get(model_type) or model_type not in cls._instances:
+                    return False
+                instance = cls._instances.pop(model_type)
+            cls._release(model_type, instance)
+            return True
+    
+    @classmethod
+    def evict_idle(cls, idle_seconds: float) -> int:
+        """Evict models unused for ``idle_seconds``; returns how many were unloaded"""
+        now = time.monotonic()
+        stale = [
+            model_type for model_type in list(cls._instances)
+            if now - cls._last_used.get(model_type, now) >= idle_seconds
+        ]
+        return sum(cls.unload_model(model_type) for model_type in stale)
+    
+    @classmethod
+    def start_idle_eviction(cls):
+        """Unload models unused for MODEL_IDLE_TIMEOUT_SECONDS from a background thread"""
+        timeout = settings.MODEL_IDLE_TIMEOUT_SECONDS
+        if timeout <= 0 or cls._idle_thread is not None:
+            return
+        
+        def sweep():
+            while True:
+                time.sleep(max(1.0, min(timeout / 4, 60.0)))
+                cls.evict_idle(timeout)
+        
+        cls._idle_thread = threading.Thread(target=sweep, name="model-idle-eviction", daemon=True)
+        cls._idle_thread.start()
+    
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        now = time.monotonic()
+        with cls._lease_lock:
+            loaded = {
+                model_type: {
+                    "resident_mb": round(cls._sizes.get(model_type, 0) / 1024 ** 2, 1),
+                    "in_use": cls._leases.get(model_type, 0),
+                    "idle_seconds": round(now - cls._last_used.get(model_type, now), 1)
+                }
+                for model_type in cls._instances
+            }
+        return {
+            "budget_mb": settings.MODEL_MEMORY_BUDGET_MB,
+            "resident_mb": round(cls.resident_bytes() / 1024 ** 2, 1),
+            "loaded": loaded
+        }
+    
+    @classmethod
+    def freeze(cls):
+        """Put every loaded model in inference mode and fault its weights in
+        
+        Called before forking workers that share the weights copy-on-write:
+        a page stays shared only while no process writes to it. Weights
+        memory-mapped from safetensors are only read from disk on first
+        access; touching them here maps the page-cache pages into this
+        process, so every worker maps the same pages and they count as
+        shared rather than as the first worker's own memory.
+        """
+        with cls._lock:
+            for model_type, instance in cls._instances.items():
+                model = instance[0]
+                if isinstance(model, torch.nn.Module):
+                    model.eval()
+                    model.requires_grad_(False)
+                    for tensor in list(model.parameters()) + list(model.buffers()):
+                        cls._touch_pages(tensor)
+    
+    @staticmethod
+    def _touch_pages(tensor: torch.Tensor):
+        """Read one byte of every page of a CPU tensor, single-threaded so no OpenMP pool starts before fork"""
+        if tensor.device.type != "cpu" or not tensor.is_contiguous() or tensor.numel() == 0:
+            return
+        flat = tensor.detach().reshape(-1).view(torch.uint8).numpy()
+        flat[::4096].sum()
     
     @classmethod
     def get_text_model(cls):
         return cls._load_model(settings.HUGGING_FACE_MODEL_NAME, "text")
     
+    @classmethod
+    def get_draft_model(cls):
+        return cls._load_model(settings.DRAFT_MODEL_NAME, "draft")
+    
+    @classmethod
+    def get_embedding_model(cls):
+        return cls._load_model(settings.SEMANTIC_CACHE_ENCODER, "embedding")
+    
     @classmethod
     def get_image_model(cls):
         return cls._load_model(settings.MEDGEMMA_MODEL, "image")
     
-    # @classmethod
-    # def get_audio_model(cls):
-    #     return cls._load_model(settings.SPEECH_MODEL, "audio")
+    @classmethod
+    def get_image_processor(cls):
+        """MedGemma's processor alone, for decoding and preprocessing uploads
+        
+        Loaded once per model name and kept apart from the model, so request
+        handlers and decode workers never load, lease or refresh the image
+        model itself (which may live in the replicas or have been evicted).
+        """
+        model_name = settings.MEDGEMMA_MODEL
+        processor = cls._processors.get(model_name)
+        if processor is None:
+            with cls._processor_lock:
+                processor = cls._processors.get(model_name)
+                if processor is None:
+                    source, _ = cls._checkpoint("image", model_name)
+                    processor = AutoProcessor.from_pretrained(source, trust_remote_code=True)
+                    cls._processors[model_name] = processor
+        return processor
+    
+    @classmethod
+    def get_audio_model(cls):
+        return cls._load_model(settings.SPEECH_MODEL, "audio")
     
     @classmethod
     def unload_models(cls):
         """Unload all models to free memory"""
-        for model_type, model_tuple in cls._instances.items():
-            if model_tuple and len(model_tuple) >= 1:
-                model = model_tuple[0]
-                if hasattr(model, 'cpu'):
-                    model.cpu()
-                del model_tuple
-        cls._instances = {}
+        with cls._lock:
+            for model_type, model_tuple in cls._instances.items():
+                if model_tuple and len(model_tuple) >= 1:
+                    model = model_tuple[0]
+                    if hasattr(model, 'cpu'):
+                        model.cpu()
+                    del model_tuple
+            cls._instances = {}
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
         logger.info("All models unloaded")
\ No newline at end of file